@@ -8,4 +8,11 @@ from .state import api_state
 from .models import ApiResponse, AgentInfo, RunInfo, StockAnalysisRequest, StockAnalysisResponse
 from .utils import serialize_for_api, safe_parse_json, workflow_run
 from .services import execute_stock_analysis
-from .main import app 
\ No newline at end of file
+
+
+def __getattr__(name):
+    # FastAPI 应用在首次访问时才导入，Agent 只用到状态和模型时不加载 FastAPI
+    if name == "app":
+        from .main import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,3 +1,4 @@
+import os
 from functools import lru_cache
 
 from .storage.base import BaseLogStorage
@@ -9,5 +10,14 @@ from .storage.memory import InMemoryLogStorage
 
 @lru_cache()
 def get_log_storage() -> BaseLogStorage:
-    """Dependency function to get the singleton log storage instance."""
+    """Dependency function to get the singleton log storage instance.
+
+    The backend is selected with the LOG_STORAGE_BACKEND environment variable:
+    "memory" (default) or "sqlite". The SQLite database location can be set
+    with LOG_STORAGE_PATH.
+    """
+    backend = os.getenv("LOG_STORAGE_BACKEND", "memory").strip().lower()
+    if backend == "sqlite":
+        from .storage.sqlite import SqliteLogStorage
+        return SqliteLogStorage(db_path=os.getenv("LOG_STORAGE_PATH") or None)
     return InMemoryLogStorage()
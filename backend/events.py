@@ -0,0 +1,213 @@
+"""
+运行事件流模块
+
+agent_endpoint、LLM 调用和工作流上下文在运行过程中向 run_event_bus 发布事件，
+/api/runs/{run_id}/events 通过 Server-Sent Events 推送给前端，前端无需轮询 api_state。
+
+每个运行保留最近的事件作为回放缓冲区，订阅者连接较晚或断线重连（Last-Event-ID）时
+先收到缓冲区中的事件。只淘汰已结束运行的缓冲区，进行中运行的事件ID不会重新编号；
+缓冲区已被淘汰的已结束运行，订阅时根据 api_state 中的运行状态合成终止事件。发布方在工作流线程中调用，事件通过 call_soon_threadsafe
+投递到订阅者所在的事件循环；订阅者处理过慢时丢弃最早的事件，不会阻塞工作流。
+"""
+
+import asyncio
+import logging
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime, UTC
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+logger = logging.getLogger("run_events")
+
+# 每个运行回放缓冲区保留的事件数
+MAX_BUFFERED_EVENTS = 500
+# 保留事件缓冲区的运行数
+MAX_RUNS = 50
+# 单个订阅者队列的容量
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+# 收到这些事件后运行结束，事件流随之关闭
+TERMINAL_EVENTS = {"run_completed", "run_failed", "run_cancelled"}
+# api_state 中已结束运行的状态对应的终止事件
+TERMINAL_EVENT_BY_STATUS = {
+    "completed": "run_completed",
+    "error": "run_failed",
+    "cancelled": "run_cancelled",
+}
+
+
+class _Subscriber:
+    """绑定到某个事件循环的订阅者队列"""
+
+    __slots__ = ("loop", "queue")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def push(self, event: Dict[str, Any]):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # 事件循环已关闭，订阅者随后会被移除
+            pass
+
+    def _put(self, event: Dict[str, Any]):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+
+class _RunChannel:
+    __slots__ = ("events", "next_id", "subscribers", "finished")
+
+    def __init__(self, max_events: int):
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=max_events)
+        self.next_id = 1
+        self.subscribers: List[_Subscriber] = []
+        self.finished = False
+
+
+class RunEventBus:
+    """按运行ID划分的发布/订阅事件总线"""
+
+    def __init__(self, max_runs: int = MAX_RUNS, max_events: int = MAX_BUFFERED_EVENTS):
+        self._max_runs = max_runs
+        self._max_events = max_events
+        self._channels: "OrderedDict[str, _RunChannel]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _channel(self, run_id: str) -> _RunChannel:
+        """获取或创建运行的事件通道，调用方需持有锁"""
+        channel = self._channels.get(run_id)
+        if channel is None:
+            channel = self._channels[run_id] = _RunChannel(self._max_events)
+            self._evict()
+        return channel
+
+    def _evict(self):
+        """淘汰最早的、已结束且没有订阅者的运行，调用方需持有锁
+
+        进行中的运行不淘汰，否则重新创建通道后事件ID从 1 开始，断线重连的 Last-Event-ID 会失效。
+        """
+        overflow = len(self._channels) - self._max_runs
+        if overflow <= 0:
+            return
+        for run_id in [run_id for run_id, channel in self._channels.items()
+                       if channel.finished and not channel.subscribers][:overflow]:
+            del self._channels[run_id]
+
+    @staticmethod
+    def _finished_run_event(run_id: str, last_event_id: int) -> Optional[Dict[str, Any]]:
+        """运行在 api_state 中已结束时，合成对应的终止事件，否则返回 None"""
+        from .state import api_state
+
+        run = api_state.get_run(run_id)
+        event_type = TERMINAL_EVENT_BY_STATUS.get(run.status) if run else None
+        if event_type is None:
+            return None
+        return {
+            "id": last_event_id + 1,
+            "type": event_type,
+            "run_id": run_id,
+            "timestamp": (run.end_time or datetime.now(UTC)).isoformat(),
+            "data": {"status": run.status},
+        }
+
+    def has_run(self, run_id: str) -> bool:
+        with self._lock:
+            return run_id in self._channels
+
+    def publish(self, run_id: str, event_type: str, data: Optional[Dict[str, Any]] = None):
+        """发布一个事件，运行结束后的事件会被忽略"""
+        with self._lock:
+            channel = self._channel(run_id)
+            if channel.finished:
+                return
+            event = {
+                "id": channel.next_id,
+                "type": event_type,
+                "run_id": run_id,
+                "timestamp": datetime.now(UTC).isoformat(),
+                "data": data or {},
+            }
+            channel.next_id += 1
+            channel.events.append(event)
+            subscribers = list(channel.subscribers)
+            if event_type in TERMINAL_EVENTS:
+                channel.finished = True
+                self._evict()
+        for subscriber in subscribers:
+            subscriber.push(event)
+
+    async def subscribe(self, run_id: str, last_event_id: int = 0,
+                        heartbeat: Optional[float] = None) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """按顺序产出运行的事件，运行结束后停止
+
+        运行的缓冲区已被淘汰且运行已结束时，只产出一个根据 api_state 合成的终止事件；
+        运行尚未发布事件（如排队中）时创建通道等待。
+
+        Args:
+            last_event_id: 客户端已收到的最后一个事件ID，只回放其后的事件
+            heartbeat: 超过该秒数没有事件时产出 None，供调用方发送心跳
+        """
+        subscriber = _Subscriber(asyncio.get_running_loop())
+        with self._lock:
+            known = run_id in self._channels
+        if not known:
+            finished = self._finished_run_event(run_id, last_event_id)
+            if finished is not None:
+                yield finished
+                return
+
+        with self._lock:
+            channel = self._channel(run_id)
+            backlog = [e for e in channel.events if e["id"] > last_event_id]
+            if not channel.finished:
+                channel.subscribers.append(subscriber)
+
+        try:
+            for event in backlog:
+                last_event_id = event["id"]
+                yield event
+                if event["type"] in TERMINAL_EVENTS:
+                    return
+            if channel.finished:
+                return
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    # 运行在发布终止事件前结束（如启动前出错）时，避免一直等待
+                    finished = self._finished_run_event(run_id, last_event_id)
+                    if finished is not None:
+                        yield finished
+                        return
+                    yield None
+                    continue
+                # 订阅与回放之间发布的事件可能同时出现在缓冲区和队列中
+                if event["id"] <= last_event_id:
+                    continue
+                last_event_id = event["id"]
+                yield event
+                if event["type"] in TERMINAL_EVENTS:
+                    return
+        finally:
+            with self._lock:
+                if subscriber in channel.subscribers:
+                    channel.subscribers.remove(subscriber)
+
+
+def publish_run_event(run_id: Optional[str], event_type: str, **data):
+    """发布运行事件，run_id 为空时忽略；发布失败不影响工作流执行"""
+    if not run_id:
+        return
+    try:
+        run_event_bus.publish(run_id, event_type, data)
+    except Exception as e:
+        logger.warning(f"发布运行事件 {event_type} 失败: {e}")
+
+
+# 进程级共享实例
+run_event_bus = RunEventBus()
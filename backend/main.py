@@ -1,7 +1,10 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from typing import Dict, List
 
+from src.utils.metrics import metrics_registry
+
 from .routers import logs, runs
 # 导入新增的路由器
 from .routers import agents, workflow, analysis, api_runs
@@ -45,6 +48,7 @@ def read_root():
         "message": "欢迎使用A股投资Agent后端API! 访问 /docs 了解详情。",
         "api_navigation": {
             "文档": "/docs",
+            "指标": "/metrics",
             "新API": {
                 "介绍": "采用标准化的ApiResponse格式的新API",
                 "端点": {
@@ -80,8 +84,18 @@ def api_navigation():
             "/logs": "查询历史LLM交互日志",
             "/runs": "详细查询运行历史和Agent执行数据(基于BaseLogStorage)"
         },
+        "metrics": {
+            "/metrics": "Prometheus 格式的运行、Agent、LLM、akshare 和缓存指标"
+        },
         "documentation": {
             "OpenAPI文档": "/docs",
             "ReDoc文档": "/redoc"
         }
     }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """以 Prometheus 文本格式输出进程内指标"""
+    return PlainTextResponse(metrics_registry.render(),
+                             media_type="text/plain; version=0.0.4; charset=utf-8")
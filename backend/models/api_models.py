@@ -5,7 +5,7 @@ API数据模型
 """
 
 from pydantic import BaseModel, Field
-from typing import Dict, List, Any, Optional, TypeVar, Generic
+from typing import Dict, List, Any, Literal, Optional, TypeVar, Generic
 from datetime import datetime, UTC
 
 # 类型定义
@@ -33,7 +33,7 @@ class RunInfo(BaseModel):
     run_id: str
     start_time: datetime
     end_time: Optional[datetime] = None
-    status: str  # "running", "completed", "error"
+    status: str  # "queued", "running", "completed", "error", "cancelled"
     agents: List[str] = []
 
 
@@ -68,6 +68,11 @@ class StockAnalysisRequest(BaseModel):
         ge=0,
         example=0
     )
+    priority: Literal["high", "normal", "low"] = Field(
+        "normal",
+        description="任务优先级，队列中高优先级的任务先执行",
+        example="normal"
+    )
 
     class Config:
         schema_extra = {
@@ -88,10 +93,13 @@ class StockAnalysisResponse(BaseModel):
     """
     run_id: str = Field(..., description="分析任务唯一标识符")
     ticker: str = Field(..., description="股票代码")
-    status: str = Field(..., description="任务状态：running, completed, error")
+    status: str = Field(...,
+                        description="任务状态：queued, running, completed, error, cancelled")
     message: str = Field(..., description="状态描述信息")
     submitted_at: datetime = Field(..., description="任务提交时间")
     completed_at: Optional[datetime] = Field(None, description="任务完成时间")
+    deduplicated: bool = Field(
+        False, description="是否合并到了进行中的相同任务，此时 run_id 为已有任务的ID")
 
     class Config:
         schema_extra = {
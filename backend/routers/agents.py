@@ -10,7 +10,7 @@ import logging
 
 from ..models.api_models import ApiResponse, AgentInfo
 from ..state import api_state
-from ..utils.api_utils import serialize_for_api
+from ..utils.api_utils import serialize_for_api, resolve_state
 
 logger = logging.getLogger("agents_router")
 
@@ -42,14 +42,14 @@ async def get_agent_info(agent_name: str):
 async def get_latest_input(agent_name: str):
     """获取Agent的最新输入状态"""
     data = api_state.get_agent_data(agent_name, "input_state")
-    return ApiResponse(data=serialize_for_api(data))
+    return ApiResponse(data=serialize_for_api(resolve_state(data)))
 
 
 @router.get("/{agent_name}/latest_output", response_model=ApiResponse[Dict])
 async def get_latest_output(agent_name: str):
     """获取Agent的最新输出状态"""
     data = api_state.get_agent_data(agent_name, "output_state")
-    return ApiResponse(data=serialize_for_api(data))
+    return ApiResponse(data=serialize_for_api(resolve_state(data)))
 
 
 @router.get("/{agent_name}/reasoning", response_model=ApiResponse[Dict])
@@ -14,8 +14,8 @@ from ..models.api_models import (
     ApiResponse, StockAnalysisRequest, StockAnalysisResponse
 )
 from ..state import api_state
-from ..services import execute_stock_analysis
-from ..utils.api_utils import serialize_for_api, safe_parse_json
+from ..services import analysis_queue, QueueFullError
+from ..utils.api_utils import serialize_for_api, safe_parse_json, resolve_state
 
 logger = logging.getLogger("analysis_router")
 
@@ -61,26 +61,24 @@ async def start_stock_analysis(request: StockAnalysisRequest):
     # 生成唯一ID
     run_id = str(uuid.uuid4())
 
-    # 将任务提交到线程池
-    future = api_state._executor.submit(
-        execute_stock_analysis,
-        request=request,
-        run_id=run_id
-    )
-
-    # 注册任务
-    api_state.register_analysis_task(run_id, future)
-
-    # 注册运行
-    api_state.register_run(run_id)
+    # 提交到任务队列，相同的进行中请求合并为同一个任务
+    try:
+        job, deduplicated = analysis_queue.submit(request, run_id)
+    except QueueFullError as e:
+        return ApiResponse(
+            success=False,
+            message=str(e),
+            data=None
+        )
 
     # 创建响应对象
     response = StockAnalysisResponse(
-        run_id=run_id,
+        run_id=job.run_id,
         ticker=request.ticker,
-        status="running",
-        message="分析任务已启动",
-        submitted_at=datetime.now(UTC)
+        status=job.status,
+        message="已合并到进行中的相同分析任务" if deduplicated else "分析任务已加入队列",
+        submitted_at=datetime.now(UTC),
+        deduplicated=deduplicated
     )
 
     # 使用ApiResponse包装返回
@@ -91,6 +89,28 @@ async def start_stock_analysis(request: StockAnalysisRequest):
     )
 
 
+@router.delete("/{run_id}", response_model=ApiResponse[Dict])
+async def cancel_analysis(run_id: str):
+    """取消股票分析任务
+
+    排队中的任务立即取消；运行中的任务在当前节点完成后停止，不再执行后续节点。
+    """
+    status = analysis_queue.cancel(run_id)
+    if status is None:
+        run_info = api_state.get_run(run_id)
+        return ApiResponse(
+            success=False,
+            message=f"分析任务 '{run_id}' 不存在" if run_info is None
+            else f"分析任务已结束，当前状态: {run_info.status}",
+            data=None
+        )
+
+    return ApiResponse(
+        message="分析任务已取消" if status == "cancelled" else "分析任务将在当前节点完成后停止",
+        data={"run_id": run_id, "status": status}
+    )
+
+
 @router.get("/{run_id}/status", response_model=ApiResponse[Dict])
 async def get_analysis_status(run_id: str):
     """获取股票分析任务的状态"""
@@ -112,7 +132,9 @@ async def get_analysis_status(run_id: str):
     }
 
     if task:
-        if task.done():
+        if task.cancelled():
+            status_data["is_complete"] = True
+        elif task.done():
             if task.exception():
                 status_data["error"] = str(task.exception())
             status_data["is_complete"] = True
@@ -161,7 +183,7 @@ async def get_analysis_result(run_id: str):
             # 尝试从market_data_agent获取ticker
             if agent_name == "market_data" and agent_data and "output_state" in agent_data:
                 try:
-                    output = agent_data["output_state"]
+                    output = resolve_state(agent_data["output_state"])
                     if "data" in output and "ticker" in output["data"]:
                         ticker = output["data"]["ticker"]
                 except Exception:
@@ -172,13 +194,16 @@ async def get_analysis_result(run_id: str):
         portfolio_data = api_state.get_agent_data("portfolio_management")
         if portfolio_data and "output_state" in portfolio_data:
             try:
-                output = portfolio_data["output_state"]
+                output = resolve_state(portfolio_data["output_state"])
                 messages = output.get("messages", [])
-                # 获取最后一个消息
+                # 获取最后一个消息（序列化后的消息为字典）
                 if messages:
                     last_message = messages[-1]
-                    if hasattr(last_message, "content"):
+                    if isinstance(last_message, dict) and "content" in last_message:
                         # 尝试解析content，可能是JSON字符串
+                        final_decision = safe_parse_json(
+                            last_message["content"])
+                    elif hasattr(last_message, "content"):
                         final_decision = safe_parse_json(last_message.content)
             except Exception as e:
                 logger.error(f"解析最终决策时出错: {str(e)}")
@@ -4,12 +4,19 @@
 此模块提供与工作流运行历史相关的API端点
 """
 
-from fastapi import APIRouter, Query
-from typing import Dict, List
+import json
 
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Dict, List, Optional
+
+from ..events import run_event_bus
 from ..models.api_models import ApiResponse, RunInfo
 from ..state import api_state
 
+# 事件流无新事件时发送心跳注释的间隔（秒），避免代理断开空闲连接
+SSE_HEARTBEAT_SECONDS = 15
+
 # 创建路由器
 router = APIRouter(prefix="/api/runs", tags=["Runs"])
 
@@ -43,3 +50,45 @@ async def get_run_info(run_id: str):
             data=None
         )
     return ApiResponse(data=run)
+
+
+def _format_sse(event: Optional[Dict]) -> str:
+    if event is None:
+        return ": heartbeat\n\n"
+    data = json.dumps(event, ensure_ascii=False, default=str)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
+
+
+@router.get("/{run_id}/events")
+async def stream_run_events(
+    run_id: str,
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID")
+):
+    """以 Server-Sent Events 推送运行进度
+
+    事件类型:
+    - agent_started / agent_finished / agent_failed: Agent 节点开始、完成或出错
+    - llm_call_started / llm_call_finished: LLM 调用开始和结束
+    - final_decision: 最终投资决策
+    - run_completed / run_failed / run_cancelled: 运行结束，之后事件流关闭
+
+    连接前已发生的事件会先回放；断线重连时浏览器会带上 Last-Event-ID，只补发其后的事件。
+    """
+    if api_state.get_run(run_id) is None and not run_event_bus.has_run(run_id):
+        raise HTTPException(status_code=404, detail=f"运行 '{run_id}' 不存在")
+
+    try:
+        start_after = int(last_event_id) if last_event_id else 0
+    except ValueError:
+        start_after = 0
+
+    async def event_stream():
+        async for event in run_event_bus.subscribe(
+                run_id, last_event_id=start_after, heartbeat=SSE_HEARTBEAT_SECONDS):
+            yield _format_sse(event)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
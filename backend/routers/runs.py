@@ -2,9 +2,10 @@ from fastapi import APIRouter, Depends, HTTPException, Query, Path
 from typing import List, Dict, Optional
 from datetime import datetime
 
-from backend.schemas import RunSummary, AgentSummary, AgentDetail, WorkflowFlow
+from backend.schemas import RunSummary, AgentSummary, AgentDetail, WorkflowFlow, RunProfile
 from backend.storage.base import BaseLogStorage
 from backend.dependencies import get_log_storage
+from src.utils.tracing import build_run_profile, span_collector
 
 # 创建API路由
 router = APIRouter(
@@ -20,7 +21,7 @@ async def list_runs(
 ):
     """获取最近运行的列表 (基于日志存储)
 
-    此接口查询 BaseLogStorage (当前为内存实现 InMemoryLogStorage)
+    此接口查询 BaseLogStorage (内存实现或 SQLite 实现，由 LOG_STORAGE_BACKEND 配置)
     中的 AgentExecutionLog 记录，返回最近完成的工作流运行摘要。
     注意：基于内存的日志在服务重启后会丢失。
 
@@ -28,35 +29,8 @@ async def list_runs(
           可以轻松切换到底层存储，无需修改此接口代码。
     """
     try:
-        # 获取所有运行ID
-        run_ids = storage.get_unique_run_ids()
-
-        # 为每个运行ID构建摘要
-        results = []
-        for run_id in run_ids[:limit]:  # 限制返回数量
-            # 获取该运行的所有Agent日志
-            agent_logs = storage.get_agent_logs(run_id=run_id)
-            if not agent_logs:
-                continue
-
-            # 计算开始和结束时间
-            start_time = min(log.timestamp_start for log in agent_logs)
-            end_time = max(log.timestamp_end for log in agent_logs)
-
-            # 收集执行的Agent列表
-            agents = sorted(set(log.agent_name for log in agent_logs))
-
-            # 创建摘要对象
-            summary = RunSummary(
-                run_id=run_id,
-                start_time=start_time,
-                end_time=end_time,
-                agents_executed=agents,
-                status="completed"  # 默认状态，可以根据需要确定
-            )
-            results.append(summary)
-
-        return results
+        # 摘要由存储层维护，无需逐个运行读取Agent日志
+        return storage.get_run_summaries(limit=limit)
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -79,29 +53,13 @@ async def get_run(
           可以轻松切换到底层存储，无需修改此接口代码。
     """
     try:
-        # 获取该运行的所有Agent日志
-        agent_logs = storage.get_agent_logs(run_id=run_id)
-        if not agent_logs:
+        summary = storage.get_run_summary(run_id)
+        if summary is None:
             raise HTTPException(
                 status_code=404,
                 detail=f"未找到ID为 {run_id} 的运行"
             )
-
-        # 计算开始和结束时间
-        start_time = min(log.timestamp_start for log in agent_logs)
-        end_time = max(log.timestamp_end for log in agent_logs)
-
-        # 收集执行的Agent列表
-        agents = sorted(set(log.agent_name for log in agent_logs))
-
-        # 创建摘要对象
-        return RunSummary(
-            run_id=run_id,
-            start_time=start_time,
-            end_time=end_time,
-            agents_executed=agents,
-            status="completed"  # 默认状态，可以根据需要确定
-        )
+        return summary
     except HTTPException:
         raise
     except Exception as e:
@@ -111,6 +69,28 @@ async def get_run(
         )
 
 
+@router.get("/{run_id}/profile", response_model=RunProfile)
+async def get_run_profile(
+    run_id: str = Path(..., description="运行ID"),
+    include_spans: bool = Query(False, description="是否返回原始 span 列表")
+):
+    """获取运行的耗时分析 (基于进程内的 span 记录)
+
+    返回每个节点中 LLM 调用、akshare 数据请求和其余计算各自的耗时，LLM 的 token 数和缓存命中次数，
+    以及决定整次运行耗时的关键路径。只保留最近的运行，服务重启后丢失。
+    """
+    spans = span_collector.get_spans(run_id)
+    profile = build_run_profile(run_id, spans)
+    if profile is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"未找到ID为 {run_id} 的运行耗时记录"
+        )
+    if include_spans:
+        profile["spans"] = [span.to_dict() for span in spans]
+    return profile
+
+
 @router.get("/{run_id}/agents", response_model=List[AgentSummary])
 async def get_run_agents(
     run_id: str = Path(..., description="要获取Agent的运行ID"),
@@ -204,6 +184,8 @@ async def get_agent_detail(
 
         # 添加状态和推理信息（如果需要）
         if include_states:
+            # 状态在第一次读取时才序列化
+            log.resolve_states()
             result.input_state = log.input_state
             result.output_state = log.output_state
             result.reasoning = log.reasoning_details
@@ -258,7 +240,8 @@ async def get_workflow_flow(
             )
 
         # 构建状态转换列表
-        agent_logs_sorted = sorted(agent_logs, key=lambda x: x.timestamp_start)
+        agent_logs_sorted = sorted(
+            (log.resolve_states() for log in agent_logs), key=lambda x: x.timestamp_start)
         state_transitions = []
 
         for i, log in enumerate(agent_logs_sorted):
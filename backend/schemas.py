@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 from datetime import datetime, UTC
 from typing import Any, Dict, List, Optional
 
@@ -35,6 +35,23 @@ class AgentExecutionLog(BaseModel):
     terminal_outputs: List[str] = Field(
         default_factory=list, description="终端输出")
 
+    # 尚未序列化的输入/输出状态（带 serialize() 方法的快照），读取时才转换
+    _deferred_states: Dict[str, Any] = PrivateAttr(default_factory=dict)
+
+    def defer_states(self, **states) -> "AgentExecutionLog":
+        """登记延迟序列化的状态，例如 defer_states(input_state=snapshot)"""
+        self._deferred_states.update(states)
+        return self
+
+    def resolve_states(self) -> "AgentExecutionLog":
+        """序列化尚未转换的状态并写入对应字段，读取 input_state / output_state 前调用"""
+        for field in list(self._deferred_states):
+            source = self._deferred_states.pop(field, None)
+            if source is not None:
+                setattr(self, field, source.serialize()
+                        if hasattr(source, "serialize") else source)
+        return self
+
 
 class RunSummary(BaseModel):
     """运行概述信息"""
@@ -80,3 +97,38 @@ class WorkflowFlow(BaseModel):
     agents: Dict[str, AgentSummary] = Field(..., description="执行的Agents")
     state_transitions: List[Dict] = Field(..., description="状态转换")
     final_decision: Optional[str] = Field(None, description="最终决策")
+
+
+class NodeProfile(BaseModel):
+    """单个节点的耗时拆分"""
+    name: str = Field(..., description="Agent名称")
+    start_offset: float = Field(..., description="相对运行开始的秒数")
+    duration: float = Field(..., description="节点总耗时（秒）")
+    llm_seconds: float = Field(..., description="LLM 调用耗时（秒）")
+    data_seconds: float = Field(..., description="akshare 数据请求耗时（秒）")
+    self_seconds: float = Field(..., description="除 LLM 和数据请求外的耗时（秒）")
+    llm_calls: int = Field(..., description="LLM 调用次数")
+    llm_cache_hits: int = Field(..., description="命中 LLM 响应缓存的次数")
+    prompt_tokens: int = Field(..., description="输入 token 数")
+    completion_tokens: int = Field(..., description="输出 token 数")
+    data_calls: int = Field(..., description="数据请求次数")
+    error: Optional[str] = Field(None, description="节点出错时的错误信息")
+
+
+class CriticalPathStep(BaseModel):
+    """关键路径上的节点"""
+    name: str = Field(..., description="Agent名称")
+    start_offset: float = Field(..., description="相对运行开始的秒数")
+    duration: float = Field(..., description="节点耗时（秒）")
+    wait_before: float = Field(..., description="上游节点完成到本节点开始的等待时间（秒）")
+
+
+class RunProfile(BaseModel):
+    """运行耗时分析"""
+    run_id: str = Field(..., description="运行ID")
+    wall_seconds: float = Field(..., description="第一个节点开始到最后一个节点结束的时间（秒）")
+    totals: Dict[str, float] = Field(..., description="按类型汇总的耗时（秒）")
+    critical_path: List[CriticalPathStep] = Field(..., description="决定运行总耗时的节点链")
+    critical_path_seconds: float = Field(..., description="关键路径耗时（秒）")
+    nodes: List[NodeProfile] = Field(..., description="各节点的耗时拆分")
+    spans: Optional[List[Dict[str, Any]]] = Field(None, description="原始 span 列表")
@@ -5,3 +5,4 @@
 """
 
 from .analysis import execute_stock_analysis
+from .job_queue import analysis_queue, QueueFullError
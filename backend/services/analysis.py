@@ -10,7 +10,7 @@ from datetime import datetime, UTC
 
 from ..models.api_models import StockAnalysisRequest
 from ..utils.context_managers import workflow_run
-from ..state import api_state
+from ..state import api_state, RunCancelledError
 from ..schemas import AgentExecutionLog
 from ..dependencies import get_log_storage
 
@@ -66,6 +66,10 @@ def execute_stock_analysis(request: StockAnalysisRequest, run_id: str) -> Dict[s
 
         logger.info(f"股票分析任务完成 (运行ID: {run_id})")
         return result
+    except RunCancelledError:
+        # 运行状态已由 workflow_run 标记为 cancelled
+        logger.info(f"股票分析任务已取消 (运行ID: {run_id})")
+        raise
     except Exception as e:
         logger.error(f"股票分析任务失败: {str(e)}")
 
@@ -0,0 +1,204 @@
+"""
+股票分析任务队列
+
+POST /api/analysis/start 提交的任务进入按优先级排序的队列，由固定数量的工作线程执行：
+    - 相同参数的请求（同一股票、同一天、相同分析参数）在任务结束前合并为同一个任务，
+      后续请求直接复用已有的 run_id 和 Future
+    - 队列已满时拒绝新任务，避免突发请求无限堆积
+    - 排队中的任务可以直接取消；运行中的任务在下一个节点开始前停止
+
+环境变量：
+    - ANALYSIS_WORKERS：工作线程数，默认 5
+    - ANALYSIS_QUEUE_MAX_SIZE：排队任务数上限，默认 100
+"""
+
+import itertools
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Callable, Dict, Optional, Tuple
+
+from src.utils.metrics import metrics_registry
+
+from ..models.api_models import StockAnalysisRequest
+from ..state import api_state
+from ..events import publish_run_event
+from .analysis import execute_stock_analysis
+
+logger = logging.getLogger("analysis_job_queue")
+
+DEFAULT_WORKERS = 5
+DEFAULT_MAX_QUEUE_SIZE = 100
+
+# 数值越小越先执行
+PRIORITY_RANKS = {"high": 0, "normal": 1, "low": 2}
+
+
+class QueueFullError(Exception):
+    """排队任务数已达上限"""
+
+
+def _int_env(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name, default)))
+    except ValueError:
+        logger.warning(f"无效的 {name} 值: {os.getenv(name)}，使用默认值 {default}")
+        return default
+
+
+def request_key(request: StockAnalysisRequest) -> Tuple:
+    """相同股票、同一天、相同分析参数的请求视为重复请求，不区分优先级"""
+    return (request.ticker, date.today().isoformat(), request.show_reasoning,
+            request.num_of_news, request.initial_capital, request.initial_position)
+
+
+@dataclass
+class AnalysisJob:
+    run_id: str
+    request: StockAnalysisRequest
+    key: Tuple
+    rank: int
+    future: Future = field(default_factory=Future)
+    status: str = "queued"  # queued, running, completed, error, cancelled
+
+
+class AnalysisJobQueue:
+    """带优先级、去重和取消功能的分析任务队列"""
+
+    def __init__(self, runner: Callable[..., object], workers: Optional[int] = None,
+                 max_queue_size: Optional[int] = None):
+        self._runner = runner
+        self._workers = workers or _int_env("ANALYSIS_WORKERS", DEFAULT_WORKERS)
+        self._max_queue_size = max_queue_size or _int_env(
+            "ANALYSIS_QUEUE_MAX_SIZE", DEFAULT_MAX_QUEUE_SIZE)
+        self._queue: "queue.PriorityQueue[Tuple[int, int, AnalysisJob]]" = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        # 未结束的任务，按 run_id 和请求键索引
+        self._jobs: Dict[str, AnalysisJob] = {}
+        self._inflight: Dict[Tuple, AnalysisJob] = {}
+        self._queued = 0
+        self._threads = []
+
+    def _ensure_workers(self):
+        """首次提交任务时启动工作线程，调用方需持有锁"""
+        if self._threads:
+            return
+        for i in range(self._workers):
+            thread = threading.Thread(
+                target=self._worker, name=f"analysis-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, request: StockAnalysisRequest, run_id: str) -> Tuple[AnalysisJob, bool]:
+        """提交分析任务
+
+        Returns:
+            (任务, 是否合并到了已有任务)
+
+        Raises:
+            QueueFullError: 排队任务数已达上限
+        """
+        key = request_key(request)
+        rank = PRIORITY_RANKS.get(request.priority, PRIORITY_RANKS["normal"])
+        with self._lock:
+            existing = self._inflight.get(key)
+            if existing is not None:
+                # 更高优先级的重复请求把仍在排队的任务提前
+                if existing.status == "queued" and rank < existing.rank:
+                    existing.rank = rank
+                    self._queue.put((rank, next(self._seq), existing))
+                logger.info(f"请求与进行中的任务 {existing.run_id} 相同，已合并")
+                return existing, True
+
+            if self._queued >= self._max_queue_size:
+                raise QueueFullError(
+                    f"分析队列已满（{self._max_queue_size} 个任务排队中），请稍后重试")
+
+            job = AnalysisJob(run_id=run_id, request=request, key=key, rank=rank)
+            self._jobs[run_id] = job
+            self._inflight[key] = job
+            self._queued += 1
+            # 先注册运行再入队，工作线程开始执行时运行信息已存在
+            api_state.register_run(run_id, status="queued")
+            api_state.register_analysis_task(run_id, job.future)
+            self._queue.put((rank, next(self._seq), job))
+            self._ensure_workers()
+        return job, False
+
+    def cancel(self, run_id: str) -> Optional[str]:
+        """取消任务，返回取消后的状态；任务不存在或已结束时返回None
+
+        排队中的任务立即取消，返回 "cancelled"；
+        运行中的任务在下一个节点开始前停止，返回 "cancelling"。
+        """
+        with self._lock:
+            job = self._jobs.get(run_id)
+            if job is None:
+                return None
+            if job.status == "queued":
+                self._finish(job, "cancelled")
+                job.future.cancel()
+                api_state.complete_run(run_id, "cancelled")
+                publish_run_event(run_id, "run_cancelled", status="cancelled")
+                return "cancelled"
+        api_state.request_cancel(run_id)
+        return "cancelling"
+
+    def get_job(self, run_id: str) -> Optional[AnalysisJob]:
+        with self._lock:
+            return self._jobs.get(run_id)
+
+    def stats(self) -> Dict[str, int]:
+        """排队中和运行中的任务数"""
+        with self._lock:
+            return {"queued": self._queued, "running": len(self._jobs) - self._queued}
+
+    def _finish(self, job: AnalysisJob, status: str):
+        """任务结束后移出索引，调用方需持有锁"""
+        if job.status == "queued":
+            self._queued -= 1
+        job.status = status
+        self._jobs.pop(job.run_id, None)
+        if self._inflight.get(job.key) is job:
+            del self._inflight[job.key]
+
+    def _worker(self):
+        while True:
+            rank, _, job = self._queue.get()
+            with self._lock:
+                # 已取消的任务，或优先级提升后留在队列中的旧条目
+                if job.status != "queued" or rank != job.rank:
+                    continue
+                if not job.future.set_running_or_notify_cancel():
+                    self._finish(job, "cancelled")
+                    continue
+                self._queued -= 1
+                job.status = "running"
+
+            status = "completed"
+            try:
+                result = self._runner(request=job.request, run_id=job.run_id)
+                job.future.set_result(result)
+            except Exception as e:
+                status = "cancelled" if api_state.is_cancel_requested(
+                    job.run_id) else "error"
+                job.future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._finish(job, status)
+
+
+# 进程级共享实例
+analysis_queue = AnalysisJobQueue(execute_stock_analysis)
+
+metrics_registry.gauge(
+    "hedge_fund_analysis_queue_depth", "Analysis jobs waiting in the queue",
+    callback=lambda: analysis_queue.stats()["queued"])
+metrics_registry.gauge(
+    "hedge_fund_analysis_jobs_running", "Analysis jobs currently executing",
+    callback=lambda: analysis_queue.stats()["running"])
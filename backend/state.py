@@ -2,29 +2,58 @@
 API状态管理模块
 
 此模块提供全局API状态管理功能，用于跟踪Agent状态、运行历史等
+
+为保证服务长期运行时内存稳定，历史数据均有上限：
+    - API_STATE_HISTORY_SIZE：每个Agent保留的历史记录条数，默认 50
+    - API_STATE_MAX_RUNS：保留的运行信息条数，默认 200，超出时淘汰最早的已结束运行
 """
 
+import os
 import threading
 import logging
-from typing import Dict, List, Any, Optional
+from collections import OrderedDict, deque
+from typing import Dict, List, Any, Optional, Set
 from datetime import datetime, UTC
-from concurrent.futures import ThreadPoolExecutor, Future
+from concurrent.futures import Future
+
+from src.utils.metrics import RUN_DURATION, RUNS_TOTAL
 
 from .models.api_models import RunInfo
 
 logger = logging.getLogger("api_state")
 
+DEFAULT_HISTORY_SIZE = 50
+DEFAULT_MAX_RUNS = 200
+
+
+class RunCancelledError(Exception):
+    """运行已被取消，在下一个节点开始前抛出"""
+
+
+def _int_env(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name, default)))
+    except ValueError:
+        logger.warning(f"无效的 {name} 值: {os.getenv(name)}，使用默认值 {default}")
+        return default
+
 
 class ApiState:
     """API状态管理类，存储全局共享状态"""
 
-    def __init__(self):
+    def __init__(self, history_size: Optional[int] = None, max_runs: Optional[int] = None):
         self._lock = threading.RLock()
+        self._history_size = history_size or _int_env(
+            "API_STATE_HISTORY_SIZE", DEFAULT_HISTORY_SIZE)
+        self._max_runs = max_runs or _int_env(
+            "API_STATE_MAX_RUNS", DEFAULT_MAX_RUNS)
         self._agent_data: Dict[str, Dict] = {}
-        self._runs: Dict[str, RunInfo] = {}
+        self._runs: "OrderedDict[str, RunInfo]" = OrderedDict()
+        # 运行ID到参与Agent的索引，写入历史时同步更新
+        self._run_agents: "OrderedDict[str, Set[str]]" = OrderedDict()
         self._current_run_id: Optional[str] = None
-        self._executor = ThreadPoolExecutor(max_workers=5)
         self._analysis_tasks: Dict[str, Future] = {}  # 跟踪分析任务
+        self._cancel_requested: Set[str] = set()  # 已请求取消的运行
 
     @property
     def current_run_id(self) -> Optional[str]:
@@ -57,7 +86,8 @@ class ApiState:
                         "reasoning": None,
                         "timestamp": None
                     },
-                    "history": []  # 保存历史执行记录
+                    # 保存最近的历史执行记录，超出上限时丢弃最早的
+                    "history": deque(maxlen=self._history_size)
                 }
 
     def update_agent_state(self, agent_name: str, state: str):
@@ -69,8 +99,13 @@ class ApiState:
                     self._agent_data[agent_name]["info"]["last_run"] = datetime.now(
                         UTC)
 
-    def update_agent_data(self, agent_name: str, field: str, data: Any):
-        """更新Agent数据"""
+    def update_agent_data(self, agent_name: str, field: str, data: Any,
+                          run_id: Optional[str] = None):
+        """更新Agent数据
+
+        Args:
+            run_id: 数据所属的运行ID，为空时使用当前运行ID
+        """
         with self._lock:
             if agent_name in self._agent_data:
                 self._agent_data[agent_name]["latest"][field] = data
@@ -78,14 +113,26 @@ class ApiState:
                     UTC)
 
                 # 添加到历史记录
-                if self._current_run_id:
+                run_id = run_id or self._current_run_id
+                if run_id:
                     history_entry = {
-                        "run_id": self._current_run_id,
+                        "run_id": run_id,
                         "timestamp": datetime.now(UTC),
                         field: data
                     }
                     self._agent_data[agent_name]["history"].append(
                         history_entry)
+                    self._add_run_agent(run_id, agent_name)
+
+    def _add_run_agent(self, run_id: str, agent_name: str):
+        """记录参与运行的Agent，调用方需持有锁"""
+        agents = self._run_agents.get(run_id)
+        if agents is None:
+            agents = self._run_agents[run_id] = set()
+            # 未通过 register_run 注册的运行（如命令行运行）也只保留最近的
+            while len(self._run_agents) > self._max_runs:
+                self._run_agents.popitem(last=False)
+        agents.add(agent_name)
 
     def get_agent_info(self, agent_name: str) -> Optional[Dict]:
         """获取Agent信息"""
@@ -108,32 +155,57 @@ class ApiState:
         with self._lock:
             return [data["info"] for data in self._agent_data.values()]
 
-    def register_run(self, run_id: str):
-        """注册新的运行"""
+    def register_run(self, run_id: str, status: str = "running"):
+        """注册新的运行
+
+        排队中的运行不会成为当前运行，工作线程开始执行时由 workflow_run 再次注册。
+        """
         with self._lock:
             self._runs[run_id] = RunInfo(
                 run_id=run_id,
                 start_time=datetime.now(UTC),
-                status="running"
+                status=status
             )
-            self._current_run_id = run_id
+            if status != "queued":
+                self._current_run_id = run_id
+            self._evict_runs()
+
+    def _evict_runs(self):
+        """运行数超出上限时淘汰最早的已结束运行，调用方需持有锁"""
+        overflow = len(self._runs) - self._max_runs
+        if overflow <= 0:
+            return
+        evicted = []
+        for run_id, run in self._runs.items():
+            if run.status not in ("queued", "running"):
+                evicted.append(run_id)
+                if len(evicted) == overflow:
+                    break
+        for run_id in evicted:
+            del self._runs[run_id]
+            self._run_agents.pop(run_id, None)
+            self._cancel_requested.discard(run_id)
+            task = self._analysis_tasks.get(run_id)
+            if task is not None and task.done():
+                del self._analysis_tasks[run_id]
 
     def complete_run(self, run_id: str, status: str = "completed"):
         """完成运行"""
         with self._lock:
             if run_id in self._runs:
+                run = self._runs[run_id]
+                # API 运行会嵌套两层 workflow_run，只在首次结束时计入指标
+                if run.status in ("queued", "running"):
+                    RUNS_TOTAL.inc(status=status)
+                    RUN_DURATION.observe(
+                        (datetime.now(UTC) - run.start_time).total_seconds(), status=status)
                 self._runs[run_id].end_time = datetime.now(UTC)
                 self._runs[run_id].status = status
 
                 # 更新参与的Agent列表
-                agents = set()
-                for agent_name, agent_data in self._agent_data.items():
-                    for entry in agent_data["history"]:
-                        if entry["run_id"] == run_id:
-                            agents.add(agent_name)
-                            break
-
-                self._runs[run_id].agents = list(agents)
+                self._runs[run_id].agents = sorted(
+                    self._run_agents.get(run_id, ()))
+                self._evict_runs()
 
     def get_run(self, run_id: str) -> Optional[RunInfo]:
         """获取运行信息"""
@@ -155,6 +227,23 @@ class ApiState:
         with self._lock:
             return self._analysis_tasks.get(run_id)
 
+    def request_cancel(self, run_id: str):
+        """请求取消运行，正在执行的节点完成后生效"""
+        with self._lock:
+            self._cancel_requested.add(run_id)
+
+    def is_cancel_requested(self, run_id: Optional[str]) -> bool:
+        """运行是否已被请求取消"""
+        if not run_id:
+            return False
+        with self._lock:
+            return run_id in self._cancel_requested
+
+    def raise_if_cancelled(self, run_id: Optional[str]):
+        """运行已被取消时抛出 RunCancelledError，由 agent_endpoint 在每个节点开始前调用"""
+        if self.is_cancel_requested(run_id):
+            raise RunCancelledError(f"运行 {run_id} 已取消")
+
 
 # 创建全局API状态实例
 api_state = ApiState()
@@ -1,7 +1,7 @@
 from abc import ABC, abstractmethod
 from typing import List, Optional, Set
 
-from backend.schemas import LLMInteractionLog, AgentExecutionLog
+from backend.schemas import LLMInteractionLog, AgentExecutionLog, RunSummary
 
 
 class BaseLogStorage(ABC):
@@ -41,3 +41,26 @@ class BaseLogStorage(ABC):
     def get_unique_run_ids(self) -> List[str]:
         """获取所有唯一的运行ID列表"""
         pass
+
+    def get_run_summary(self, run_id: str) -> Optional[RunSummary]:
+        """获取单个运行的摘要，运行不存在时返回None
+
+        默认实现读取该运行的全部Agent日志后汇总，存储实现可以覆盖为索引查询。
+        """
+        agent_logs = self.get_agent_logs(run_id=run_id)
+        if not agent_logs:
+            return None
+        return RunSummary(
+            run_id=run_id,
+            start_time=min(log.timestamp_start for log in agent_logs),
+            end_time=max(log.timestamp_end for log in agent_logs),
+            agents_executed=sorted(set(log.agent_name for log in agent_logs)),
+            status="completed"
+        )
+
+    def get_run_summaries(self, limit: Optional[int] = None) -> List[RunSummary]:
+        """获取最近运行的摘要列表，按开始时间倒序"""
+        summaries = [summary for summary in map(self.get_run_summary, self.get_unique_run_ids())
+                     if summary is not None]
+        summaries.sort(key=lambda s: s.start_time, reverse=True)
+        return summaries[:limit] if limit is not None else summaries
@@ -1,23 +1,99 @@
-from typing import List, Optional, Set
-from collections import deque
+from typing import Deque, Dict, List, Optional, Set
+from collections import Counter, OrderedDict, deque
+from datetime import datetime
 import threading
 
 from .base import BaseLogStorage
-from backend.schemas import LLMInteractionLog, AgentExecutionLog
+from backend.schemas import LLMInteractionLog, AgentExecutionLog, RunSummary
 
 # Define a maximum size for the in-memory log to prevent unbounded growth
 MAX_LOG_SIZE = 1000
 
 
+class _LogIndex:
+    """Bounded log deque with secondary indexes by run_id and agent_name.
+
+    Logs are evicted in insertion order, so the evicted entry is always the
+    oldest one in its run and agent buckets as well and can be popped from
+    the left in O(1). Callers must hold the owning lock.
+    """
+
+    def __init__(self, maxlen: int):
+        self.logs: Deque = deque(maxlen=maxlen)
+        self.by_run: Dict[str, Deque] = {}
+        self.by_agent: Dict[str, Deque] = {}
+
+    def append(self, log):
+        """Appends a log and returns the evicted entry, if any."""
+        evicted = None
+        if len(self.logs) == self.logs.maxlen:
+            evicted = self.logs[0]
+            self._unindex(self.by_run, evicted.run_id)
+            self._unindex(self.by_agent, evicted.agent_name)
+        self.logs.append(log)
+        if log.run_id:
+            self.by_run.setdefault(log.run_id, deque()).append(log)
+        self.by_agent.setdefault(log.agent_name, deque()).append(log)
+        return evicted
+
+    @staticmethod
+    def _unindex(index: Dict[str, Deque], key: Optional[str]):
+        bucket = index.get(key) if key else None
+        if bucket:
+            bucket.popleft()
+            if not bucket:
+                del index[key]
+
+    def query(self, agent_name: Optional[str], run_id: Optional[str]) -> List:
+        """Returns matching logs in insertion order, scanning only the smaller bucket."""
+        if run_id:
+            logs = self.by_run.get(run_id, ())
+            if agent_name:
+                return [log for log in logs if log.agent_name == agent_name]
+            return list(logs)
+        if agent_name:
+            return list(self.by_agent.get(agent_name, ()))
+        return list(self.logs)
+
+
+class _RunStats:
+    """运行摘要的增量统计"""
+
+    __slots__ = ("start_time", "end_time", "agents")
+
+    def __init__(self):
+        self.start_time: Optional[datetime] = None
+        self.end_time: Optional[datetime] = None
+        self.agents: Counter = Counter()
+
+    def add(self, log: AgentExecutionLog):
+        if self.start_time is None or log.timestamp_start < self.start_time:
+            self.start_time = log.timestamp_start
+        if self.end_time is None or log.timestamp_end > self.end_time:
+            self.end_time = log.timestamp_end
+        self.agents[log.agent_name] += 1
+
+    def to_summary(self, run_id: str) -> RunSummary:
+        return RunSummary(
+            run_id=run_id,
+            start_time=self.start_time,
+            end_time=self.end_time,
+            agents_executed=sorted(self.agents),
+            status="completed"
+        )
+
+
 class InMemoryLogStorage(BaseLogStorage):
     """In-memory storage for LLM interaction logs using a deque."""
 
     def __init__(self):
-        # Use a deque for efficient appends and pops from both ends
-        # Set maxlen for automatic discarding of old logs
-        self._logs: deque[LLMInteractionLog] = deque(maxlen=MAX_LOG_SIZE)
+        # Bounded deques with per-run and per-agent indexes,
+        # old logs are discarded automatically once MAX_LOG_SIZE is reached
+        self._logs = _LogIndex(MAX_LOG_SIZE)
         # Create a separate deque for agent execution logs
-        self._agent_logs: deque[AgentExecutionLog] = deque(maxlen=MAX_LOG_SIZE)
+        self._agent_logs = _LogIndex(MAX_LOG_SIZE)
+        # 每个运行的摘要，按首次出现的顺序排列
+        self._runs: "OrderedDict[str, _RunStats]" = OrderedDict()
         # Use locks for thread safety, as both the main app and backend might access this
         self._logs_lock = threading.Lock()
         self._agent_logs_lock = threading.Lock()
@@ -34,28 +110,38 @@ class InMemoryLogStorage(BaseLogStorage):
         limit: Optional[int] = None,
     ) -> List[LLMInteractionLog]:
         """Retrieves logs with optional filtering, ensuring thread safety."""
+        if limit == 0:
+            return []  # Return empty list if limit is 0
         with self._logs_lock:
-            # Convert deque to list for easier filtering
-            logs = list(self._logs)
-
-        # Apply filters
-        if agent_name:
-            logs = [log for log in logs if log.agent_name == agent_name]
-        if run_id:
-            logs = [log for log in logs if log.run_id == run_id]
+            logs = self._logs.query(agent_name, run_id)
 
         # Apply limit (retrieve the most recent 'limit' logs after filtering)
         if limit is not None and limit > 0:
             logs = logs[-limit:]
-        elif limit == 0:
-            return []  # Return empty list if limit is 0
-
         return logs
 
     def add_agent_log(self, log: AgentExecutionLog) -> None:
         """添加Agent执行日志，确保线程安全"""
         with self._agent_logs_lock:
-            self._agent_logs.append(log)
+            evicted = self._agent_logs.append(log)
+            if log.run_id:
+                stats = self._runs.get(log.run_id)
+                if stats is None:
+                    stats = self._runs[log.run_id] = _RunStats()
+                stats.add(log)
+            if evicted is not None and evicted.run_id:
+                self._on_agent_log_evicted(evicted.run_id)
+
+    def _on_agent_log_evicted(self, run_id: str) -> None:
+        """运行的最早日志被淘汰后重新计算该运行的摘要，调用方需持有锁"""
+        remaining = self._agent_logs.by_run.get(run_id)
+        if not remaining:
+            self._runs.pop(run_id, None)
+            return
+        stats = _RunStats()
+        for log in remaining:
+            stats.add(log)
+        self._runs[run_id] = stats
 
     def get_agent_logs(
         self,
@@ -64,39 +150,38 @@ class InMemoryLogStorage(BaseLogStorage):
         limit: Optional[int] = None,
     ) -> List[AgentExecutionLog]:
         """获取Agent执行日志，可选过滤，确保线程安全"""
+        if limit == 0:
+            return []  # 如果limit为0，返回空列表
         with self._agent_logs_lock:
-            # 转换为列表便于过滤
-            logs = list(self._agent_logs)
-
-        # 应用过滤器
-        if agent_name:
-            logs = [log for log in logs if log.agent_name == agent_name]
-        if run_id:
-            logs = [log for log in logs if log.run_id == run_id]
+            logs = self._agent_logs.query(agent_name, run_id)
 
         # 应用限制（获取过滤后的最近'limit'条日志）
         if limit is not None and limit > 0:
             logs = logs[-limit:]
-        elif limit == 0:
-            return []  # 如果limit为0，返回空列表
-
         return logs
 
     def get_unique_run_ids(self) -> List[str]:
         """获取所有唯一的运行ID列表"""
-        run_ids = set()
-
-        # 从LLM交互日志中收集
         with self._logs_lock:
-            for log in self._logs:
-                if log.run_id:
-                    run_ids.add(log.run_id)
-
-        # 从Agent执行日志中收集
+            run_ids: Set[str] = set(self._logs.by_run)
         with self._agent_logs_lock:
-            for log in self._agent_logs:
-                if log.run_id:
-                    run_ids.add(log.run_id)
+            run_ids.update(self._agent_logs.by_run)
 
         # 按时间顺序返回（这里简化为字母顺序）
-        return sorted(list(run_ids))
+        return sorted(run_ids)
+
+    def get_run_summaries(self, limit: Optional[int] = None) -> List[RunSummary]:
+        """获取最近运行的摘要，最新的在前，只读取需要返回的运行"""
+        with self._agent_logs_lock:
+            items = []
+            for run_id in reversed(self._runs):
+                if limit is not None and len(items) >= limit:
+                    break
+                items.append(self._runs[run_id].to_summary(run_id))
+        return items
+
+    def get_run_summary(self, run_id: str) -> Optional[RunSummary]:
+        """获取单个运行的摘要"""
+        with self._agent_logs_lock:
+            stats = self._runs.get(run_id)
+            return stats.to_summary(run_id) if stats else None
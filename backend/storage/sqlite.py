@@ -0,0 +1,237 @@
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import List, Optional, Type, TypeVar
+
+from pydantic import BaseModel
+
+from .base import BaseLogStorage
+from backend.schemas import LLMInteractionLog, AgentExecutionLog, RunSummary
+
+logger = logging.getLogger("sqlite_log_storage")
+
+# 默认数据库文件位置
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__)))), "src", "data", "log_storage.db")
+
+# 缓冲区达到该条数时立即批量写入
+DEFAULT_BATCH_SIZE = 50
+# 后台线程定期写入缓冲区的间隔（秒）
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT,
+    agent_name TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_llm_logs_run_id ON llm_logs (run_id, id);
+CREATE INDEX IF NOT EXISTS idx_llm_logs_agent_name ON llm_logs (agent_name, id);
+CREATE INDEX IF NOT EXISTS idx_llm_logs_timestamp ON llm_logs (timestamp);
+
+CREATE TABLE IF NOT EXISTS agent_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    agent_name TEXT NOT NULL,
+    timestamp_start TEXT NOT NULL,
+    timestamp_end TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_agent_logs_run_id ON agent_logs (run_id, id);
+CREATE INDEX IF NOT EXISTS idx_agent_logs_agent_name ON agent_logs (agent_name, id);
+CREATE INDEX IF NOT EXISTS idx_agent_logs_timestamp ON agent_logs (timestamp_start);
+CREATE INDEX IF NOT EXISTS idx_agent_logs_run_agent ON agent_logs (run_id, agent_name);
+"""
+
+T = TypeVar("T", bound=BaseModel)
+
+
+def _dump(log: BaseModel) -> str:
+    """序列化日志对象，无法直接转为JSON的字段退化为字符串"""
+    return json.dumps(log.model_dump(), default=str, ensure_ascii=False)
+
+
+class SqliteLogStorage(BaseLogStorage):
+    """基于SQLite的持久化日志存储
+
+    日志以JSON形式保存在 payload 列中，run_id / agent_name / 时间戳单独成列并建立索引，
+    过滤和 limit 查询由数据库完成，无需加载全部记录。
+    写入先进入内存缓冲区，由后台线程批量提交；读取前会先写入缓冲区，保证读到自己的写入。
+    """
+
+    def __init__(self, db_path: Optional[str] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        self.db_path = db_path or DEFAULT_DB_PATH
+        if self.db_path != ":memory:":
+            os.makedirs(os.path.dirname(
+                os.path.abspath(self.db_path)), exist_ok=True)
+        self._batch_size = max(1, batch_size)
+        self._flush_interval = flush_interval
+
+        # 单个连接由锁串行化访问，API线程与工作流线程共享
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn_lock = threading.Lock()
+        with self._conn_lock:
+            if self.db_path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+
+        self._pending_llm: List[tuple] = []
+        self._pending_agent: List[AgentExecutionLog] = []
+        self._pending_lock = threading.Condition()
+        self._closed = False
+
+        self._flusher = threading.Thread(
+            target=self._flush_loop, name="sqlite-log-flusher", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    # --- 写入 ---
+
+    def add_log(self, log: LLMInteractionLog) -> None:
+        """将LLM交互日志加入写缓冲区"""
+        row = (log.run_id, log.agent_name,
+               log.timestamp.isoformat(), _dump(log))
+        with self._pending_lock:
+            self._pending_llm.append(row)
+            if len(self._pending_llm) >= self._batch_size:
+                self._pending_lock.notify()
+
+    def add_agent_log(self, log: AgentExecutionLog) -> None:
+        """将Agent执行日志加入写缓冲区，状态在后台写入时才序列化"""
+        with self._pending_lock:
+            self._pending_agent.append(log)
+            if len(self._pending_agent) >= self._batch_size:
+                self._pending_lock.notify()
+
+    def flush(self) -> None:
+        """将缓冲区中的日志批量写入数据库"""
+        # 先获取连接锁再取出缓冲区，保证并发flush时按写入顺序提交
+        with self._conn_lock:
+            with self._pending_lock:
+                llm_rows, self._pending_llm = self._pending_llm, []
+                agent_rows, self._pending_agent = self._pending_agent, []
+            if not llm_rows and not agent_rows:
+                return
+            with self._conn:
+                if llm_rows:
+                    self._conn.executemany(
+                        "INSERT INTO llm_logs (run_id, agent_name, timestamp, payload) VALUES (?, ?, ?, ?)",
+                        llm_rows)
+                if agent_rows:
+                    agent_rows = [(log.run_id, log.agent_name, log.timestamp_start.isoformat(),
+                                   log.timestamp_end.isoformat(), _dump(log.resolve_states()))
+                                  for log in agent_rows]
+                    self._conn.executemany(
+                        "INSERT INTO agent_logs (run_id, agent_name, timestamp_start, timestamp_end, payload) VALUES (?, ?, ?, ?, ?)",
+                        agent_rows)
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self._pending_lock:
+                if self._closed:
+                    return
+                self._pending_lock.wait(self._flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"批量写入日志失败: {str(e)}")
+
+    def close(self) -> None:
+        """写入剩余日志并关闭数据库连接"""
+        with self._pending_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._pending_lock.notify_all()
+        self.flush()
+        with self._conn_lock:
+            self._conn.close()
+
+    # --- 查询 ---
+
+    def _query(self, table: str, model: Type[T], agent_name: Optional[str],
+               run_id: Optional[str], limit: Optional[int]) -> List[T]:
+        if limit == 0:
+            return []
+        self.flush()
+
+        clauses, params = [], []
+        if agent_name:
+            clauses.append("agent_name = ?")
+            params.append(agent_name)
+        if run_id:
+            clauses.append("run_id = ?")
+            params.append(run_id)
+        sql = f"SELECT payload FROM {table}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        # 与内存实现一致：返回过滤后最近的 limit 条，按写入顺序排列
+        sql += " ORDER BY id DESC"
+        if limit is not None and limit > 0:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._conn_lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [model.model_validate(json.loads(payload)) for (payload,) in reversed(rows)]
+
+    def get_logs(
+        self,
+        agent_name: Optional[str] = None,
+        run_id: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[LLMInteractionLog]:
+        """按agent名称或run ID查询LLM交互日志"""
+        return self._query("llm_logs", LLMInteractionLog, agent_name, run_id, limit)
+
+    def get_agent_logs(
+        self,
+        agent_name: Optional[str] = None,
+        run_id: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> List[AgentExecutionLog]:
+        """获取Agent执行日志，可按agent名称或run ID过滤"""
+        return self._query("agent_logs", AgentExecutionLog, agent_name, run_id, limit)
+
+    def get_unique_run_ids(self) -> List[str]:
+        """获取所有唯一的运行ID列表"""
+        self.flush()
+        with self._conn_lock:
+            rows = self._conn.execute(
+                "SELECT run_id FROM llm_logs WHERE run_id IS NOT NULL AND run_id != '' "
+                "UNION SELECT run_id FROM agent_logs WHERE run_id != '' "
+                "ORDER BY run_id").fetchall()
+        return [run_id for (run_id,) in rows]
+
+    def _run_summaries(self, where: str, params: list, limit: Optional[int]) -> List[RunSummary]:
+        """按 run_id 聚合 agent_logs 的索引列，不读取 payload"""
+        self.flush()
+        sql = ("SELECT run_id, MIN(timestamp_start), MAX(timestamp_end), "
+               "GROUP_CONCAT(DISTINCT agent_name) FROM agent_logs "
+               f"WHERE {where} GROUP BY run_id ORDER BY MIN(timestamp_start) DESC")
+        if limit is not None:
+            sql += " LIMIT ?"
+            params = params + [limit]
+        with self._conn_lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [RunSummary(run_id=run_id, start_time=start, end_time=end,
+                           agents_executed=sorted(agents.split(",")), status="completed")
+                for run_id, start, end, agents in rows]
+
+    def get_run_summary(self, run_id: str) -> Optional[RunSummary]:
+        """获取单个运行的摘要"""
+        summaries = self._run_summaries("run_id = ?", [run_id], None)
+        return summaries[0] if summaries else None
+
+    def get_run_summaries(self, limit: Optional[int] = None) -> List[RunSummary]:
+        """获取最近运行的摘要列表，按开始时间倒序"""
+        return self._run_summaries("run_id != ''", [], limit)
@@ -45,6 +45,13 @@ def safe_parse_json(data):
         return data
 
 
+def resolve_state(data: Any) -> Any:
+    """将延迟序列化的状态快照转换为字典，其他数据原样返回"""
+    if hasattr(data, "serialize") and callable(data.serialize):
+        return data.serialize()
+    return data
+
+
 def serialize_for_api(obj: Any) -> Any:
     """将任意对象转换为API友好的格式，确保可JSON序列化"""
     if obj is None:
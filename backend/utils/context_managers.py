@@ -7,7 +7,8 @@
 from contextlib import contextmanager
 import logging
 
-from ..state import api_state
+from ..events import publish_run_event
+from ..state import api_state, RunCancelledError
 
 logger = logging.getLogger("context_managers")
 
@@ -25,6 +26,12 @@ def workflow_run(run_id: str):
     try:
         yield
         api_state.complete_run(run_id, "completed")
+        publish_run_event(run_id, "run_completed", status="completed")
+    except RunCancelledError:
+        api_state.complete_run(run_id, "cancelled")
+        publish_run_event(run_id, "run_cancelled", status="cancelled")
+        raise
     except Exception as e:
         api_state.complete_run(run_id, "error")
+        publish_run_event(run_id, "run_failed", status="error", error=str(e))
         raise
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+"""
+启动导入耗时检查
+
+基于 python -X importtime 测量入口模块的导入耗时，并检查两项预算：
+    1. 导入耗时（多次测量取中位数）不超过预算
+    2. akshare、Gemini/OpenAI SDK、matplotlib、FastAPI、uvicorn 等重量级依赖没有在导入时被加载，
+       它们应当在首次使用时才导入
+
+使用方法:
+    # 检查默认入口模块 (src.main, src.backtester)
+    poetry run python check_import_time.py
+
+    # 指定模块和预算（毫秒），并显示耗时最多的 20 个包
+    poetry run python check_import_time.py src.main --budget-ms 1200 --top 20
+
+预算也可以通过环境变量 IMPORT_TIME_BUDGET_MS 统一设置。任一检查不通过时退出码为 1。
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# 各入口模块的默认导入耗时预算（毫秒）
+IMPORT_BUDGETS_MS = {
+    "src.main": 1500,
+    "src.backtester": 1500,
+}
+
+# 只允许在首次使用时导入的重量级依赖
+LAZY_MODULES = (
+    "akshare",
+    "google.genai",
+    "openai",
+    "matplotlib",
+    "fastapi",
+    "uvicorn",
+)
+
+_LINE_RE = re.compile(r"^import time:\s*(\d+) \|\s*(\d+) \|( *)(\S+)")
+
+
+def measure_import(module: str) -> List[Tuple[str, int, int]]:
+    """在新的解释器中导入模块，返回 [(模块名, 自身耗时us, 累计耗时us), ...]"""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        p for p in (PROJECT_ROOT, env.get("PYTHONPATH")) if p)
+    # openrouter_config 在导入时校验 API 密钥，测量时不需要真实密钥
+    env.setdefault("GEMINI_API_KEY", "import-time-check")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        tail = result.stderr.strip().splitlines()[-1:] or [""]
+        raise RuntimeError(f"导入 {module} 失败: {tail[0]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, _, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def check_module(module: str, budget_ms: float, repeat: int, top: int) -> bool:
+    """测量模块导入耗时并打印报告，通过检查时返回True"""
+    totals = []
+    rows: List[Tuple[str, int, int]] = []
+    for _ in range(repeat):
+        rows = measure_import(module)
+        total = next((cum for name, _, cum in reversed(rows) if name == module), 0)
+        totals.append(total / 1000)
+    median_ms = statistics.median(totals)
+
+    eager = sorted({name for name, _, _ in rows if name in LAZY_MODULES})
+    within_budget = median_ms <= budget_ms
+    status = "OK" if within_budget and not eager else "FAIL"
+    print(f"[{status}] {module}: {median_ms:.0f} ms (预算 {budget_ms:.0f} ms, "
+          f"{repeat} 次测量: {', '.join(f'{t:.0f}' for t in totals)})")
+    if eager:
+        print(f"       导入时加载了应延迟导入的依赖: {', '.join(eager)}")
+
+    if top:
+        # 按顶层包汇总各模块的自身耗时，子模块不会重复计入
+        packages: Dict[str, int] = {}
+        for name, self_us, _ in rows:
+            package = name.split(".", 1)[0]
+            packages[package] = packages.get(package, 0) + self_us
+        print(f"       耗时最多的 {top} 个包:")
+        for name, self_us in sorted(packages.items(), key=lambda x: -x[1])[:top]:
+            print(f"         {self_us / 1000:8.1f} ms  {name}")
+    return within_budget and not eager
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="检查入口模块的导入耗时预算")
+    parser.add_argument("modules", nargs="*",
+                        help=f"要检查的模块，默认为 {', '.join(IMPORT_BUDGETS_MS)}")
+    parser.add_argument("--budget-ms", type=float,
+                        default=os.getenv("IMPORT_TIME_BUDGET_MS"),
+                        help="导入耗时预算（毫秒），覆盖各模块的默认预算")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="测量次数，取中位数 (默认: 3)")
+    parser.add_argument("--top", type=int, default=10,
+                        help="显示耗时最多的包的数量，0 表示不显示 (默认: 10)")
+    args = parser.parse_args(argv)
+
+    passed = True
+    for module in args.modules or list(IMPORT_BUDGETS_MS):
+        budget_ms = float(args.budget_ms) if args.budget_ms is not None else \
+            IMPORT_BUDGETS_MS.get(module, 1500)
+        try:
+            passed &= check_module(module, budget_ms, max(1, args.repeat), args.top)
+        except RuntimeError as e:
+            print(f"[FAIL] {e}")
+            passed = False
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
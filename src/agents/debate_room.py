@@ -1,6 +1,6 @@
 from langchain_core.messages import HumanMessage
 from src.agents.state import AgentState, show_agent_reasoning, show_workflow_status
-from src.tools.openrouter_config import get_chat_completion
+from src.tools.openrouter_config import get_chat_completion, aget_chat_completion
 from src.utils.api_utils import agent_endpoint, log_llm_interaction
 import json
 import ast
@@ -14,9 +14,57 @@ logger = logging.getLogger('debate_room')
 def debate_room_agent(state: AgentState):
     """Facilitates debate between bull and bear researchers to reach a balanced conclusion."""
     show_workflow_status("Debate Room")
-    show_reasoning = state["metadata"]["show_reasoning"]
     logger.info("开始分析研究员观点并进行辩论...")
+    context = _prepare_debate(state)
+
+    # 调用 LLM 获取第三方观点
+    llm_analysis = None
+    llm_score = 0  # 默认为中性
+    try:
+        logger.info("开始调用 LLM 获取第三方分析...")
+
+        # 使用log_llm_interaction装饰器记录LLM交互
+        llm_response = log_llm_interaction(state)(
+            lambda: get_chat_completion(context["messages"])
+        )()
+
+        logger.info("LLM 返回响应完成")
+        llm_analysis, llm_score = _parse_llm_response(llm_response)
+    except Exception as e:
+        logger.error(f"调用 LLM 失败: {e}")
+        llm_analysis = {"analysis": "LLM API call failed",
+                        "score": 0, "reasoning": "API error"}
+
+    return _build_debate_output(state, context, llm_analysis, llm_score)
+
+
+@agent_endpoint("debate_room", "辩论室，分析多空双方观点，得出平衡的投资结论")
+async def debate_room_agent_async(state: AgentState):
+    """debate_room_agent 的异步版本"""
+    show_workflow_status("Debate Room")
+    logger.info("开始分析研究员观点并进行辩论...")
+    context = _prepare_debate(state)
+
+    llm_analysis = None
+    llm_score = 0  # 默认为中性
+    try:
+        logger.info("开始调用 LLM 获取第三方分析...")
+        llm_response = await aget_chat_completion(context["messages"])
+        # 记录已完成的LLM交互
+        log_llm_interaction(state)(lambda: llm_response)()
+
+        logger.info("LLM 返回响应完成")
+        llm_analysis, llm_score = _parse_llm_response(llm_response)
+    except Exception as e:
+        logger.error(f"调用 LLM 失败: {e}")
+        llm_analysis = {"analysis": "LLM API call failed",
+                        "score": 0, "reasoning": "API error"}
+
+    return _build_debate_output(state, context, llm_analysis, llm_score)
 
+
+def _prepare_debate(state: AgentState) -> dict:
+    """收集并解析研究员观点，构建发给 LLM 的消息"""
     # 收集所有研究员信息 - 向前兼容设计（添加防御性检查）
     researcher_messages = {}
     for msg in state["messages"]:
@@ -114,48 +162,51 @@ def debate_room_agent(state: AgentState):
 务必确保你的回复是有效的 JSON 格式，且包含上述所有字段。回复必须使用英文，不要使用中文或其他语言。
 """
 
-    # 调用 LLM 获取第三方观点
-    llm_response = None
+    messages = [
+        {"role": "system", "content": "You are a professional financial analyst. Please provide your analysis in English only, not in Chinese or any other language."},
+        {"role": "user", "content": llm_prompt}
+    ]
+    return {
+        "bull_confidence": bull_confidence,
+        "bear_confidence": bear_confidence,
+        "debate_summary": debate_summary,
+        "messages": messages,
+    }
+
+
+def _parse_llm_response(llm_response):
+    """解析 LLM 返回的 JSON，返回 (llm_analysis, llm_score)"""
     llm_analysis = None
     llm_score = 0  # 默认为中性
-    try:
-        logger.info("开始调用 LLM 获取第三方分析...")
-        messages = [
-            {"role": "system", "content": "You are a professional financial analyst. Please provide your analysis in English only, not in Chinese or any other language."},
-            {"role": "user", "content": llm_prompt}
-        ]
-
-        # 使用log_llm_interaction装饰器记录LLM交互
-        llm_response = log_llm_interaction(state)(
-            lambda: get_chat_completion(messages)
-        )()
+    # 解析 LLM 返回的 JSON
+    if llm_response:
+        try:
+            # 尝试提取 JSON 部分
+            json_start = llm_response.find('{')
+            json_end = llm_response.rfind('}') + 1
+            if json_start >= 0 and json_end > json_start:
+                json_str = llm_response[json_start:json_end]
+                llm_analysis = json.loads(json_str)
+                llm_score = float(llm_analysis.get("score", 0))
+                # 确保分数在有效范围内
+                llm_score = max(min(llm_score, 1.0), -1.0)
+                logger.info(f"成功解析 LLM 回复，评分: {llm_score}")
+                logger.debug(
+                    f"LLM 分析内容: {llm_analysis.get('analysis', '未提供分析')[:100]}...")
+        except Exception as e:
+            # 如果解析失败，记录错误并使用默认值
+            logger.error(f"解析 LLM 回复失败: {e}")
+            llm_analysis = {"analysis": "Failed to parse LLM response",
+                            "score": 0, "reasoning": "Parsing error"}
+    return llm_analysis, llm_score
 
-        logger.info("LLM 返回响应完成")
 
-        # 解析 LLM 返回的 JSON
-        if llm_response:
-            try:
-                # 尝试提取 JSON 部分
-                json_start = llm_response.find('{')
-                json_end = llm_response.rfind('}') + 1
-                if json_start >= 0 and json_end > json_start:
-                    json_str = llm_response[json_start:json_end]
-                    llm_analysis = json.loads(json_str)
-                    llm_score = float(llm_analysis.get("score", 0))
-                    # 确保分数在有效范围内
-                    llm_score = max(min(llm_score, 1.0), -1.0)
-                    logger.info(f"成功解析 LLM 回复，评分: {llm_score}")
-                    logger.debug(
-                        f"LLM 分析内容: {llm_analysis.get('analysis', '未提供分析')[:100]}...")
-            except Exception as e:
-                # 如果解析失败，记录错误并使用默认值
-                logger.error(f"解析 LLM 回复失败: {e}")
-                llm_analysis = {"analysis": "Failed to parse LLM response",
-                                "score": 0, "reasoning": "Parsing error"}
-    except Exception as e:
-        logger.error(f"调用 LLM 失败: {e}")
-        llm_analysis = {"analysis": "LLM API call failed",
-                        "score": 0, "reasoning": "API error"}
+def _build_debate_output(state: AgentState, context: dict, llm_analysis, llm_score):
+    """结合研究员置信度与 LLM 评分得出最终信号，并构建返回状态"""
+    show_reasoning = state["metadata"]["show_reasoning"]
+    bull_confidence = context["bull_confidence"]
+    bear_confidence = context["bear_confidence"]
+    debate_summary = context["debate_summary"]
 
     # 计算混合置信度差异
     confidence_diff = bull_confidence - bear_confidence
@@ -1,27 +1,21 @@
 from langchain_core.messages import HumanMessage
 from src.agents.state import AgentState, show_agent_reasoning, show_workflow_status
-from src.tools.news_crawler import get_stock_news
+from src.tools.news_provider import news_provider
 from src.utils.logging_config import setup_logger
 from src.utils.api_utils import agent_endpoint, log_llm_interaction
+import asyncio
 import json
 from datetime import datetime, timedelta
-from src.tools.openrouter_config import get_chat_completion
+from src.tools.openrouter_config import get_chat_completion, aget_chat_completion
 
 # 设置日志记录
 logger = setup_logger('macro_analyst_agent')
 
 
-@agent_endpoint("macro_analyst", "宏观分析师，分析宏观经济环境对目标股票的影响")
-def macro_analyst_agent(state: AgentState):
-    """负责宏观经济分析"""
-    show_workflow_status("Macro Analyst")
-    show_reasoning = state["metadata"]["show_reasoning"]
-    data = state["data"]
-    symbol = data["ticker"]
-    logger.info(f"正在进行宏观分析: {symbol}")
-
-    # 获取大量新闻数据（最多100条）
-    news_list = get_stock_news(symbol, max_news=100)  # 尝试获取100条新闻
+def _get_recent_news(symbol: str, run_id: str = None) -> list:
+    """获取大量新闻数据（最多100条）并过滤出七天内的新闻，同一运行内与情绪分析师共享新闻数据"""
+    news_list = news_provider.get_news(
+        symbol, max_news=100, run_id=run_id)  # 尝试获取100条新闻
 
     # 过滤七天前的新闻
     cutoff_date = datetime.now() - timedelta(days=7)
@@ -29,20 +23,60 @@ def macro_analyst_agent(state: AgentState):
                    if datetime.strptime(news['publish_time'], '%Y-%m-%d %H:%M:%S') > cutoff_date]
 
     logger.info(f"获取到 {len(recent_news)} 条七天内的新闻")
+    return recent_news
+
+
+def _no_news_result(symbol: str) -> dict:
+    logger.warning(f"未获取到 {symbol} 的最近新闻，无法进行宏观分析")
+    return {
+        "macro_environment": "neutral",
+        "impact_on_stock": "neutral",
+        "key_factors": [],
+        "reasoning": "未获取到最近新闻，无法进行宏观分析"
+    }
+
+
+@agent_endpoint("macro_analyst", "宏观分析师，分析宏观经济环境对目标股票的影响")
+def macro_analyst_agent(state: AgentState):
+    """负责宏观经济分析"""
+    show_workflow_status("Macro Analyst")
+    symbol = state["data"]["ticker"]
+    logger.info(f"正在进行宏观分析: {symbol}")
+
+    recent_news = _get_recent_news(symbol, state["metadata"].get("run_id"))
 
     # 如果没有获取到新闻，返回默认结果
     if not recent_news:
-        logger.warning(f"未获取到 {symbol} 的最近新闻，无法进行宏观分析")
-        message_content = {
-            "macro_environment": "neutral",
-            "impact_on_stock": "neutral",
-            "key_factors": [],
-            "reasoning": "未获取到最近新闻，无法进行宏观分析"
-        }
+        message_content = _no_news_result(symbol)
     else:
         # 获取宏观分析结果
-        macro_analysis = get_macro_news_analysis(recent_news)
-        message_content = macro_analysis
+        message_content = get_macro_news_analysis(recent_news)
+
+    return _build_macro_output(state, message_content)
+
+
+@agent_endpoint("macro_analyst", "宏观分析师，分析宏观经济环境对目标股票的影响")
+async def macro_analyst_agent_async(state: AgentState):
+    """macro_analyst_agent 的异步版本"""
+    show_workflow_status("Macro Analyst")
+    symbol = state["data"]["ticker"]
+    logger.info(f"正在进行宏观分析: {symbol}")
+
+    recent_news = await asyncio.to_thread(
+        _get_recent_news, symbol, state["metadata"].get("run_id"))
+
+    if not recent_news:
+        message_content = _no_news_result(symbol)
+    else:
+        message_content = await aget_macro_news_analysis(recent_news)
+
+    return _build_macro_output(state, message_content)
+
+
+def _build_macro_output(state: AgentState, message_content: dict):
+    """构建宏观分析师的返回状态"""
+    show_reasoning = state["metadata"]["show_reasoning"]
+    data = state["data"]
 
     # 如果需要显示推理过程
     if show_reasoning:
@@ -70,49 +104,8 @@ def macro_analyst_agent(state: AgentState):
     }
 
 
-def get_macro_news_analysis(news_list: list) -> dict:
-    """分析宏观经济新闻对股票的影响
-
-    Args:
-        news_list (list): 新闻列表
-
-    Returns:
-        dict: 宏观分析结果，包含环境评估、对股票的影响、关键因素和详细推理
-    """
-    if not news_list:
-        return {
-            "macro_environment": "neutral",
-            "impact_on_stock": "neutral",
-            "key_factors": [],
-            "reasoning": "没有足够的新闻数据进行宏观分析"
-        }
-
-    # 检查缓存
-    import os
-    cache_file = "src/data/macro_analysis_cache.json"
-    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
-
-    # 生成新闻内容的唯一标识
-    news_key = "|".join([
-        f"{news['title']}|{news['publish_time']}"
-        for news in news_list[:20]  # 使用前20条新闻作为标识
-    ])
-
-    # 检查缓存
-    if os.path.exists(cache_file):
-        try:
-            with open(cache_file, 'r', encoding='utf-8') as f:
-                cache = json.load(f)
-                if news_key in cache:
-                    logger.info("使用缓存的宏观分析结果")
-                    return cache[news_key]
-        except Exception as e:
-            logger.error(f"读取宏观分析缓存出错: {e}")
-            cache = {}
-    else:
-        logger.info("未找到宏观分析缓存文件，将创建新文件")
-        cache = {}
-
+def _build_macro_messages(news_list: list) -> list:
+    """构建宏观分析的LLM消息"""
     # 准备系统消息
     system_message = {
         "role": "system",
@@ -154,61 +147,101 @@ def get_macro_news_analysis(news_list: list) -> dict:
         "content": f"请分析以下新闻，评估当前宏观经济环境及其对相关A股上市公司的影响：\n\n{news_content}\n\n请以JSON格式返回结果，包含以下字段：macro_environment（宏观环境：positive/neutral/negative）、impact_on_stock（对股票影响：positive/neutral/negative）、key_factors（关键因素数组）、reasoning（详细推理）。"
     }
 
+    return [system_message, user_message]
+
+
+def _parse_macro_result(result) -> dict:
+    """解析LLM返回的宏观分析JSON"""
+    if result is None:
+        logger.error("LLM分析失败，无法获取宏观分析结果")
+        return {
+            "macro_environment": "neutral",
+            "impact_on_stock": "neutral",
+            "key_factors": [],
+            "reasoning": "LLM分析失败，无法获取宏观分析结果"
+        }
+
+    # 解析JSON结果
     try:
-        # 获取LLM分析结果
-        logger.info("正在调用LLM进行宏观分析...")
-        result = get_chat_completion([system_message, user_message])
-        if result is None:
-            logger.error("LLM分析失败，无法获取宏观分析结果")
+        # 尝试直接解析
+        analysis_result = json.loads(result.strip())
+        logger.info("成功解析LLM返回的JSON结果")
+    except json.JSONDecodeError:
+        # 如果直接解析失败，尝试提取JSON部分
+        import re
+        json_match = re.search(r'```json\s*(.*?)\s*```', result, re.DOTALL)
+        if json_match:
+            try:
+                analysis_result = json.loads(json_match.group(1).strip())
+                logger.info("成功从代码块中提取并解析JSON结果")
+            except:
+                # 如果仍然失败，返回默认结果
+                logger.error("无法解析代码块中的JSON结果")
+                return {
+                    "macro_environment": "neutral",
+                    "impact_on_stock": "neutral",
+                    "key_factors": [],
+                    "reasoning": "无法解析LLM返回的JSON结果"
+                }
+        else:
+            # 如果没有找到JSON，返回默认结果
+            logger.error("LLM未返回有效的JSON格式结果")
             return {
                 "macro_environment": "neutral",
                 "impact_on_stock": "neutral",
                 "key_factors": [],
-                "reasoning": "LLM分析失败，无法获取宏观分析结果"
+                "reasoning": "LLM未返回有效的JSON格式结果"
             }
 
-        # 解析JSON结果
-        try:
-            # 尝试直接解析
-            analysis_result = json.loads(result.strip())
-            logger.info("成功解析LLM返回的JSON结果")
-        except json.JSONDecodeError:
-            # 如果直接解析失败，尝试提取JSON部分
-            import re
-            json_match = re.search(r'```json\s*(.*?)\s*```', result, re.DOTALL)
-            if json_match:
-                try:
-                    analysis_result = json.loads(json_match.group(1).strip())
-                    logger.info("成功从代码块中提取并解析JSON结果")
-                except:
-                    # 如果仍然失败，返回默认结果
-                    logger.error("无法解析代码块中的JSON结果")
-                    return {
-                        "macro_environment": "neutral",
-                        "impact_on_stock": "neutral",
-                        "key_factors": [],
-                        "reasoning": "无法解析LLM返回的JSON结果"
-                    }
-            else:
-                # 如果没有找到JSON，返回默认结果
-                logger.error("LLM未返回有效的JSON格式结果")
-                return {
-                    "macro_environment": "neutral",
-                    "impact_on_stock": "neutral",
-                    "key_factors": [],
-                    "reasoning": "LLM未返回有效的JSON格式结果"
-                }
+    return analysis_result
+
+
+def _empty_news_result() -> dict:
+    return {
+        "macro_environment": "neutral",
+        "impact_on_stock": "neutral",
+        "key_factors": [],
+        "reasoning": "没有足够的新闻数据进行宏观分析"
+    }
+
 
-        # 缓存结果
-        cache[news_key] = analysis_result
-        try:
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                json.dump(cache, f, ensure_ascii=False, indent=2)
-            logger.info("宏观分析结果已缓存")
-        except Exception as e:
-            logger.error(f"写入宏观分析缓存出错: {e}")
+def get_macro_news_analysis(news_list: list) -> dict:
+    """分析宏观经济新闻对股票的影响
+
+    Args:
+        news_list (list): 新闻列表
+
+    Returns:
+        dict: 宏观分析结果，包含环境评估、对股票的影响、关键因素和详细推理
+    """
+    if not news_list:
+        return _empty_news_result()
+
+    try:
+        # 获取LLM分析结果
+        logger.info("正在调用LLM进行宏观分析...")
+        result = get_chat_completion(_build_macro_messages(news_list))
+        return _parse_macro_result(result)
 
-        return analysis_result
+    except Exception as e:
+        logger.error(f"宏观分析出错: {e}")
+        return {
+            "macro_environment": "neutral",
+            "impact_on_stock": "neutral",
+            "key_factors": [],
+            "reasoning": f"分析过程中出错: {str(e)}"
+        }
+
+
+async def aget_macro_news_analysis(news_list: list) -> dict:
+    """get_macro_news_analysis 的异步版本"""
+    if not news_list:
+        return _empty_news_result()
+
+    try:
+        logger.info("正在调用LLM进行宏观分析...")
+        result = await aget_chat_completion(_build_macro_messages(news_list))
+        return _parse_macro_result(result)
 
     except Exception as e:
         logger.error(f"宏观分析出错: {e}")
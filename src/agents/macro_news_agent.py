@@ -1,15 +1,19 @@
+import asyncio
 import os
 import json
 from datetime import datetime
-import akshare as ak
 from src.utils.logging_config import setup_logger
 # from langgraph.graph import AgentState # Changed import
 # Added for alignment
 from src.agents.state import AgentState, show_agent_reasoning, show_workflow_status
 from typing import Dict, Any, List
 from src.utils.api_utils import agent_endpoint  # Added for alignment
-from src.tools.openrouter_config import get_chat_completion
+from src.tools.openrouter_config import get_chat_completion, aget_chat_completion
 from langchain_core.messages import HumanMessage  # Added import
+from src.utils.tracing import traced_module
+
+# akshare 调用在节点内记录为 data span
+ak = traced_module("akshare")
 
 # LLM Prompt for analyzing full news data
 LLM_PROMPT_MACRO_ANALYSIS = """你是一名资深的A股市场宏观分析师。请根据以下提供的沪深300指数（代码：000300）当日的**全部新闻数据**，进行深入分析并生成一份专业的宏观总结报告。
@@ -31,22 +35,89 @@ LLM_PROMPT_MACRO_ANALYSIS = """你是一名资深的A股市场宏观分析师。
 logger = setup_logger('macro_news_agent')
 
 
+AGENT_NAME = "macro_news_agent"
+NEWS_SYMBOL = "000300"  # 沪深300指数
+OUTPUT_FILE_PATH = os.path.join("src", "data", "macro_summary.json")
+
+
 @agent_endpoint("macro_news_agent", "获取沪深300全量新闻并进行宏观分析，为投资决策提供市场层面的宏观环境评估")
 def macro_news_agent(state: AgentState) -> Dict[str, Any]:
     """
     获取沪深300全量新闻，调用LLM进行宏观分析，并保存结果。
     该Agent独立运行，不依赖特定上游数据，结果注入AgentState。
     """
-    agent_name = "macro_news_agent"
+    agent_name = AGENT_NAME
     show_workflow_status(f"{agent_name}: --- Executing Macro News Agent ---")
-    symbol = "000300"  # 沪深300指数
-    news_list_for_llm: List[Dict[str, str]] = []
+    today_str = datetime.now().strftime("%Y-%m-%d")
+
+    summary, retrieved_news_count, from_cache, all_summaries = _load_cached_summary(
+        today_str)
+
+    if not from_cache:
+        show_workflow_status(f"{agent_name}: 缓存中未找到今日总结或缓存无效，开始获取实时新闻。")
+        try:
+            prompt_filled, retrieved_news_count = _fetch_news_prompt()
+            if prompt_filled is None:
+                summary = "今日未获取到相关宏观新闻数据。"
+            else:
+                show_workflow_status(
+                    f"{agent_name}: Calling LLM for analysis.")
+                llm_response = get_chat_completion(
+                    messages=[{"role": "user", "content": prompt_filled}]
+                )
+                summary = _summary_from_llm_response(llm_response)
+        except Exception as e:
+            summary = _summary_from_error(e)
+
+        _save_summary(today_str, summary, retrieved_news_count, all_summaries)
+
+    return _build_macro_news_output(state, today_str, summary, retrieved_news_count, from_cache)
+
+
+@agent_endpoint("macro_news_agent", "获取沪深300全量新闻并进行宏观分析，为投资决策提供市场层面的宏观环境评估")
+async def macro_news_agent_async(state: AgentState) -> Dict[str, Any]:
+    """macro_news_agent 的异步版本，新闻抓取在线程池中执行，LLM调用不阻塞事件循环"""
+    agent_name = AGENT_NAME
+    show_workflow_status(f"{agent_name}: --- Executing Macro News Agent ---")
+    today_str = datetime.now().strftime("%Y-%m-%d")
+
+    summary, retrieved_news_count, from_cache, all_summaries = _load_cached_summary(
+        today_str)
+
+    if not from_cache:
+        show_workflow_status(f"{agent_name}: 缓存中未找到今日总结或缓存无效，开始获取实时新闻。")
+        try:
+            prompt_filled, retrieved_news_count = await asyncio.to_thread(_fetch_news_prompt)
+            if prompt_filled is None:
+                summary = "今日未获取到相关宏观新闻数据。"
+            else:
+                show_workflow_status(
+                    f"{agent_name}: Calling LLM for analysis.")
+                llm_response = await aget_chat_completion(
+                    messages=[{"role": "user", "content": prompt_filled}]
+                )
+                summary = _summary_from_llm_response(llm_response)
+        except Exception as e:
+            summary = _summary_from_error(e)
+
+        await asyncio.to_thread(_save_summary, today_str, summary,
+                                retrieved_news_count, all_summaries)
+
+    return _build_macro_news_output(state, today_str, summary, retrieved_news_count, from_cache)
+
+
+def _load_cached_summary(today_str: str):
+    """尝试从缓存文件加载当日的宏观新闻总结
+
+    Returns:
+        tuple: (总结内容, 新闻数量, 是否来自缓存, 已读取的全部总结或None)
+    """
+    agent_name = AGENT_NAME
+    output_file_path = OUTPUT_FILE_PATH
     summary = f"宏观新闻分析过程中发生错误: 未知错误"  # Default error summary
     retrieved_news_count = 0
     from_cache = False  # Flag to indicate if summary was loaded from cache
-
-    today_str = datetime.now().strftime("%Y-%m-%d")
-    output_file_path = os.path.join("src", "data", "macro_summary.json")
+    all_summaries = None
 
     # Attempt to load from cache first
     if os.path.exists(output_file_path):
@@ -72,90 +143,109 @@ def macro_news_agent(state: AgentState) -> Dict[str, Any]:
                 f"Error loading cache from {output_file_path}: {str(e)}. Will fetch fresh data.", agent_name)
             all_summaries = {}  # Reset on other errors
 
-    if not from_cache:
-        show_workflow_status(f"{agent_name}: 缓存中未找到今日总结或缓存无效，开始获取实时新闻。")
-        try:
-            show_workflow_status(
-                f"{agent_name}: Fetching news for symbol {symbol}")
-            news_df = ak.stock_news_em(symbol=symbol)
-            if news_df is None or news_df.empty:
-                message = f"未获取到 {symbol} 的新闻数据。"
-                show_workflow_status(f"{agent_name}: {message}")
-                show_agent_reasoning(
-                    f"No news found for {symbol}. Proceeding with no data summary.", agent_name)
-                summary = "今日未获取到相关宏观新闻数据。"
-            else:
-                retrieved_news_count = len(news_df)
-                message = f"成功获取到 {symbol} 的 {retrieved_news_count} 条新闻数据。"
-                show_workflow_status(f"{agent_name}: {message}")
-                show_agent_reasoning(
-                    f"Successfully fetched {retrieved_news_count} news items for {symbol}. Preparing for LLM analysis.", agent_name)
-                for _, row in news_df.iterrows():
-                    news_item = {
-                        "title": str(row.get("新闻标题", "")).strip(),
-                        "content": str(row.get("新闻内容", "")).strip(),  # 全量内容
-                        "publish_time": str(row.get("发布时间", "")).strip()
-                    }
-                    news_list_for_llm.append(news_item)
-
-                news_data_json_string = json.dumps(
-                    news_list_for_llm, ensure_ascii=False, indent=2)
-                prompt_filled = LLM_PROMPT_MACRO_ANALYSIS.format(
-                    news_data_json_string=news_data_json_string)
+    return summary, retrieved_news_count, from_cache, all_summaries
 
-                show_workflow_status(
-                    f"{agent_name}: Calling LLM for analysis.")
-                llm_response = get_chat_completion(
-                    messages=[{"role": "user", "content": prompt_filled}]
-                )
-                summary = llm_response.strip() if llm_response else "LLM分析未能返回有效结果。"
-                show_workflow_status(f"{agent_name}: LLM宏观分析结果获取成功.")
-                show_agent_reasoning(
-                    f"LLM analysis complete. Summary (first 100 chars): {summary[:100]}...", agent_name)
 
-        except Exception as e:
-            error_message = f"{agent_name}: 执行出错: {e}"
-            show_workflow_status(error_message)
-            show_agent_reasoning(
-                f"Exception during execution: {str(e)}", agent_name)
-            summary = f"宏观新闻分析过程中发生错误: {str(e)}"
+def _fetch_news_prompt():
+    """获取沪深300全量新闻并填充LLM提示
 
-    # 保存总结到JSON文件 (only if not from cache and successful, or if updating existing)
-    if not from_cache:  # Also save if summary was updated, even if initially from cache but e.g. re-analyzed
-        show_workflow_status(
-            f"{agent_name}: Preparing to save summary to {output_file_path}")
-
-        # Ensure all_summaries is initialized if cache loading failed or file didn't exist
-        if not os.path.exists(output_file_path) or 'all_summaries' not in locals():
-            all_summaries = {}
-            # if file exists but all_summaries wasn't set (e.g. decode error)
-            if os.path.exists(output_file_path):
-                try:
-                    with open(output_file_path, 'r', encoding='utf-8') as f:
-                        all_summaries = json.load(f)
-                except json.JSONDecodeError:
-                    all_summaries = {}  # If still error, start fresh
-
-        os.makedirs(os.path.dirname(output_file_path),
-                    exist_ok=True)  # Ensure directory exists
-
-        current_summary_details = {
-            "summary_content": summary,
-            "retrieved_news_count": retrieved_news_count,
-            "last_updated": datetime.now().isoformat()
+    Returns:
+        tuple: (填充后的提示，无新闻时为None, 新闻数量)
+    """
+    agent_name = AGENT_NAME
+    symbol = NEWS_SYMBOL
+    news_list_for_llm: List[Dict[str, str]] = []
+
+    show_workflow_status(
+        f"{agent_name}: Fetching news for symbol {symbol}")
+    news_df = ak.stock_news_em(symbol=symbol)
+    if news_df is None or news_df.empty:
+        message = f"未获取到 {symbol} 的新闻数据。"
+        show_workflow_status(f"{agent_name}: {message}")
+        show_agent_reasoning(
+            f"No news found for {symbol}. Proceeding with no data summary.", agent_name)
+        return None, 0
+
+    retrieved_news_count = len(news_df)
+    message = f"成功获取到 {symbol} 的 {retrieved_news_count} 条新闻数据。"
+    show_workflow_status(f"{agent_name}: {message}")
+    show_agent_reasoning(
+        f"Successfully fetched {retrieved_news_count} news items for {symbol}. Preparing for LLM analysis.", agent_name)
+    for _, row in news_df.iterrows():
+        news_item = {
+            "title": str(row.get("新闻标题", "")).strip(),
+            "content": str(row.get("新闻内容", "")).strip(),  # 全量内容
+            "publish_time": str(row.get("发布时间", "")).strip()
         }
-        all_summaries[today_str] = current_summary_details
+        news_list_for_llm.append(news_item)
+
+    news_data_json_string = json.dumps(
+        news_list_for_llm, ensure_ascii=False, indent=2)
+    prompt_filled = LLM_PROMPT_MACRO_ANALYSIS.format(
+        news_data_json_string=news_data_json_string)
+    return prompt_filled, retrieved_news_count
+
+
+def _summary_from_llm_response(llm_response) -> str:
+    agent_name = AGENT_NAME
+    summary = llm_response.strip() if llm_response else "LLM分析未能返回有效结果。"
+    show_workflow_status(f"{agent_name}: LLM宏观分析结果获取成功.")
+    show_agent_reasoning(
+        f"LLM analysis complete. Summary (first 100 chars): {summary[:100]}...", agent_name)
+    return summary
+
+
+def _summary_from_error(e: Exception) -> str:
+    agent_name = AGENT_NAME
+    error_message = f"{agent_name}: 执行出错: {e}"
+    show_workflow_status(error_message)
+    show_agent_reasoning(
+        f"Exception during execution: {str(e)}", agent_name)
+    return f"宏观新闻分析过程中发生错误: {str(e)}"
+
+
+def _save_summary(today_str: str, summary: str, retrieved_news_count: int, all_summaries=None):
+    """保存总结到JSON文件"""
+    agent_name = AGENT_NAME
+    output_file_path = OUTPUT_FILE_PATH
+    show_workflow_status(
+        f"{agent_name}: Preparing to save summary to {output_file_path}")
+
+    # Ensure all_summaries is initialized if cache loading failed or file didn't exist
+    if not os.path.exists(output_file_path) or all_summaries is None:
+        all_summaries = {}
+        # if file exists but all_summaries wasn't set (e.g. decode error)
+        if os.path.exists(output_file_path):
+            try:
+                with open(output_file_path, 'r', encoding='utf-8') as f:
+                    all_summaries = json.load(f)
+            except json.JSONDecodeError:
+                all_summaries = {}  # If still error, start fresh
+
+    os.makedirs(os.path.dirname(output_file_path),
+                exist_ok=True)  # Ensure directory exists
+
+    current_summary_details = {
+        "summary_content": summary,
+        "retrieved_news_count": retrieved_news_count,
+        "last_updated": datetime.now().isoformat()
+    }
+    all_summaries[today_str] = current_summary_details
+
+    try:
+        with open(output_file_path, 'w', encoding='utf-8') as f:
+            json.dump(all_summaries, f, ensure_ascii=False, indent=4)
+        show_workflow_status(
+            f"{agent_name}: 宏观新闻总结已保存到: {output_file_path}")
+    except Exception as e:
+        show_workflow_status(f"{agent_name}: 保存宏观新闻总结文件失败: {e}")
+        show_agent_reasoning(
+            f"Failed to save summary to {output_file_path}: {str(e)}", agent_name)
 
-        try:
-            with open(output_file_path, 'w', encoding='utf-8') as f:
-                json.dump(all_summaries, f, ensure_ascii=False, indent=4)
-            show_workflow_status(
-                f"{agent_name}: 宏观新闻总结已保存到: {output_file_path}")
-        except Exception as e:
-            show_workflow_status(f"{agent_name}: 保存宏观新闻总结文件失败: {e}")
-            show_agent_reasoning(
-                f"Failed to save summary to {output_file_path}: {str(e)}", agent_name)
 
+def _build_macro_news_output(state: AgentState, today_str: str, summary: str,
+                             retrieved_news_count: int, from_cache: bool) -> Dict[str, Any]:
+    agent_name = AGENT_NAME
     show_workflow_status(f"{agent_name}: Execution finished.")
 
     new_message_content = f"Macro News Agent Analysis for {today_str} (from_cache={from_cache}):\\n{summary}"
@@ -167,9 +257,6 @@ def macro_news_agent(state: AgentState) -> Dict[str, Any]:
         "llm_summary_preview": summary[:150] + "..." if len(summary) > 150 else summary,
         "loaded_from_cache": from_cache
     }
-    # logger.info(f"--- DEBUG: macro_news_agent COMPLETED ---")
-    # logger.info(
-    # f"--- DEBUG: macro_news_agent RETURN messages: {[msg.name for msg in [new_message]]} ---")
     return {
         "messages": [new_message],
         "data": {**state["data"], "macro_news_analysis_result": summary},
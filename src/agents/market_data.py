@@ -2,6 +2,7 @@ from langchain_core.messages import HumanMessage
 from src.tools.openrouter_config import get_chat_completion
 from src.agents.state import AgentState, show_agent_reasoning, show_workflow_status
 from src.tools.api import get_financial_metrics, get_financial_statements, get_market_data, get_price_history
+from src.tools.price_frame import PriceFrame
 from src.utils.logging_config import setup_logger
 from src.utils.api_utils import agent_endpoint, log_llm_interaction
 
@@ -75,8 +76,8 @@ def market_data_agent(state: AgentState):
         prices_df = pd.DataFrame(
             columns=['close', 'open', 'high', 'low', 'volume'])
 
-    # 转换价格数据为字典格式
-    prices_dict = prices_df.to_dict('records')
+    # 转换为列式价格数据，下游Agent直接取得DataFrame
+    prices = PriceFrame.from_dataframe(prices_df)
 
     # 保存推理信息到metadata供API使用
     market_data_summary = {
@@ -84,7 +85,7 @@ def market_data_agent(state: AgentState):
         "start_date": start_date,
         "end_date": end_date,
         "data_collected": {
-            "price_history": len(prices_dict) > 0,
+            "price_history": len(prices) > 0,
             "financial_metrics": len(financial_metrics) > 0,
             "financial_statements": len(financial_line_items) > 0,
             "market_data": len(market_data) > 0
@@ -100,7 +101,7 @@ def market_data_agent(state: AgentState):
         "messages": messages,
         "data": {
             **data,
-            "prices": prices_dict,
+            "prices": prices,
             "start_date": start_date,
             "end_date": end_date,
             "financial_metrics": financial_metrics,
@@ -4,7 +4,7 @@ import json
 from src.utils.logging_config import setup_logger
 
 from src.agents.state import AgentState, show_agent_reasoning, show_workflow_status
-from src.tools.openrouter_config import get_chat_completion
+from src.tools.openrouter_config import get_chat_completion, aget_chat_completion
 from src.utils.api_utils import agent_endpoint, log_llm_interaction
 
 # 初始化 logger
@@ -29,6 +29,27 @@ def get_latest_message_by_name(messages: list, name: str):
 @agent_endpoint("portfolio_management", "负责投资组合管理和最终交易决策")
 def portfolio_management_agent(state: AgentState):
     """Responsible for portfolio management"""
+    cleaned_messages_for_processing, llm_interaction_messages = _prepare_portfolio_decision(
+        state)
+    llm_response_content = get_chat_completion(llm_interaction_messages)
+    return _build_portfolio_output(state, cleaned_messages_for_processing, llm_response_content)
+
+
+@agent_endpoint("portfolio_management", "负责投资组合管理和最终交易决策")
+async def portfolio_management_agent_async(state: AgentState):
+    """portfolio_management_agent 的异步版本"""
+    cleaned_messages_for_processing, llm_interaction_messages = _prepare_portfolio_decision(
+        state)
+    llm_response_content = await aget_chat_completion(llm_interaction_messages)
+    return _build_portfolio_output(state, cleaned_messages_for_processing, llm_response_content)
+
+
+def _prepare_portfolio_decision(state: AgentState):
+    """整理各Agent的最新消息，构建发给 LLM 的决策提示
+
+    Returns:
+        tuple: (去重后的消息列表, LLM 消息列表)
+    """
     agent_name = "portfolio_management_agent"
     logger.info(f"\n--- DEBUG: {agent_name} START ---")
 
@@ -51,7 +72,6 @@ def portfolio_management_agent(state: AgentState):
     # f"--- DEBUG: {agent_name} CLEANED messages for processing: {[msg.name for msg in cleaned_messages_for_processing]} ---")
 
     show_workflow_status(f"{agent_name}: --- Executing Portfolio Manager ---")
-    show_reasoning_flag = state["metadata"]["show_reasoning"]
     portfolio = state["data"]["portfolio"]
 
     # Get messages from other agents using the cleaned list
@@ -167,7 +187,13 @@ def portfolio_management_agent(state: AgentState):
         agent_name, f"Preparing LLM. User msg includes: TA, FA, Sent, Val, Risk, GeneralMacro, MarketNews.")
 
     llm_interaction_messages = [system_message, user_message]
-    llm_response_content = get_chat_completion(llm_interaction_messages)
+    return cleaned_messages_for_processing, llm_interaction_messages
+
+
+def _build_portfolio_output(state: AgentState, cleaned_messages_for_processing: list, llm_response_content):
+    """记录 LLM 交互，解析交易决策并构建返回状态"""
+    agent_name = "portfolio_management_agent"
+    show_reasoning_flag = state["metadata"]["show_reasoning"]
 
     current_metadata = state["metadata"]
     current_metadata["current_agent_name"] = agent_name
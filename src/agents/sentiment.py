@@ -1,8 +1,10 @@
 from langchain_core.messages import HumanMessage
 from src.agents.state import AgentState, show_agent_reasoning, show_workflow_status
-from src.tools.news_crawler import get_stock_news, get_news_sentiment
+from src.tools.news_crawler import get_news_sentiment, aget_news_sentiment
+from src.tools.news_provider import news_provider
 from src.utils.logging_config import setup_logger
 from src.utils.api_utils import agent_endpoint, log_llm_interaction
+import asyncio
 import json
 from datetime import datetime, timedelta
 
@@ -10,11 +12,21 @@ from datetime import datetime, timedelta
 logger = setup_logger('sentiment_agent')
 
 
+def _get_recent_news(symbol: str, num_of_news: int, run_id: str = None) -> list:
+    """获取股票新闻并过滤出7天内的新闻，同一运行内与宏观分析师共享新闻数据"""
+    news_list = news_provider.get_news(
+        symbol, max_news=num_of_news, run_id=run_id)  # 确保获取足够的新闻
+
+    # 过滤7天内的新闻
+    cutoff_date = datetime.now() - timedelta(days=7)
+    return [news for news in news_list
+            if datetime.strptime(news['publish_time'], '%Y-%m-%d %H:%M:%S') > cutoff_date]
+
+
 @agent_endpoint("sentiment", "情感分析师，分析市场新闻和社交媒体情绪")
 def sentiment_agent(state: AgentState):
     """Responsible for sentiment analysis"""
     show_workflow_status("Sentiment Analyst")
-    show_reasoning = state["metadata"]["show_reasoning"]
     data = state["data"]
     symbol = data["ticker"]
     logger.info(f"正在分析股票: {symbol}")
@@ -22,14 +34,31 @@ def sentiment_agent(state: AgentState):
     num_of_news = data.get("num_of_news", 10)
 
     # 获取新闻数据并分析情感
-    news_list = get_stock_news(symbol, max_news=num_of_news)  # 确保获取足够的新闻
+    recent_news = _get_recent_news(
+        symbol, num_of_news, state["metadata"].get("run_id"))
+    sentiment_score = get_news_sentiment(recent_news, num_of_news=num_of_news)
+    return _build_sentiment_output(state, recent_news, sentiment_score)
 
-    # 过滤7天内的新闻
-    cutoff_date = datetime.now() - timedelta(days=7)
-    recent_news = [news for news in news_list
-                   if datetime.strptime(news['publish_time'], '%Y-%m-%d %H:%M:%S') > cutoff_date]
 
-    sentiment_score = get_news_sentiment(recent_news, num_of_news=num_of_news)
+@agent_endpoint("sentiment", "情感分析师，分析市场新闻和社交媒体情绪")
+async def sentiment_agent_async(state: AgentState):
+    """sentiment_agent 的异步版本，新闻抓取在线程池中执行，LLM调用不阻塞事件循环"""
+    show_workflow_status("Sentiment Analyst")
+    data = state["data"]
+    symbol = data["ticker"]
+    logger.info(f"正在分析股票: {symbol}")
+    num_of_news = data.get("num_of_news", 10)
+
+    recent_news = await asyncio.to_thread(
+        _get_recent_news, symbol, num_of_news, state["metadata"].get("run_id"))
+    sentiment_score = await aget_news_sentiment(recent_news, num_of_news=num_of_news)
+    return _build_sentiment_output(state, recent_news, sentiment_score)
+
+
+def _build_sentiment_output(state: AgentState, recent_news: list, sentiment_score: float):
+    """根据情感得分生成交易信号并构建返回状态"""
+    show_reasoning = state["metadata"]["show_reasoning"]
+    data = state["data"]
 
     # 根据情感分数生成交易信号和置信度
     if sentiment_score >= 0.5:
@@ -35,21 +35,24 @@ def technical_analyst_agent(state: AgentState):
     prices = data["prices"]
     prices_df = prices_to_df(prices)
 
+    # 所有策略共享同一个指标引擎，每个指标只计算一次
+    indicators = IndicatorEngine(prices_df)
+
     # Initialize confidence variable
     confidence = 0.0
 
     # Calculate indicators
     # 1. MACD (Moving Average Convergence Divergence)
-    macd_line, signal_line = calculate_macd(prices_df)
+    macd_line, signal_line = indicators.macd()
 
     # 2. RSI (Relative Strength Index)
-    rsi = calculate_rsi(prices_df)
+    rsi = indicators.rsi(14)
 
     # 3. Bollinger Bands (Bollinger Bands)
-    upper_band, lower_band = calculate_bollinger_bands(prices_df)
+    upper_band, lower_band = indicators.bollinger_bands(20)
 
     # 4. OBV (On-Balance Volume)
-    obv = calculate_obv(prices_df)
+    obv = indicators.obv()
 
     # Generate individual signals
     signals = []
@@ -148,19 +151,20 @@ def technical_analyst_agent(state: AgentState):
     }
 
     # 1. Trend Following Strategy
-    trend_signals = calculate_trend_signals(prices_df)
+    trend_signals = calculate_trend_signals(prices_df, indicators)
 
     # 2. Mean Reversion Strategy
-    mean_reversion_signals = calculate_mean_reversion_signals(prices_df)
+    mean_reversion_signals = calculate_mean_reversion_signals(
+        prices_df, indicators)
 
     # 3. Momentum Strategy
-    momentum_signals = calculate_momentum_signals(prices_df)
+    momentum_signals = calculate_momentum_signals(prices_df, indicators)
 
     # 4. Volatility Strategy
-    volatility_signals = calculate_volatility_signals(prices_df)
+    volatility_signals = calculate_volatility_signals(prices_df, indicators)
 
     # 5. Statistical Arbitrage Signals
-    stat_arb_signals = calculate_stat_arb_signals(prices_df)
+    stat_arb_signals = calculate_stat_arb_signals(prices_df, indicators)
 
     # Combine all signals using a weighted ensemble approach
     strategy_weights = {
@@ -236,20 +240,19 @@ def technical_analyst_agent(state: AgentState):
     }
 
 
-def calculate_trend_signals(prices_df):
+def calculate_trend_signals(prices_df, indicators=None):
     """
     Advanced trend following strategy using multiple timeframes and indicators
     """
+    indicators = indicators or IndicatorEngine(prices_df)
+
     # Calculate EMAs for multiple timeframes
-    ema_8 = calculate_ema(prices_df, 8)
-    ema_21 = calculate_ema(prices_df, 21)
-    ema_55 = calculate_ema(prices_df, 55)
+    ema_8 = indicators.ema(8)
+    ema_21 = indicators.ema(21)
+    ema_55 = indicators.ema(55)
 
     # Calculate ADX for trend strength
-    adx = calculate_adx(prices_df, 14)
-
-    # Calculate Ichimoku Cloud
-    ichimoku = calculate_ichimoku(prices_df)
+    adx = indicators.adx(14)
 
     # Determine trend direction and strength
     short_trend = ema_8 > ema_21
@@ -279,21 +282,23 @@ def calculate_trend_signals(prices_df):
     }
 
 
-def calculate_mean_reversion_signals(prices_df):
+def calculate_mean_reversion_signals(prices_df, indicators=None):
     """
     Mean reversion strategy using statistical measures and Bollinger Bands
     """
+    indicators = indicators or IndicatorEngine(prices_df)
+
     # Calculate z-score of price relative to moving average
-    ma_50 = prices_df['close'].rolling(window=50).mean()
-    std_50 = prices_df['close'].rolling(window=50).std()
+    ma_50 = indicators.rolling_mean('close', 50)
+    std_50 = indicators.rolling_std('close', 50)
     z_score = (prices_df['close'] - ma_50) / std_50
 
     # Calculate Bollinger Bands
-    bb_upper, bb_lower = calculate_bollinger_bands(prices_df)
+    bb_upper, bb_lower = indicators.bollinger_bands(20)
 
     # Calculate RSI with multiple timeframes
-    rsi_14 = calculate_rsi(prices_df, 14)
-    rsi_28 = calculate_rsi(prices_df, 28)
+    rsi_14 = indicators.rsi(14)
+    rsi_28 = indicators.rsi(28)
 
     # Mean reversion signals
     extreme_z_score = abs(z_score.iloc[-1]) > 2
@@ -323,18 +328,20 @@ def calculate_mean_reversion_signals(prices_df):
     }
 
 
-def calculate_momentum_signals(prices_df):
+def calculate_momentum_signals(prices_df, indicators=None):
     """
     Multi-factor momentum strategy with conservative settings
     """
+    indicators = indicators or IndicatorEngine(prices_df)
+
     # Price momentum with adjusted min_periods
-    returns = prices_df['close'].pct_change()
+    returns = indicators.returns()
     mom_1m = returns.rolling(21, min_periods=5).sum()  # 短期动量允许较少数据点
     mom_3m = returns.rolling(63, min_periods=42).sum()  # 中期动量要求更多数据点
     mom_6m = returns.rolling(126, min_periods=63).sum()  # 长期动量保持严格要求
 
     # Volume momentum
-    volume_ma = prices_df['volume'].rolling(21, min_periods=10).mean()
+    volume_ma = indicators.rolling_mean('volume', 21, min_periods=10)
     volume_momentum = prices_df['volume'] / volume_ma
 
     # 处理NaN值
@@ -374,11 +381,12 @@ def calculate_momentum_signals(prices_df):
     }
 
 
-def calculate_volatility_signals(prices_df):
+def calculate_volatility_signals(prices_df, indicators=None):
     """
     Optimized volatility calculation with shorter lookback periods
     """
-    returns = prices_df['close'].pct_change()
+    indicators = indicators or IndicatorEngine(prices_df)
+    returns = indicators.returns()
 
     # 使用更短的周期和最小周期要求计算历史波动率
     hist_vol = returns.rolling(21, min_periods=10).std() * math.sqrt(252)
@@ -392,7 +400,7 @@ def calculate_volatility_signals(prices_df):
     vol_z_score = (hist_vol - vol_ma) / vol_std.replace(0, np.nan)
 
     # ATR计算优化
-    atr = calculate_atr(prices_df, period=14, min_periods=7)
+    atr = indicators.atr(period=14, min_periods=7)
     atr_ratio = atr / prices_df['close']
 
     # 如果关键指标为NaN，使用替代值而不是直接返回中性信号
@@ -427,19 +435,21 @@ def calculate_volatility_signals(prices_df):
     }
 
 
-def calculate_stat_arb_signals(prices_df):
+def calculate_stat_arb_signals(prices_df, indicators=None):
     """
     Optimized statistical arbitrage signals with shorter lookback periods
     """
+    indicators = indicators or IndicatorEngine(prices_df)
+
     # Calculate price distribution statistics
-    returns = prices_df['close'].pct_change()
+    returns = indicators.returns()
 
     # 使用更短的周期计算偏度和峰度
     skew = returns.rolling(42, min_periods=21).skew()
     kurt = returns.rolling(42, min_periods=21).kurt()
 
     # 优化Hurst指数计算
-    hurst = calculate_hurst_exponent(prices_df['close'], max_lag=10)
+    hurst = indicators.hurst_exponent(max_lag=10)
 
     # 处理NaN值
     if pd.isna(skew.iloc[-1]):
@@ -524,6 +534,91 @@ def normalize_pandas(obj):
     return obj
 
 
+class IndicatorEngine:
+    """
+    Memoizing indicator engine bound to a single price DataFrame.
+
+    Each distinct (indicator, params) series is computed at most once, so the
+    strategy functions can share RSI, Bollinger Bands, ATR, etc. instead of
+    rebuilding them independently.
+    """
+
+    def __init__(self, prices_df: pd.DataFrame):
+        self.prices_df = prices_df
+        self._cache: Dict[tuple, object] = {}
+
+    def _memo(self, key: tuple, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def returns(self) -> pd.Series:
+        return self._memo(('returns',), lambda: self.prices_df['close'].pct_change())
+
+    def rolling_mean(self, column: str, window: int, min_periods: int = None) -> pd.Series:
+        return self._memo(
+            ('rolling_mean', column, window, min_periods),
+            lambda: self.prices_df[column].rolling(
+                window, min_periods=min_periods).mean()
+        )
+
+    def rolling_std(self, column: str, window: int, min_periods: int = None) -> pd.Series:
+        return self._memo(
+            ('rolling_std', column, window, min_periods),
+            lambda: self.prices_df[column].rolling(
+                window, min_periods=min_periods).std()
+        )
+
+    def ema(self, window: int) -> pd.Series:
+        return self._memo(('ema', window), lambda: calculate_ema(self.prices_df, window))
+
+    def macd(self) -> tuple[pd.Series, pd.Series]:
+        return self._memo(('macd',), lambda: calculate_macd(self.prices_df))
+
+    def rsi(self, period: int = 14) -> pd.Series:
+        return self._memo(('rsi', period), lambda: calculate_rsi(self.prices_df, period))
+
+    def bollinger_bands(self, window: int = 20) -> tuple[pd.Series, pd.Series]:
+        return self._memo(
+            ('bollinger_bands', window),
+            lambda: calculate_bollinger_bands(self.prices_df, window)
+        )
+
+    def adx(self, period: int = 14) -> pd.DataFrame:
+        return self._memo(('adx', period), lambda: calculate_adx(self.prices_df, period))
+
+    def atr(self, period: int = 14, min_periods: int = 7) -> pd.Series:
+        return self._memo(('atr', period, min_periods), lambda: self._compute_atr(period, min_periods))
+
+    def _compute_atr(self, period: int, min_periods: int) -> pd.Series:
+        """
+        Reuse the 14-day ATR already computed by get_price_history when present.
+
+        That column is a full-window rolling mean of the same true range, so only
+        the first period-1 rows (where min_periods applies) need recomputing.
+        """
+        precomputed = self.prices_df.get('atr')
+        if precomputed is None or period != 14 or len(self.prices_df) < period:
+            return calculate_atr(self.prices_df, period=period, min_periods=min_periods)
+
+        head = calculate_atr(self.prices_df.iloc[:period - 1],
+                             period=period, min_periods=min_periods)
+        return pd.concat([head, precomputed.iloc[period - 1:].astype(float)])
+
+    def obv(self) -> pd.Series:
+        return self._memo(('obv',), lambda: calculate_obv(self.prices_df))
+
+    def ichimoku(self) -> Dict[str, pd.Series]:
+        return self._memo(('ichimoku',), lambda: calculate_ichimoku(self.prices_df))
+
+    def hurst_exponent(self, max_lag: int = 10) -> float:
+        return self._memo(
+            ('hurst_exponent', max_lag),
+            lambda: calculate_hurst_exponent(
+                self.prices_df['close'], max_lag=max_lag)
+        )
+
+
 def calculate_macd(prices_df: pd.DataFrame) -> tuple[pd.Series, pd.Series]:
     ema_12 = prices_df['close'].ewm(span=12, adjust=False).mean()
     ema_26 = prices_df['close'].ewm(span=26, adjust=False).mean()
@@ -577,38 +672,32 @@ def calculate_adx(df: pd.DataFrame, period: int = 14) -> pd.DataFrame:
         period: Period for calculations
 
     Returns:
-        DataFrame with ADX values
+        DataFrame with ADX values (the input frame is not modified)
     """
+    high = df['high'].to_numpy(dtype=float)
+    low = df['low'].to_numpy(dtype=float)
+    close = df['close'].to_numpy(dtype=float)
+
     # Calculate True Range
-    df['high_low'] = df['high'] - df['low']
-    df['high_close'] = abs(df['high'] - df['close'].shift())
-    df['low_close'] = abs(df['low'] - df['close'].shift())
-    df['tr'] = df[['high_low', 'high_close', 'low_close']].max(axis=1)
+    tr = _true_range(high, low, close)
 
     # Calculate Directional Movement
-    df['up_move'] = df['high'] - df['high'].shift()
-    df['down_move'] = df['low'].shift() - df['low']
-
-    df['plus_dm'] = np.where(
-        (df['up_move'] > df['down_move']) & (df['up_move'] > 0),
-        df['up_move'],
-        0
-    )
-    df['minus_dm'] = np.where(
-        (df['down_move'] > df['up_move']) & (df['down_move'] > 0),
-        df['down_move'],
-        0
-    )
+    up_move = high - _shift(high)
+    down_move = _shift(low) - low
+    with np.errstate(invalid='ignore'):
+        plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0.0)
+        minus_dm = np.where((down_move > up_move) &
+                            (down_move > 0), down_move, 0.0)
 
     # Calculate ADX
-    df['+di'] = 100 * (df['plus_dm'].ewm(span=period).mean() /
-                       df['tr'].ewm(span=period).mean())
-    df['-di'] = 100 * (df['minus_dm'].ewm(span=period).mean() /
-                       df['tr'].ewm(span=period).mean())
-    df['dx'] = 100 * abs(df['+di'] - df['-di']) / (df['+di'] + df['-di'])
-    df['adx'] = df['dx'].ewm(span=period).mean()
+    tr_ewm = _ewm_mean(tr, period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        plus_di = 100 * (_ewm_mean(plus_dm, period) / tr_ewm)
+        minus_di = 100 * (_ewm_mean(minus_dm, period) / tr_ewm)
+        dx = 100 * np.abs(plus_di - minus_di) / (plus_di + minus_di)
+    adx = _ewm_mean(dx, period)
 
-    return df[['adx', '+di', '-di']]
+    return pd.DataFrame({'adx': adx, '+di': plus_di, '-di': minus_di}, index=df.index)
 
 
 def calculate_ichimoku(df: pd.DataFrame) -> Dict[str, pd.Series]:
@@ -663,12 +752,12 @@ def calculate_atr(df: pd.DataFrame, period: int = 14, min_periods: int = 7) -> p
     Returns:
         pd.Series: ATR values
     """
-    high_low = df['high'] - df['low']
-    high_close = abs(df['high'] - df['close'].shift())
-    low_close = abs(df['low'] - df['close'].shift())
-
-    ranges = pd.concat([high_low, high_close, low_close], axis=1)
-    true_range = ranges.max(axis=1)
+    true_range = pd.Series(
+        _true_range(df['high'].to_numpy(dtype=float),
+                    df['low'].to_numpy(dtype=float),
+                    df['close'].to_numpy(dtype=float)),
+        index=df.index
+    )
 
     return true_range.rolling(period, min_periods=min_periods).mean()
 
@@ -713,13 +802,38 @@ def calculate_hurst_exponent(price_series: pd.Series, max_lag: int = 10) -> floa
 
 
 def calculate_obv(prices_df: pd.DataFrame) -> pd.Series:
-    obv = [0]
-    for i in range(1, len(prices_df)):
-        if prices_df['close'].iloc[i] > prices_df['close'].iloc[i - 1]:
-            obv.append(obv[-1] + prices_df['volume'].iloc[i])
-        elif prices_df['close'].iloc[i] < prices_df['close'].iloc[i - 1]:
-            obv.append(obv[-1] - prices_df['volume'].iloc[i])
-        else:
-            obv.append(obv[-1])
-    prices_df['OBV'] = obv
-    return prices_df['OBV']
+    """
+    Calculate On-Balance Volume without iterating rows or modifying the input frame
+    """
+    close = prices_df['close'].to_numpy(dtype=float)
+    volume = prices_df['volume'].to_numpy()
+
+    # +1 for an up day, -1 for a down day, 0 for unchanged (or undefined) days
+    direction = np.zeros(len(close), dtype=np.int8)
+    if len(close) > 1:
+        with np.errstate(invalid='ignore'):
+            change = close[1:] - close[:-1]
+            direction[1:] = np.where(change > 0, 1, np.where(change < 0, -1, 0))
+
+    obv = np.cumsum(direction * volume)
+    return pd.Series(obv, index=prices_df.index, name='OBV')
+
+
+def _shift(values: np.ndarray) -> np.ndarray:
+    """Shift an array forward by one bar, filling the first slot with NaN"""
+    shifted = np.empty_like(values, dtype=float)
+    if len(values):
+        shifted[0] = np.nan
+        shifted[1:] = values[:-1]
+    return shifted
+
+
+def _true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """True range as the NaN-skipping max of high-low, |high-prev close| and |low-prev close|"""
+    prev_close = _shift(close)
+    return np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+
+
+def _ewm_mean(values: np.ndarray, span: int) -> np.ndarray:
+    """Exponentially weighted mean (pandas default adjust=True) as a NumPy array"""
+    return pd.Series(values).ewm(span=span).mean().to_numpy()
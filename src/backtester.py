@@ -2,27 +2,38 @@ from datetime import datetime, timedelta
 import json
 import time
 import logging
-import matplotlib.pyplot as plt
+import threading
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from src.tools.api import get_price_data
-from src.main import run_hedge_fund
+from src.main import run_hedge_fund, run_signal_phase, run_decision_phase
+from src.tools.openrouter_config import get_llm_failure_count
 import sys
-import matplotlib
 import os
 
-# 根据操作系统配置中文字体
-if sys.platform.startswith('win'):
-    # Windows系统
-    matplotlib.rc('font', family='Microsoft YaHei')
-elif sys.platform.startswith('linux'):
-    # Linux系统
-    matplotlib.rc('font', family='WenQuanYi Micro Hei')
-else:
-    # macOS系统
-    matplotlib.rc('font', family='PingFang SC')
 
-# 用来正常显示负号
-matplotlib.rcParams['axes.unicode_minus'] = False
+def _load_pyplot():
+    """导入 matplotlib 并配置中文字体
+
+    matplotlib 导入和字体配置较慢，只在绘制回测结果时才执行。
+    """
+    import matplotlib
+    import matplotlib.pyplot as plt
+
+    # 根据操作系统配置中文字体
+    if sys.platform.startswith('win'):
+        # Windows系统
+        matplotlib.rc('font', family='Microsoft YaHei')
+    elif sys.platform.startswith('linux'):
+        # Linux系统
+        matplotlib.rc('font', family='WenQuanYi Micro Hei')
+    else:
+        # macOS系统
+        matplotlib.rc('font', family='PingFang SC')
+
+    # 用来正常显示负号
+    matplotlib.rcParams['axes.unicode_minus'] = False
+    return plt
 
 
 class Backtester:
@@ -35,6 +46,8 @@ class Backtester:
         self.portfolio = {"cash": initial_capital, "stock": 0}
         self.portfolio_values = []
         self.num_of_news = num_of_news
+        # 回测区间内的价格数据，按日期索引，在 run_backtest 开始时一次性加载
+        self.price_history = None
         # 设置回测日志
         self.setup_backtest_logging()
         self.logger = self.setup_logging()
@@ -43,6 +56,11 @@ class Backtester:
         self._api_call_count = 0
         self._api_window_start = time.time()
         self._last_api_call = 0
+        # 并行回测的多个线程共享同一个调用配额
+        self._api_lock = threading.Lock()
+
+        # 因智能体调用失败而按"持有"处理的交易日: [(日期, 失败阶段), ...]
+        self.hold_fallback_days = []
 
         # 验证输入参数
         self.validate_inputs()
@@ -75,98 +93,156 @@ class Backtester:
             self.logger.error(f"输入参数验证失败: {str(e)}")
             raise
 
-    def get_agent_decision(self, current_date, lookback_start, portfolio):
-        """获取智能体决策，包含 API 限制处理"""
-        max_retries = 3
-
-        # 检查并重置 API 时间窗口
-        current_time = time.time()
-        if current_time - self._api_window_start >= 60:
-            self._api_call_count = 0
-            self._api_window_start = current_time
-
-        # 如果达到 API 限制，等待新的时间窗口
-        if self._api_call_count >= 8:  # 预留余量
-            wait_time = 60 - (current_time - self._api_window_start)
-            if wait_time > 0:
-                time.sleep(wait_time)
+    def _wait_for_api_slot(self):
+        """等待 API 调用配额：每分钟最多 8 次，两次调用间隔至少 6 秒
+
+        线程安全，等待期间持有锁，多个线程依次取得配额。
+        """
+        with self._api_lock:
+            # 检查并重置 API 时间窗口
+            current_time = time.time()
+            if current_time - self._api_window_start >= 60:
                 self._api_call_count = 0
-                self._api_window_start = time.time()
+                self._api_window_start = current_time
 
+            # 如果达到 API 限制，等待新的时间窗口
+            if self._api_call_count >= 8:  # 预留余量
+                wait_time = 60 - (current_time - self._api_window_start)
+                if wait_time > 0:
+                    time.sleep(wait_time)
+                    self._api_call_count = 0
+                    self._api_window_start = time.time()
+
+            # 确保调用间隔至少 6 秒
+            if self._last_api_call:
+                time_since_last_call = time.time() - self._last_api_call
+                if time_since_last_call < 6:
+                    time.sleep(6 - time_since_last_call)
+
+            # 更新调用时间和计数
+            self._last_api_call = time.time()
+            self._api_call_count += 1
+
+    def _run_id(self, current_date_str):
+        return f"backtest_{self.ticker}_{current_date_str.replace('-', '')}"
+
+    @staticmethod
+    def _call_checked(run_id, call):
+        """调用智能体，期间有 LLM 调用失败时抛出异常
+
+        LLM 调用失败（限流、API 错误）时 Agent 不会抛出异常，而是以默认信号代替，
+        因此通过运行内的失败次数识别结果已降级的调用，交给重试逻辑处理。
+        """
+        failures_before = get_llm_failure_count(run_id)
+        result = call()
+        failed_calls = get_llm_failure_count(run_id) - failures_before
+        if failed_calls > 0:
+            raise RuntimeError(f"{failed_calls} 次 LLM 调用失败，智能体信号已降级")
+        return result
+
+    def _generate_signals(self, current_date):
+        """运行单个交易日的信号阶段，LLM 调用失败时抛出异常"""
+        current_date_str = current_date.strftime("%Y-%m-%d")
+        lookback_start = (current_date - timedelta(days=30)).strftime("%Y-%m-%d")
+        run_id = self._run_id(current_date_str)
+        return self._call_checked(run_id, lambda: run_signal_phase(
+            run_id=run_id,
+            ticker=self.ticker,
+            start_date=lookback_start,
+            end_date=current_date_str,
+            num_of_news=self.num_of_news
+        ))
+
+    def _throttled_signals(self, current_date):
+        """第一阶段的线程任务，与其他线程共享 API 调用配额"""
+        self._wait_for_api_slot()
+        return self._generate_signals(current_date)
+
+    def _call_with_retries(self, call, description, max_retries=3):
+        """按 API 限制节流调用智能体，失败时重试，全部失败后抛出最后一次的异常
+
+        触发 AFC 限制时等待 60 秒后重试，其他错误按指数退避重试。
+        """
+        last_error = None
         for attempt in range(max_retries):
+            self._wait_for_api_slot()
             try:
-                # 确保调用间隔至少 6 秒
-                if self._last_api_call:
-                    time_since_last_call = time.time() - self._last_api_call
-                    if time_since_last_call < 6:
-                        sleep_time = 6 - time_since_last_call
-                        time.sleep(sleep_time)
-
-                # 更新调用时间和计数
-                self._last_api_call = time.time()
-                self._api_call_count += 1
-
-                # 调用智能体并解析结果
-                result = self.agent(
+                return call()
+            except Exception as e:
+                last_error = e
+                if "AFC is enabled" in str(e):
+                    self.logger.warning(f"触发 AFC 限制，等待 60 秒后重试...")
+                    time.sleep(60)
+                    with self._api_lock:
+                        self._api_call_count = 0
+                        self._api_window_start = time.time()
+                    continue
+
+                self.logger.warning(
+                    f"{description}失败 (尝试 {attempt + 1}/{max_retries}): {str(e)}")
+                if attempt < max_retries - 1:
+                    time.sleep(2 ** attempt)
+        raise last_error
+
+    def get_agent_decision(self, current_date, lookback_start, portfolio):
+        """获取智能体决策，包含 API 限制处理"""
+        run_id = self._run_id(current_date)
+        try:
+            result = self._call_with_retries(
+                lambda: self._call_checked(run_id, lambda: self.agent(
                     ticker=self.ticker,
                     start_date=lookback_start,
                     end_date=current_date,
                     portfolio=portfolio,
                     num_of_news=self.num_of_news,
-                    run_id=f"backtest_{self.ticker}_{current_date.replace('-', '')}"
-                )
-
-                try:
-                    # 尝试解析返回的字符串为 JSON
-                    if isinstance(result, str):
-                        # 清理可能的markdown标记
-                        result = result.replace(
-                            '```json\n', '').replace('\n```', '').strip()
-                        print(f"---------------result------------\n: {result}")
-                        parsed_result = json.loads(result)
-
-                        # 构建标准格式的结果
-                        formatted_result = {
-                            "decision": parsed_result,  # 保持原始决策结构
-                            "analyst_signals": {}
+                    run_id=run_id
+                )),
+                "获取智能体决策")
+        except Exception:
+            self.hold_fallback_days.append((current_date, "decision"))
+            return {"decision": {"action": "hold", "quantity": 0}, "analyst_signals": {}}
+        # 调用智能体并解析结果
+        return self.parse_agent_result(result)
+
+    def parse_agent_result(self, result):
+        """将智能体返回的结果解析为标准格式的决策"""
+        try:
+            # 尝试解析返回的字符串为 JSON
+            if isinstance(result, str):
+                # 清理可能的markdown标记
+                result = result.replace(
+                    '```json\n', '').replace('\n```', '').strip()
+                print(f"---------------result------------\n: {result}")
+                parsed_result = json.loads(result)
+
+                # 构建标准格式的结果
+                formatted_result = {
+                    "decision": parsed_result,  # 保持原始决策结构
+                    "analyst_signals": {}
+                }
+
+                # 处理智能体信号
+                if "agent_signals" in parsed_result:
+                    formatted_result["analyst_signals"] = {
+                        signal["agent"]: {
+                            "signal": signal.get("signal", "unknown"),
+                            "confidence": signal.get("confidence", 0)
                         }
-
-                        # 处理智能体信号
-                        if "agent_signals" in parsed_result:
-                            formatted_result["analyst_signals"] = {
-                                signal["agent"]: {
-                                    "signal": signal.get("signal", "unknown"),
-                                    "confidence": signal.get("confidence", 0)
-                                }
-                                for signal in parsed_result["agent_signals"]
-                            }
-
-                        self.logger.info(
-                            f"解析后的决策: {formatted_result['decision']}")  # 添加日志
-                        return formatted_result
-                    return result
-                except json.JSONDecodeError as e:
-                    # 如果无法解析为 JSON，记录错误并返回默认决策
-                    self.logger.warning(f"JSON解析错误: {str(e)}")
-                    self.logger.warning(f"原始返回结果: {result}")
-                    return {
-                        "decision": {"action": "hold", "quantity": 0},
-                        "analyst_signals": {}
+                        for signal in parsed_result["agent_signals"]
                     }
 
-            except Exception as e:
-                if "AFC is enabled" in str(e):
-                    self.logger.warning(f"触发 AFC 限制，等待 60 秒后重试...")
-                    time.sleep(60)
-                    self._api_call_count = 0
-                    self._api_window_start = time.time()
-                    continue
-
-                self.logger.warning(
-                    f"获取智能体决策失败 (尝试 {attempt + 1}/{max_retries}): {str(e)}")
-                if attempt == max_retries - 1:
-                    return {"decision": {"action": "hold", "quantity": 0}, "analyst_signals": {}}
-                time.sleep(2 ** attempt)
+                self.logger.info(
+                    f"解析后的决策: {formatted_result['decision']}")  # 添加日志
+                return formatted_result
+            return result
+        except json.JSONDecodeError as e:
+            # 如果无法解析为 JSON，记录错误并返回默认决策
+            self.logger.warning(f"JSON解析错误: {str(e)}")
+            self.logger.warning(f"原始返回结果: {result}")
+            return {
+                "decision": {"action": "hold", "quantity": 0},
+                "analyst_signals": {}
+            }
 
     def parse_decision_from_text(self, text):
         """从文本中解析交易决策"""
@@ -248,10 +324,38 @@ class Backtester:
         self.backtest_logger.info(f"初始资金: {self.initial_capital:,.2f}\n")
         self.backtest_logger.info("-" * 100)
 
+    def prefetch_price_history(self, lookback_days=30):
+        """一次性获取整个回测区间（含回看期）的价格数据，并按日期建立索引"""
+        fetch_start = (datetime.strptime(self.start_date, "%Y-%m-%d") -
+                       timedelta(days=lookback_days)).strftime("%Y-%m-%d")
+        df = get_price_data(self.ticker, fetch_start, self.end_date)
+        if df is None or df.empty:
+            self.logger.warning(f"未获取到 {self.ticker} 的价格数据")
+            self.price_history = pd.DataFrame()
+            return self.price_history
+
+        df = df.copy()
+        df["date"] = pd.to_datetime(df["date"])
+        self.price_history = df.sort_values("date").set_index("date", drop=False)
+        self.logger.info(
+            f"已加载价格数据 {len(self.price_history)} 条 ({fetch_start} 至 {self.end_date})")
+        return self.price_history
+
+    def get_price_window(self, start_date, end_date):
+        """从内存中的价格数据获取 [start_date, end_date] 区间的行情"""
+        if self.price_history is None:
+            self.prefetch_price_history()
+        if self.price_history.empty:
+            return self.price_history
+        return self.price_history.loc[pd.Timestamp(start_date):pd.Timestamp(end_date)]
+
     def run_backtest(self):
         """运行回测"""
         dates = pd.date_range(self.start_date, self.end_date, freq="B")
 
+        # 预先加载整个回测区间的价格数据，避免每个交易日重复下载
+        self.prefetch_price_history()
+
         self.logger.info("\n开始回测...")
         print(f"{'日期':<12} {'代码':<6} {'操作':<6} {'数量':>8} {'价格':>8} {'现金':>12} {'持仓':>8} {'总值':>12} {'看多':>8} {'看空':>8} {'中性':>8}")
         print("-" * 110)
@@ -265,87 +369,167 @@ class Backtester:
             output = self.get_agent_decision(
                 current_date_str, lookback_start, self.portfolio)
 
-            # 记录每个智能体的信号和分析结果
-            self.backtest_logger.info(f"\n交易日期: {current_date_str}")
-            if "analyst_signals" in output:
-                self.backtest_logger.info("\n各智能体分析结果:")
-                for agent_name, signal in output["analyst_signals"].items():
-                    self.backtest_logger.info(f"\n{agent_name}:")
-
-                    # 记录信号和置信度
-                    signal_str = f"- 信号: {signal.get('signal', 'unknown')}"
-                    if 'confidence' in signal:
-                        signal_str += f", 置信度: {signal.get('confidence', 0)*100:.0f}%"
-                    self.backtest_logger.info(signal_str)
-
-                    # 记录分析结果
-                    if 'analysis' in signal:
-                        self.backtest_logger.info("- 分析结果:")
-                        analysis = signal['analysis']
-                        if isinstance(analysis, dict):
-                            for key, value in analysis.items():
-                                self.backtest_logger.info(f"  {key}: {value}")
-                        elif isinstance(analysis, list):
-                            for item in analysis:
-                                self.backtest_logger.info(f"  • {item}")
-                        else:
-                            self.backtest_logger.info(f"  {analysis}")
-
-                    # 记录理由
-                    if 'reason' in signal:
-                        self.backtest_logger.info("- 决策理由:")
-                        reason = signal['reason']
-                        if isinstance(reason, list):
-                            for item in reason:
-                                self.backtest_logger.info(f"  • {item}")
-                        else:
-                            self.backtest_logger.info(f"  • {reason}")
-
-                    # 记录其他可能的指标
-                    for key, value in signal.items():
-                        if key not in ['signal', 'confidence', 'analysis', 'reason']:
-                            self.backtest_logger.info(f"- {key}: {value}")
-
-                self.backtest_logger.info("\n综合决策:")
-
-            agent_decision = output.get(
-                "decision", {"action": "hold", "quantity": 0})
-            action, quantity = agent_decision.get(
-                "action", "hold"), agent_decision.get("quantity", 0)
-
-            # 记录决策详情
-            self.backtest_logger.info(f"行动: {action.upper()}")
-            self.backtest_logger.info(f"数量: {quantity}")
-            if "reason" in agent_decision:
-                self.backtest_logger.info(f"决策理由: {agent_decision['reason']}")
-
-            # 获取当前价格并执行交易
-            df = get_price_data(self.ticker, lookback_start, current_date_str)
-            if df is None or df.empty:
-                continue
-
-            current_price = df.iloc[-1]['open']
-            executed_quantity = self.execute_trade(
-                action, quantity, current_price)
-
-            # 更新组合总值
-            total_value = self.portfolio["cash"] + \
-                self.portfolio["stock"] * current_price
-            self.portfolio["portfolio_value"] = total_value
-
-            # 计算当日收益率
-            if len(self.portfolio_values) > 0:
-                daily_return = (
-                    total_value / self.portfolio_values[-1]["Portfolio Value"] - 1) * 100
-            else:
-                daily_return = 0
+            self.process_trading_day(current_date, lookback_start, output)
+        self.report_fallback_days()
 
-            # 记录组合价值和收益率
-            self.portfolio_values.append({
-                "Date": current_date,
-                "Portfolio Value": total_value,
-                "Daily Return": daily_return
-            })
+    def run_backtest_parallel(self, max_workers=4):
+        """两阶段并行回测
+
+        第一阶段使用有界线程池并发计算所有交易日与投资组合无关的信号
+        （技术、基本面、情绪、估值、宏观、多空研究员和辩论室），
+        第二阶段按日期顺序依次运行依赖投资组合的风险管理和投资组合管理。
+        """
+        dates = pd.date_range(self.start_date, self.end_date, freq="B")
+        self.prefetch_price_history()
+
+        self.logger.info(
+            f"\n第一阶段: 并发生成 {len(dates)} 个交易日的信号 (workers={max_workers})...")
+        signal_states = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self._throttled_signals, current_date): current_date
+                       for current_date in dates}
+            failed_dates = []
+            for future in as_completed(futures):
+                current_date = futures[future]
+                try:
+                    signal_states[current_date] = future.result()
+                except Exception as e:
+                    self.logger.warning(
+                        f"生成 {current_date.strftime('%Y-%m-%d')} 的信号失败: {str(e)}")
+                    failed_dates.append(current_date)
+
+        # 失败（含 LLM 调用失败导致信号降级）的交易日按串行回测的节流和重试逻辑逐日重新生成
+        if failed_dates:
+            self.logger.info(
+                f"\n重新串行生成 {len(failed_dates)} 个失败交易日的信号...")
+        for current_date in sorted(failed_dates):
+            current_date_str = current_date.strftime("%Y-%m-%d")
+            try:
+                signal_states[current_date] = self._call_with_retries(
+                    lambda: self._generate_signals(current_date),
+                    f"生成 {current_date_str} 的信号")
+            except Exception:
+                self.hold_fallback_days.append((current_date_str, "signal"))
+
+        self.logger.info("\n第二阶段: 按日期顺序模拟投资组合...")
+        print(f"{'日期':<12} {'代码':<6} {'操作':<6} {'数量':>8} {'价格':>8} {'现金':>12} {'持仓':>8} {'总值':>12} {'看多':>8} {'看空':>8} {'中性':>8}")
+        print("-" * 110)
+
+        for current_date in dates:
+            lookback_start = (current_date - timedelta(days=30)
+                              ).strftime("%Y-%m-%d")
+            output = {"decision": {"action": "hold",
+                                   "quantity": 0}, "analyst_signals": {}}
+            signal_state = signal_states.get(current_date)
+            if signal_state is not None:
+                try:
+                    run_id = signal_state["metadata"]["run_id"]
+                    result = self._call_with_retries(
+                        lambda: self._call_checked(
+                            run_id, lambda: run_decision_phase(signal_state, self.portfolio)),
+                        f"生成 {current_date.strftime('%Y-%m-%d')} 的交易决策")
+                    output = self.parse_agent_result(result)
+                except Exception:
+                    self.hold_fallback_days.append(
+                        (current_date.strftime("%Y-%m-%d"), "decision"))
+            self.process_trading_day(current_date, lookback_start, output)
+        self.report_fallback_days()
+
+    def report_fallback_days(self):
+        """报告因智能体调用失败而按"持有"处理的交易日，这些交易日会使回测结果失真"""
+        if not self.hold_fallback_days:
+            return
+        days = ", ".join(f"{d}({stage})" for d, stage in self.hold_fallback_days)
+        message = f"{len(self.hold_fallback_days)} 个交易日因智能体调用失败按持有处理: {days}"
+        print(f"\n警告: {message}")
+        self.logger.warning(message)
+        self.backtest_logger.warning(message)
+
+    def process_trading_day(self, current_date, lookback_start, output):
+        """记录智能体输出，按当日开盘价执行交易并更新组合价值"""
+        current_date_str = current_date.strftime("%Y-%m-%d")
+
+        # 记录每个智能体的信号和分析结果
+        self.backtest_logger.info(f"\n交易日期: {current_date_str}")
+        if "analyst_signals" in output:
+            self.backtest_logger.info("\n各智能体分析结果:")
+            for agent_name, signal in output["analyst_signals"].items():
+                self.backtest_logger.info(f"\n{agent_name}:")
+
+                # 记录信号和置信度
+                signal_str = f"- 信号: {signal.get('signal', 'unknown')}"
+                if 'confidence' in signal:
+                    signal_str += f", 置信度: {signal.get('confidence', 0)*100:.0f}%"
+                self.backtest_logger.info(signal_str)
+
+                # 记录分析结果
+                if 'analysis' in signal:
+                    self.backtest_logger.info("- 分析结果:")
+                    analysis = signal['analysis']
+                    if isinstance(analysis, dict):
+                        for key, value in analysis.items():
+                            self.backtest_logger.info(f"  {key}: {value}")
+                    elif isinstance(analysis, list):
+                        for item in analysis:
+                            self.backtest_logger.info(f"  • {item}")
+                    else:
+                        self.backtest_logger.info(f"  {analysis}")
+
+                # 记录理由
+                if 'reason' in signal:
+                    self.backtest_logger.info("- 决策理由:")
+                    reason = signal['reason']
+                    if isinstance(reason, list):
+                        for item in reason:
+                            self.backtest_logger.info(f"  • {item}")
+                    else:
+                        self.backtest_logger.info(f"  • {reason}")
+
+                # 记录其他可能的指标
+                for key, value in signal.items():
+                    if key not in ['signal', 'confidence', 'analysis', 'reason']:
+                        self.backtest_logger.info(f"- {key}: {value}")
+
+            self.backtest_logger.info("\n综合决策:")
+
+        agent_decision = output.get(
+            "decision", {"action": "hold", "quantity": 0})
+        action, quantity = agent_decision.get(
+            "action", "hold"), agent_decision.get("quantity", 0)
+
+        # 记录决策详情
+        self.backtest_logger.info(f"行动: {action.upper()}")
+        self.backtest_logger.info(f"数量: {quantity}")
+        if "reason" in agent_decision:
+            self.backtest_logger.info(f"决策理由: {agent_decision['reason']}")
+
+        # 获取当前价格并执行交易
+        df = self.get_price_window(lookback_start, current_date_str)
+        if df is None or df.empty:
+            return
+
+        current_price = df.iloc[-1]['open']
+        executed_quantity = self.execute_trade(
+            action, quantity, current_price)
+
+        # 更新组合总值
+        total_value = self.portfolio["cash"] + \
+            self.portfolio["stock"] * current_price
+        self.portfolio["portfolio_value"] = total_value
+
+        # 计算当日收益率
+        if len(self.portfolio_values) > 0:
+            daily_return = (
+                total_value / self.portfolio_values[-1]["Portfolio Value"] - 1) * 100
+        else:
+            daily_return = 0
+
+        # 记录组合价值和收益率
+        self.portfolio_values.append({
+            "Date": current_date,
+            "Portfolio Value": total_value,
+            "Daily Return": daily_return
+        })
 
     def analyze_performance(self):
         """分析回测性能"""
@@ -359,6 +543,7 @@ class Backtester:
         performance_df["Portfolio Value (K)"] = performance_df["Portfolio Value"] / 1000
 
         # 创建两个子图
+        plt = _load_pyplot()
         fig, (ax1, ax2) = plt.subplots(
             2, 1, figsize=(12, 10), height_ratios=[1, 1])
         fig.suptitle("回测结果分析", fontsize=12)
@@ -417,6 +602,8 @@ class Backtester:
         self.backtest_logger.info(
             f"最终总值: {self.portfolio['portfolio_value']:,.2f}")
         self.backtest_logger.info(f"总收益率: {total_return * 100:.2f}%")
+        self.backtest_logger.info(
+            f"按持有处理的失败交易日: {len(self.hold_fallback_days)}")
 
         # 计算夏普比率
         daily_returns = performance_df["Daily Return"] / 100  # 转换为小数
@@ -452,6 +639,8 @@ if __name__ == "__main__":
                         default=100000, help='初始资金 (默认: 100000)')
     parser.add_argument('--num-of-news', type=int, default=5,
                         help='Number of news articles to analyze for sentiment (default: 5)')
+    parser.add_argument('--parallel-workers', type=int, default=0,
+                        help='并发生成信号的线程数，大于0时启用两阶段并行回测 (默认: 0，逐日串行)')
 
     args = parser.parse_args()
 
@@ -466,7 +655,10 @@ if __name__ == "__main__":
     )
 
     # 运行回测
-    backtester.run_backtest()
+    if args.parallel_workers > 0:
+        backtester.run_backtest_parallel(max_workers=args.parallel_workers)
+    else:
+        backtester.run_backtest()
 
     # 分析性能
     performance_df = backtester.analyze_performance()
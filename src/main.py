@@ -1,30 +1,32 @@
 import sys
+import os
+import json
 import argparse
 import uuid  # Import uuid for run IDs
 import threading  # Import threading for background task
-import uvicorn  # Import uvicorn to run FastAPI
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from datetime import datetime, timedelta
 # Removed START as it's implicit with set_entry_point
 from langgraph.graph import END, StateGraph
 from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableLambda
 import pandas as pd
-import akshare as ak
 
 # --- Agent Imports ---
 from src.agents.valuation import valuation_agent
 from src.agents.state import AgentState
-from src.agents.sentiment import sentiment_agent
+from src.agents.sentiment import sentiment_agent, sentiment_agent_async
 from src.agents.risk_manager import risk_management_agent
 from src.agents.technicals import technical_analyst_agent
-from src.agents.portfolio_manager import portfolio_management_agent
+from src.agents.portfolio_manager import portfolio_management_agent, portfolio_management_agent_async
 from src.agents.market_data import market_data_agent
 from src.agents.fundamentals import fundamentals_agent
 from src.agents.researcher_bull import researcher_bull_agent
 from src.agents.researcher_bear import researcher_bear_agent
-from src.agents.debate_room import debate_room_agent
-from src.agents.macro_analyst import macro_analyst_agent
-from src.agents.macro_news_agent import macro_news_agent
+from src.agents.debate_room import debate_room_agent, debate_room_agent_async
+from src.agents.macro_analyst import macro_analyst_agent, macro_analyst_agent_async
+from src.agents.macro_news_agent import macro_news_agent, macro_news_agent_async
 
 # --- Logging and Backend Imports ---
 from src.utils.output_logger import OutputLogger
@@ -34,7 +36,7 @@ from src.utils.llm_interaction_logger import (
     set_global_log_storage
 )
 from backend.dependencies import get_log_storage
-from backend.main import app as fastapi_app
+from backend.events import publish_run_event
 from src.utils.logging_config import setup_logger
 
 # --- Import Summary Report Generator ---
@@ -61,6 +63,16 @@ logger = setup_logger('main_workflow')
 # --- Run the Hedge Fund Workflow ---
 
 
+def _publish_final_decision(run_id: str, final_state: dict):
+    """将最终决策推送到运行事件流，需在 workflow_run 结束前调用"""
+    content = final_state["messages"][-1].content
+    try:
+        decision = json.loads(content)
+    except (TypeError, ValueError):
+        decision = content
+    publish_run_event(run_id, "final_decision", decision=decision)
+
+
 def run_hedge_fund(run_id: str, ticker: str, start_date: str, end_date: str, portfolio: dict, show_reasoning: bool = False, num_of_news: int = 5, show_summary: bool = False):
     print(f"--- Starting Workflow Run ID: {run_id} ---")
     try:
@@ -91,6 +103,7 @@ def run_hedge_fund(run_id: str, ticker: str, start_date: str, end_date: str, por
         with workflow_run(run_id):
             final_state = app.invoke(initial_state)
             print(f"--- Finished Workflow Run ID: {run_id} ---")
+            _publish_final_decision(run_id, final_state)
             
             if HAS_SUMMARY_REPORT and show_summary:
                 store_final_state(final_state)
@@ -123,6 +136,50 @@ def run_hedge_fund(run_id: str, ticker: str, start_date: str, end_date: str, por
     return final_state["messages"][-1].content
 
 
+async def arun_hedge_fund(run_id: str, ticker: str, start_date: str, end_date: str, portfolio: dict, show_reasoning: bool = False, num_of_news: int = 5) -> str:
+    """run_hedge_fund 的异步版本
+
+    通过 app.ainvoke 执行工作流，调用 LLM 的节点使用异步实现，
+    多个股票的分析可以在同一个事件循环中并发运行，例如:
+        await asyncio.gather(*(arun_hedge_fund(...) for ticker in tickers))
+    """
+    initial_state = {
+        "messages": [],
+        "data": {
+            "ticker": ticker,
+            "portfolio": portfolio,
+            "start_date": start_date,
+            "end_date": end_date,
+            "num_of_news": num_of_news,
+        },
+        "metadata": {
+            "show_reasoning": show_reasoning,
+            "run_id": run_id,
+            "show_summary": False,
+        }
+    }
+
+    from backend.utils.context_managers import workflow_run
+    with workflow_run(run_id):
+        final_state = await app.ainvoke(initial_state)
+        _publish_final_decision(run_id, final_state)
+    logger.info(f"--- Finished Async Workflow Run ID: {run_id} ---")
+    return final_state["messages"][-1].content
+
+
+# --- LLM-bound nodes with both sync and async implementations ---
+# app.invoke runs the sync versions; app.ainvoke awaits the async ones so that
+# many analyses can share a single event loop while waiting on the LLM.
+sentiment_node = RunnableLambda(sentiment_agent, afunc=sentiment_agent_async)
+macro_news_node = RunnableLambda(
+    macro_news_agent, afunc=macro_news_agent_async)
+debate_room_node = RunnableLambda(
+    debate_room_agent, afunc=debate_room_agent_async)
+macro_analyst_node = RunnableLambda(
+    macro_analyst_agent, afunc=macro_analyst_agent_async)
+portfolio_management_node = RunnableLambda(
+    portfolio_management_agent, afunc=portfolio_management_agent_async)
+
 # --- Define the Workflow Graph ---
 workflow = StateGraph(AgentState)
 
@@ -130,28 +187,30 @@ workflow = StateGraph(AgentState)
 workflow.add_node("market_data_agent", market_data_agent)
 workflow.add_node("technical_analyst_agent", technical_analyst_agent)
 workflow.add_node("fundamentals_agent", fundamentals_agent)
-workflow.add_node("sentiment_agent", sentiment_agent)
+workflow.add_node("sentiment_agent", sentiment_node)
 workflow.add_node("valuation_agent", valuation_agent)
-workflow.add_node("macro_news_agent", macro_news_agent)  # 新闻 agent
+workflow.add_node("macro_news_agent", macro_news_node)  # 新闻 agent
 workflow.add_node("researcher_bull_agent", researcher_bull_agent)
 workflow.add_node("researcher_bear_agent", researcher_bear_agent)
-workflow.add_node("debate_room_agent", debate_room_agent)
+workflow.add_node("debate_room_agent", debate_room_node)
 workflow.add_node("risk_management_agent", risk_management_agent)
-workflow.add_node("macro_analyst_agent", macro_analyst_agent)
-workflow.add_node("portfolio_management_agent", portfolio_management_agent)
+workflow.add_node("macro_analyst_agent", macro_analyst_node)
+workflow.add_node("portfolio_management_agent", portfolio_management_node)
 
 # Set entry point
 workflow.set_entry_point("market_data_agent")
 
-# Edges from market_data_agent to the five parallel agents
+# Edges from market_data_agent to the parallel agents
 workflow.add_edge("market_data_agent", "technical_analyst_agent")
 workflow.add_edge("market_data_agent", "fundamentals_agent")
 workflow.add_edge("market_data_agent", "sentiment_agent")
 workflow.add_edge("market_data_agent", "valuation_agent")
 # macro_news_agent 也从 market_data_agent 并行出来
 workflow.add_edge("market_data_agent", "macro_news_agent")
+# macro_analyst_agent 只依赖个股新闻，与分析师并行运行，不再排在风险管理之后
+workflow.add_edge("market_data_agent", "macro_analyst_agent")
 
-# Main analysis path (technical, fundamentals, sentiment, valuation -> researchers -> ... -> macro_analyst)
+# Main analysis path (technical, fundamentals, sentiment, valuation -> researchers -> debate -> risk)
 workflow.add_edge("technical_analyst_agent", "researcher_bull_agent")
 workflow.add_edge("fundamentals_agent", "researcher_bull_agent")
 workflow.add_edge("sentiment_agent", "researcher_bull_agent")
@@ -166,24 +225,278 @@ workflow.add_edge("researcher_bull_agent", "debate_room_agent")
 workflow.add_edge("researcher_bear_agent", "debate_room_agent")
 
 workflow.add_edge("debate_room_agent", "risk_management_agent")
-workflow.add_edge("risk_management_agent", "macro_analyst_agent")
 
-# Edges to portfolio_management_agent (汇聚点)
-# macro_analyst_agent (end of main analysis path) and macro_news_agent (parallel news path)
-# both feed into portfolio_management_agent.
-# LangGraph will wait for both parent nodes to complete before running portfolio_management_agent.
-workflow.add_edge("macro_analyst_agent", "portfolio_management_agent")
-workflow.add_edge("macro_news_agent", "portfolio_management_agent")
+# Join at portfolio_management_agent (汇聚点)
+# The three branches have different lengths. Separate add_edge calls would trigger
+# portfolio_management_agent once per finished branch, so a single multi-source edge
+# is used: LangGraph waits for all three parents before running it exactly once.
+workflow.add_edge(
+    ["risk_management_agent", "macro_analyst_agent", "macro_news_agent"],
+    "portfolio_management_agent")
 
 # Final node
 workflow.add_edge("portfolio_management_agent", END)
 
 app = workflow.compile()
 
+# --- Two-Phase Workflow Graphs (used by parallel backtests) ---
+# Phase 1: portfolio-independent signal generation. Safe to run concurrently for many dates.
+signal_workflow = StateGraph(AgentState)
+signal_workflow.add_node("market_data_agent", market_data_agent)
+signal_workflow.add_node("technical_analyst_agent", technical_analyst_agent)
+signal_workflow.add_node("fundamentals_agent", fundamentals_agent)
+signal_workflow.add_node("sentiment_agent", sentiment_node)
+signal_workflow.add_node("valuation_agent", valuation_agent)
+signal_workflow.add_node("macro_news_agent", macro_news_node)
+signal_workflow.add_node("researcher_bull_agent", researcher_bull_agent)
+signal_workflow.add_node("researcher_bear_agent", researcher_bear_agent)
+signal_workflow.add_node("debate_room_agent", debate_room_node)
+signal_workflow.add_node("macro_analyst_agent", macro_analyst_node)
+
+signal_workflow.set_entry_point("market_data_agent")
+for analyst in ["technical_analyst_agent", "fundamentals_agent", "sentiment_agent", "valuation_agent"]:
+    signal_workflow.add_edge("market_data_agent", analyst)
+    signal_workflow.add_edge(analyst, "researcher_bull_agent")
+    signal_workflow.add_edge(analyst, "researcher_bear_agent")
+signal_workflow.add_edge("market_data_agent", "macro_news_agent")
+signal_workflow.add_edge("market_data_agent", "macro_analyst_agent")
+signal_workflow.add_edge("researcher_bull_agent", "debate_room_agent")
+signal_workflow.add_edge("researcher_bear_agent", "debate_room_agent")
+signal_workflow.add_edge(
+    ["debate_room_agent", "macro_analyst_agent", "macro_news_agent"], END)
+
+signal_app = signal_workflow.compile()
+
+# --- Per-Ticker Workflow Graph (used by batch runs) ---
+# Same as the main graph without macro_news_agent: the market-wide 沪深300 summary is
+# produced once per batch and injected into every ticker's initial state.
+ticker_workflow = StateGraph(AgentState)
+ticker_workflow.add_node("market_data_agent", market_data_agent)
+ticker_workflow.add_node("technical_analyst_agent", technical_analyst_agent)
+ticker_workflow.add_node("fundamentals_agent", fundamentals_agent)
+ticker_workflow.add_node("sentiment_agent", sentiment_node)
+ticker_workflow.add_node("valuation_agent", valuation_agent)
+ticker_workflow.add_node("researcher_bull_agent", researcher_bull_agent)
+ticker_workflow.add_node("researcher_bear_agent", researcher_bear_agent)
+ticker_workflow.add_node("debate_room_agent", debate_room_node)
+ticker_workflow.add_node("risk_management_agent", risk_management_agent)
+ticker_workflow.add_node("macro_analyst_agent", macro_analyst_node)
+ticker_workflow.add_node(
+    "portfolio_management_agent", portfolio_management_node)
+
+ticker_workflow.set_entry_point("market_data_agent")
+for analyst in ["technical_analyst_agent", "fundamentals_agent", "sentiment_agent", "valuation_agent"]:
+    ticker_workflow.add_edge("market_data_agent", analyst)
+    ticker_workflow.add_edge(analyst, "researcher_bull_agent")
+    ticker_workflow.add_edge(analyst, "researcher_bear_agent")
+ticker_workflow.add_edge("market_data_agent", "macro_analyst_agent")
+ticker_workflow.add_edge("researcher_bull_agent", "debate_room_agent")
+ticker_workflow.add_edge("researcher_bear_agent", "debate_room_agent")
+ticker_workflow.add_edge("debate_room_agent", "risk_management_agent")
+ticker_workflow.add_edge(
+    ["risk_management_agent", "macro_analyst_agent"], "portfolio_management_agent")
+ticker_workflow.add_edge("portfolio_management_agent", END)
+
+ticker_app = ticker_workflow.compile()
+
+# Phase 2: portfolio-dependent stages, replayed sequentially on top of a phase-1 state.
+decision_workflow = StateGraph(AgentState)
+decision_workflow.add_node("risk_management_agent", risk_management_agent)
+decision_workflow.add_node(
+    "portfolio_management_agent", portfolio_management_node)
+decision_workflow.set_entry_point("risk_management_agent")
+decision_workflow.add_edge("risk_management_agent",
+                           "portfolio_management_agent")
+decision_workflow.add_edge("portfolio_management_agent", END)
+
+decision_app = decision_workflow.compile()
+
+
+def run_signal_phase(run_id: str, ticker: str, start_date: str, end_date: str, show_reasoning: bool = False, num_of_news: int = 5) -> dict:
+    """运行与投资组合无关的信号生成阶段，返回该阶段结束时的完整状态"""
+    initial_state = {
+        "messages": [],
+        "data": {
+            "ticker": ticker,
+            "portfolio": None,  # 信号阶段不依赖投资组合
+            "start_date": start_date,
+            "end_date": end_date,
+            "num_of_news": num_of_news,
+        },
+        "metadata": {
+            "show_reasoning": show_reasoning,
+            "run_id": run_id,
+            "show_summary": False,
+        }
+    }
+    from backend.utils.context_managers import workflow_run
+    with workflow_run(run_id):
+        return signal_app.invoke(initial_state)
+
+
+def run_decision_phase(signal_state: dict, portfolio: dict) -> str:
+    """基于信号阶段的状态和当前投资组合，依次运行风险管理和投资组合管理"""
+    decision_state = {
+        "messages": list(signal_state["messages"]),
+        "data": {**signal_state["data"], "portfolio": portfolio},
+        "metadata": dict(signal_state["metadata"]),
+    }
+    from backend.utils.context_managers import workflow_run
+    with workflow_run(decision_state["metadata"]["run_id"]):
+        final_state = decision_app.invoke(decision_state)
+    return final_state["messages"][-1].content
+
+
+def load_tickers_file(path: str) -> list:
+    """读取股票列表文件，每行一个代码（也支持逗号分隔），忽略空行和 # 注释"""
+    tickers = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0]
+            for ticker in line.replace(',', ' ').split():
+                if ticker not in tickers:
+                    tickers.append(ticker)
+    return tickers
+
+
+def _run_market_wide_stages(batch_id: str, start_date: str, end_date: str, show_reasoning: bool) -> dict:
+    """运行与个股无关的阶段：沪深300宏观新闻总结和全市场行情快照，每个批次只运行一次
+
+    Returns:
+        dict: 需要注入每只股票初始状态的 messages / data / metadata
+    """
+    from src.tools.spot_cache import get_spot_snapshot
+
+    # 预先下载行情快照，避免各股票并发请求时排队等待同一次下载
+    try:
+        get_spot_snapshot()
+    except Exception as e:
+        logger.warning(f"预取全市场行情快照失败: {e}")
+
+    macro_state = {
+        "messages": [],
+        "data": {"ticker": None, "start_date": start_date, "end_date": end_date},
+        "metadata": {"show_reasoning": show_reasoning, "run_id": batch_id, "show_summary": False},
+    }
+    from backend.utils.context_managers import workflow_run
+    with workflow_run(batch_id):
+        macro_output = macro_news_node.invoke(macro_state)
+    return {
+        "messages": list(macro_output["messages"]),
+        "data": {"macro_news_analysis_result": macro_output["data"].get("macro_news_analysis_result")},
+        "metadata": {k: v for k, v in macro_output["metadata"].items() if k.startswith("macro_news_agent")},
+    }
+
+
+def _run_batch_ticker(ticker: str, batch_id: str, shared: dict, start_date: str, end_date: str,
+                      portfolio: dict, show_reasoning: bool, num_of_news: int) -> dict:
+    """运行单只股票的工作流，返回一条批次结果记录"""
+    run_id = str(uuid.uuid4())
+    initial_state = {
+        "messages": list(shared["messages"]),
+        "data": {
+            **shared["data"],
+            "ticker": ticker,
+            "portfolio": dict(portfolio),
+            "start_date": start_date,
+            "end_date": end_date,
+            "num_of_news": num_of_news,
+        },
+        "metadata": {
+            **shared["metadata"],
+            "show_reasoning": show_reasoning,
+            "run_id": run_id,
+            "batch_id": batch_id,
+            "show_summary": False,
+        }
+    }
+    started = datetime.now()
+    record = {"batch_id": batch_id, "run_id": run_id, "ticker": ticker}
+    try:
+        from backend.utils.context_managers import workflow_run
+        with workflow_run(run_id):
+            final_state = ticker_app.invoke(initial_state)
+        content = final_state["messages"][-1].content
+        try:
+            decision = json.loads(content.replace(
+                '```json\n', '').replace('\n```', '').strip())
+        except (json.JSONDecodeError, AttributeError):
+            decision = content
+        record.update({"status": "completed", "decision": decision})
+    except Exception as e:
+        logger.error(f"批量分析 {ticker} 失败: {e}")
+        record.update({"status": "error", "error": str(e)})
+    record["duration_seconds"] = round(
+        (datetime.now() - started).total_seconds(), 3)
+    return record
+
+
+def run_hedge_fund_batch(tickers: list, start_date: str, end_date: str, portfolio: dict,
+                         output_path: str = None, max_concurrency: int = 4,
+                         show_reasoning: bool = False, num_of_news: int = 5) -> list:
+    """批量分析多只股票
+
+    沪深300宏观新闻总结和全市场行情快照每个批次只运行一次，结果注入每只股票的工作流；
+    各股票的工作流在线程池中并发执行，每完成一只即向 output_path 追加一行 JSON。
+
+    Args:
+        tickers: 股票代码列表
+        start_date: 开始日期 (YYYY-MM-DD)
+        end_date: 结束日期 (YYYY-MM-DD)
+        portfolio: 每只股票使用的初始投资组合，如 {"cash": 100000, "stock": 0}
+        output_path: JSONL 结果文件路径，为空时不写文件
+        max_concurrency: 同时分析的股票数量上限
+        show_reasoning: 是否显示各 Agent 的推理过程
+        num_of_news: 情绪分析使用的新闻条数
+
+    Returns:
+        list: 按 tickers 顺序排列的结果记录
+    """
+    batch_id = str(uuid.uuid4())
+    logger.info(
+        f"--- Starting Batch {batch_id}: {len(tickers)} tickers, concurrency {max_concurrency} ---")
+    shared = _run_market_wide_stages(
+        batch_id, start_date, end_date, show_reasoning)
+
+    output_file = None
+    if output_path:
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        output_file = open(output_path, 'a', encoding='utf-8')
+    write_lock = threading.Lock()
+
+    results = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+            futures = {
+                executor.submit(_run_batch_ticker, ticker, batch_id, shared, start_date, end_date,
+                                portfolio, show_reasoning, num_of_news): ticker
+                for ticker in tickers
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                record = future.result()
+                results[futures[future]] = record
+                logger.info(
+                    f"[{done}/{len(tickers)}] {record['ticker']}: {record['status']} ({record['duration_seconds']}s)")
+                if output_file:
+                    with write_lock:
+                        output_file.write(json.dumps(
+                            record, ensure_ascii=False, default=str) + "\n")
+                        output_file.flush()
+    finally:
+        if output_file:
+            output_file.close()
+
+    logger.info(f"--- Finished Batch {batch_id} ---")
+    return [results[ticker] for ticker in tickers]
+
 # --- FastAPI Background Task ---
 
 
 def run_fastapi():
+    # uvicorn 和 FastAPI 应用只在启动服务时才导入
+    import uvicorn
+    from backend.main import app as fastapi_app
+
     print("--- Starting FastAPI server in background (port 8000) ---")
     uvicorn.run(fastapi_app, host="0.0.0.0", port=8000, log_config=None)
 
@@ -194,8 +507,11 @@ if __name__ == "__main__":
     fastapi_thread.start()
     parser = argparse.ArgumentParser(
         description='Run the hedge fund trading system')
-    parser.add_argument('--ticker', type=str, required=True,
-                        help='Stock ticker symbol')
+    ticker_group = parser.add_mutually_exclusive_group(required=True)
+    ticker_group.add_argument('--ticker', type=str,
+                              help='Stock ticker symbol')
+    ticker_group.add_argument('--tickers-file', type=str,
+                              help='File with one ticker per line; runs a batch analysis')
     parser.add_argument('--start-date', type=str,
                         help='Start date (YYYY-MM-DD). Defaults to 1 year before end date')
     parser.add_argument('--end-date', type=str,
@@ -210,6 +526,10 @@ if __name__ == "__main__":
                         default=0, help='Initial stock position (default: 0)')
     parser.add_argument('--summary', action='store_true',
                         help='Show beautiful summary report at the end')
+    parser.add_argument('--output', type=str,
+                        help='JSONL output path for batch results (default: src/data/batch_results/batch_<end-date>.jsonl)')
+    parser.add_argument('--max-concurrency', type=int, default=4,
+                        help='Number of tickers analysed concurrently in batch mode (default: 4)')
     args = parser.parse_args()
     current_date = datetime.now()
     yesterday = current_date - timedelta(days=1)
@@ -226,6 +546,24 @@ if __name__ == "__main__":
     if args.num_of_news > 100:
         raise ValueError("Number of news articles cannot exceed 100")
     portfolio = {"cash": args.initial_capital, "stock": args.initial_position}
+    if args.tickers_file:
+        tickers = load_tickers_file(args.tickers_file)
+        output_path = args.output or os.path.join(
+            "src", "data", "batch_results", f"batch_{end_date.strftime('%Y-%m-%d')}.jsonl")
+        results = run_hedge_fund_batch(
+            tickers=tickers,
+            start_date=start_date.strftime('%Y-%m-%d'),
+            end_date=end_date.strftime('%Y-%m-%d'),
+            portfolio=portfolio,
+            output_path=output_path,
+            max_concurrency=args.max_concurrency,
+            show_reasoning=args.show_reasoning,
+            num_of_news=args.num_of_news
+        )
+        failed = sum(1 for r in results if r["status"] != "completed")
+        print(f"\nBatch finished: {len(results) - failed}/{len(results)} succeeded, results written to {output_path}")
+        # 有股票分析失败时返回非零退出码，便于定时任务发现失败的批次
+        sys.exit(1 if failed else 0)
     main_run_id = str(uuid.uuid4())
     result = run_hedge_fund(
         run_id=main_run_id,
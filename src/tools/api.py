@@ -1,10 +1,16 @@
 from typing import Dict, Any, List
 import pandas as pd
-import akshare as ak
 from datetime import datetime, timedelta
 import json
 import numpy as np
 from src.utils.logging_config import setup_logger
+from src.tools.spot_cache import get_spot_snapshot, get_spot_quote
+from src.tools.price_frame import PriceFrame, REQUIRED_PRICE_COLUMNS, standardize_price_columns
+from src.tools.price_store import price_store
+from src.utils.tracing import traced_module
+
+# akshare 调用在节点内记录为 data span
+ak = traced_module("akshare")
 
 # 设置日志记录
 logger = setup_logger('api')
@@ -14,19 +20,18 @@ def get_financial_metrics(symbol: str) -> Dict[str, Any]:
     """获取财务指标数据"""
     logger.info(f"Getting financial indicators for {symbol}...")
     try:
-        # 获取实时行情数据（用于市值和估值比率）
+        # 获取实时行情数据（用于市值和估值比率），使用共享的行情快照
         logger.info("Fetching real-time quotes...")
-        realtime_data = ak.stock_zh_a_spot_em()
+        realtime_data = get_spot_snapshot()
         if realtime_data is None or realtime_data.empty:
             logger.warning("No real-time quotes data available")
             return [{}]
 
-        stock_data = realtime_data[realtime_data['代码'] == symbol]
-        if stock_data.empty:
+        stock_data = get_spot_quote(symbol)
+        if stock_data is None:
             logger.warning(f"No real-time quotes found for {symbol}")
             return [{}]
 
-        stock_data = stock_data.iloc[0]
         logger.info("✓ Real-time quotes fetched")
 
         # 获取新浪财务指标
@@ -282,9 +287,10 @@ def get_financial_statements(symbol: str) -> Dict[str, Any]:
 def get_market_data(symbol: str) -> Dict[str, Any]:
     """获取市场数据"""
     try:
-        # 获取实时行情
-        realtime_data = ak.stock_zh_a_spot_em()
-        stock_data = realtime_data[realtime_data['代码'] == symbol].iloc[0]
+        # 获取实时行情（与 get_financial_metrics 共享同一份快照）
+        stock_data = get_spot_quote(symbol)
+        if stock_data is None:
+            raise ValueError(f"No real-time quotes found for {symbol}")
 
         return {
             "market_cap": float(stock_data.get("总市值", 0)),
@@ -362,8 +368,8 @@ def get_price_history(symbol: str, start_date: str = None, end_date: str = None,
         logger.info(f"Start date: {start_date.strftime('%Y-%m-%d')}")
         logger.info(f"End date: {end_date.strftime('%Y-%m-%d')}")
 
-        def get_and_process_data(start_date, end_date):
-            """获取并处理数据，包括重命名列等操作"""
+        def fetch_from_source(start_date, end_date):
+            """从数据源下载数据并重命名列"""
             df = ak.stock_zh_a_hist(
                 symbol=symbol,
                 period="daily",
@@ -394,6 +400,10 @@ def get_price_history(symbol: str, start_date: str = None, end_date: str = None,
             df["date"] = pd.to_datetime(df["date"])
             return df
 
+        def get_and_process_data(start_date, end_date):
+            """获取并处理数据，优先读取本地行情存储，只下载缺失的交易日"""
+            return price_store.load(symbol, start_date, end_date, adjust, fetch_from_source)
+
         # 获取历史行情数据
         df = get_and_process_data(start_date, end_date)
 
@@ -460,66 +470,10 @@ def get_price_history(symbol: str, start_date: str = None, end_date: str = None,
         df["atr_ratio"] = df["atr"] / df["close"]
 
         # 计算统计套利指标
-        # 1. 赫斯特指数 (使用过去120天的数据)
-        def calculate_hurst(series):
-            """
-            计算Hurst指数。
-
-            Args:
-                series: 价格序列
-
-            Returns:
-                float: Hurst指数，或在计算失败时返回np.nan
-            """
-            try:
-                series = series.dropna()
-                if len(series) < 30:  # 降低最小数据点要求
-                    return np.nan
-
-                # 使用对数收益率
-                log_returns = np.log(series / series.shift(1)).dropna()
-                if len(log_returns) < 30:  # 降低最小数据点要求
-                    return np.nan
-
-                # 使用更小的lag范围
-                # 减少lag范围到2-10天
-                lags = range(2, min(11, len(log_returns) // 4))
-
-                # 计算每个lag的标准差
-                tau = []
-                for lag in lags:
-                    # 计算滚动标准差
-                    std = log_returns.rolling(window=lag).std().dropna()
-                    if len(std) > 0:
-                        tau.append(np.mean(std))
-
-                # 基本的数值检查
-                if len(tau) < 3:  # 进一步降低最小要求
-                    return np.nan
-
-                # 使用对数回归
-                lags_log = np.log(list(lags))
-                tau_log = np.log(tau)
-
-                # 计算回归系数
-                reg = np.polyfit(lags_log, tau_log, 1)
-                hurst = reg[0] / 2.0
-
-                # 只保留基本的数值检查
-                if np.isnan(hurst) or np.isinf(hurst):
-                    return np.nan
-
-                return hurst
-
-            except Exception as e:
-                return np.nan
-
-        # 使用对数收益率计算Hurst指数
+        # 1. 赫斯特指数 (使用过去120天的数据，要求至少60个数据点)
         log_returns = np.log(df["close"] / df["close"].shift(1))
-        df["hurst_exponent"] = log_returns.rolling(
-            window=120,
-            min_periods=60  # 要求至少60个数据点
-        ).apply(calculate_hurst)
+        df["hurst_exponent"] = calculate_rolling_hurst(
+            log_returns, window=120, min_periods=60)
 
         # 2. 偏度 (20日)
         df["skewness"] = returns.rolling(window=20).skew()
@@ -551,41 +505,115 @@ def get_price_history(symbol: str, start_date: str = None, end_date: str = None,
         return pd.DataFrame()
 
 
-def prices_to_df(prices):
-    """Convert price data to DataFrame with standardized column names"""
-    try:
-        df = pd.DataFrame(prices)
-
-        # 标准化列名映射
-        column_mapping = {
-            '收盘': 'close',
-            '开盘': 'open',
-            '最高': 'high',
-            '最低': 'low',
-            '成交量': 'volume',
-            '成交额': 'amount',
-            '振幅': 'amplitude',
-            '涨跌幅': 'change_percent',
-            '涨跌额': 'change_amount',
-            '换手率': 'turnover_rate'
-        }
+def calculate_rolling_hurst(log_returns: pd.Series, window: int = 120, min_periods: int = 60) -> pd.Series:
+    """向量化计算滚动Hurst指数
 
-        # 重命名列
-        for cn, en in column_mapping.items():
-            if cn in df.columns:
-                df[en] = df[cn]
+    与逐窗口执行以下计算的 rolling(window).apply 结果一致：
+    对窗口内序列再取一次对数比值并去除NaN，计算 lag=2..10 的滚动标准差均值 tau，
+    再对 log(lag) 与 log(tau) 做线性回归，Hurst指数为斜率的一半。
 
-        # 确保必要的列存在
-        required_columns = ['close', 'open', 'high', 'low', 'volume']
-        for col in required_columns:
-            if col not in df.columns:
-                df[col] = 0.0  # 使用0填充缺失的必要列
+    由于每个窗口内的序列都是全局序列上的一段连续切片，各lag的滚动标准差只需在
+    全局序列上计算一次，再通过累积和在O(1)时间内求得每个窗口的均值。
 
-        return df
+    Args:
+        log_returns: 对数收益率序列
+        window: 滚动窗口大小
+        min_periods: 窗口内要求的最少非NaN数据点
+
+    Returns:
+        pd.Series: 与 log_returns 同索引的Hurst指数，无法计算时为NaN
+    """
+    values = log_returns.to_numpy(dtype=float)
+    n = len(values)
+    result = np.full(n, np.nan)
+    if n == 0:
+        return pd.Series(result, index=log_returns.index)
+
+    # 去除NaN后的序列 s 及其在原序列中的位置
+    s_pos = np.flatnonzero(~np.isnan(values))
+    s_vals = values[s_pos]
+
+    # 窗口内的二次对数比值：q[k] = log(s[k] / s[k-1])，k >= 1，仅去除NaN（保留±inf）
+    with np.errstate(divide='ignore', invalid='ignore'):
+        q = np.log(s_vals[1:] / s_vals[:-1])
+    x_keep = np.flatnonzero(~np.isnan(q))
+    x_vals = q[x_keep]
+    x_k = x_keep + 1  # 每个 x 对应的 s 下标
+    m = len(x_vals)
+
+    # 每个窗口 [i-window+1, i] 在 s 和 x 上对应的切片范围
+    ends = np.arange(n)
+    s_start = np.searchsorted(s_pos, ends - window + 1, side='left')
+    s_end = np.searchsorted(s_pos, ends, side='right')
+    x_start = np.searchsorted(x_k, s_start + 1, side='left')
+    x_end = np.searchsorted(x_k, s_end, side='left')
+    x_len = x_end - x_start
+
+    eligible = (s_end - s_start >= max(min_periods, 30)) & (x_len >= 30)
+    if not eligible.any():
+        return pd.Series(result, index=log_returns.index)
+
+    # lag 上限随窗口内数据量变化：lags = range(2, min(11, len(x) // 4))
+    lag_stop = np.minimum(11, x_len // 4)
+    all_lags = np.arange(2, 11)
+    log_tau = np.full((n, len(all_lags)), np.nan)
+
+    for j, lag in enumerate(all_lags):
+        active = eligible & (lag < lag_stop)
+        if not active.any() or m < lag:
+            continue
+        # 全局序列上长度为lag的滚动标准差，包含inf的窗口为NaN
+        windows = np.lib.stride_tricks.sliding_window_view(x_vals, lag)
+        with np.errstate(invalid='ignore'):
+            stds = windows.std(axis=1, ddof=1)
+        stds[~np.isfinite(stds)] = np.nan
+        valid = ~np.isnan(stds)
+        csum = np.concatenate(([0.0], np.cumsum(np.where(valid, stds, 0.0))))
+        ccount = np.concatenate(([0], np.cumsum(valid)))
+
+        # stds[t] 对应 x[t : t+lag]，窗口内完整的子窗口为 t ∈ [x_start, x_end-lag]
+        lo = x_start[active]
+        hi = np.maximum(x_end[active] - lag + 1, lo)
+        total = csum[hi] - csum[lo]
+        count = ccount[hi] - ccount[lo]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_tau[active, j] = np.where(
+                count > 0, np.log(total / count), np.nan)
+
+    # 按lag个数分组做线性回归，任一lag缺失tau时结果为NaN
+    for stop in np.unique(lag_stop[eligible]):
+        n_lags = stop - 2
+        if n_lags < 3:
+            continue
+        rows = np.flatnonzero(eligible & (lag_stop == stop))
+        y = log_tau[rows, :n_lags]
+        complete = ~np.isnan(y).any(axis=1)
+        rows, y = rows[complete], y[complete]
+        if len(rows) == 0:
+            continue
+        x = np.log(all_lags[:n_lags].astype(float))
+        x_centered = x - x.mean()
+        with np.errstate(invalid='ignore'):
+            slope = ((y - y.mean(axis=1, keepdims=True)) @ x_centered) / \
+                (x_centered @ x_centered)
+        hurst = slope / 2.0
+        hurst[~np.isfinite(hurst)] = np.nan
+        result[rows] = hurst
+
+    return pd.Series(result, index=log_returns.index)
+
+
+def prices_to_df(prices):
+    """Convert price data to DataFrame with standardized column names"""
+    try:
+        # 列式价格数据已完成列名标准化，直接返回共享底层数组的 DataFrame
+        if isinstance(prices, PriceFrame):
+            return prices.to_dataframe()
+        return standardize_price_columns(pd.DataFrame(prices))
     except Exception as e:
         logger.error(f"Error converting price data: {str(e)}")
         # 返回一个包含必要列的空DataFrame
-        return pd.DataFrame(columns=['close', 'open', 'high', 'low', 'volume'])
+        return pd.DataFrame(columns=REQUIRED_PRICE_COLUMNS)
 
 
 def get_price_data(
@@ -0,0 +1,228 @@
+"""
+LLM 响应缓存
+
+以 (客户端类型, base_url, 模型, 消息, 参数) 的哈希为键，将 LLM 响应持久化到本地 SQLite，
+相同的提示词在不同 Agent、不同运行之间只会请求一次模型服务。
+相同请求并发到达时只有一个会真正调用模型，其余等待并复用结果。
+
+环境变量：
+    - LLM_CACHE_ENABLED：设置为 false 时关闭缓存
+    - LLM_CACHE_PATH：数据库文件路径，默认为 src/data/llm_cache.db
+    - LLM_CACHE_TTL：缓存有效期（秒），默认 604800（7天），0 表示永不过期
+    - LLM_CACHE_MAX_ENTRIES：最大缓存条数，超出后按最近访问时间淘汰，默认 10000
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, Optional
+
+from src.utils.logging_config import setup_logger
+from src.utils.metrics import CACHE_REQUESTS
+
+logger = setup_logger('llm_cache')
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), "data", "llm_cache.db")
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 10000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    model TEXT,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache (last_access);
+"""
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() not in ("0", "false", "no")
+
+
+def make_cache_key(client_type: str, base_url: Optional[str], model: Optional[str],
+                   messages: Any, params: Optional[Dict[str, Any]] = None) -> str:
+    """根据请求内容计算缓存键"""
+    payload = json.dumps({
+        "client_type": client_type,
+        "base_url": base_url,
+        "model": model,
+        "messages": messages,
+        "params": params or {},
+    }, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """基于 SQLite 的 LLM 响应缓存，支持 TTL 过期和 LRU 淘汰"""
+
+    def __init__(self, db_path: Optional[str] = None, ttl: Optional[int] = None,
+                 max_entries: Optional[int] = None, enabled: Optional[bool] = None):
+        self.db_path = db_path or os.getenv(
+            "LLM_CACHE_PATH") or DEFAULT_CACHE_PATH
+        self.ttl = int(os.getenv("LLM_CACHE_TTL", DEFAULT_TTL)
+                       ) if ttl is None else ttl
+        self.max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)
+                               ) if max_entries is None else max_entries
+        self.enabled = _env_flag(
+            "LLM_CACHE_ENABLED", "true") if enabled is None else enabled
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0,
+                       "writes": 0, "expired": 0, "evictions": 0}
+
+        # 正在进行中的请求，用于合并并发的相同请求
+        self._inflight: Dict[str, list] = {}
+        self._inflight_async: Dict[tuple, list] = {}
+        self._inflight_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """首次使用时打开数据库，调用方需持有锁"""
+        if self._conn is None:
+            if self.db_path != ":memory:":
+                os.makedirs(os.path.dirname(
+                    os.path.abspath(self.db_path)), exist_ok=True)
+            self._conn = sqlite3.connect(
+                self.db_path, check_same_thread=False)
+            if self.db_path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key: str, count_miss: bool = True) -> Optional[str]:
+        """读取缓存的响应，不存在或已过期时返回None
+
+        Args:
+            key: 缓存键
+            count_miss: 未命中时是否计入统计，在 single_flight 内复查前的预检查应设为False
+        """
+        if not self.enabled:
+            return None
+        try:
+            with self._lock:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+                now = time.time()
+                if row is None:
+                    if count_miss:
+                        self._stats["misses"] += 1
+                        CACHE_REQUESTS.inc(cache="llm", result="miss")
+                    return None
+                response, created_at = row
+                if self.ttl > 0 and now - created_at > self.ttl:
+                    conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    conn.commit()
+                    self._stats["expired"] += 1
+                    if count_miss:
+                        self._stats["misses"] += 1
+                        CACHE_REQUESTS.inc(cache="llm", result="miss")
+                    return None
+                conn.execute(
+                    "UPDATE llm_cache SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key))
+                conn.commit()
+                self._stats["hits"] += 1
+                CACHE_REQUESTS.inc(cache="llm", result="hit")
+                return response
+        except Exception as e:
+            logger.warning(f"读取 LLM 缓存失败: {e}")
+            return None
+
+    def set(self, key: str, response: str, model: Optional[str] = None):
+        """写入响应，超出容量时淘汰最久未访问的条目"""
+        if not self.enabled or response is None:
+            return
+        try:
+            with self._lock:
+                conn = self._connect()
+                now = time.time()
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, model, response, created_at, last_access, hits) "
+                    "VALUES (?, ?, ?, ?, ?, 0)", (key, model, response, now, now))
+                self._stats["writes"] += 1
+                if self.max_entries > 0:
+                    (count,) = conn.execute(
+                        "SELECT COUNT(*) FROM llm_cache").fetchone()
+                    overflow = count - self.max_entries
+                    if overflow > 0:
+                        conn.execute(
+                            "DELETE FROM llm_cache WHERE key IN "
+                            "(SELECT key FROM llm_cache ORDER BY last_access ASC LIMIT ?)", (overflow,))
+                        self._stats["evictions"] += overflow
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"写入 LLM 缓存失败: {e}")
+
+    def purge_expired(self) -> int:
+        """删除所有过期条目，返回删除的条数"""
+        if self.ttl <= 0:
+            return 0
+        with self._lock:
+            conn = self._connect()
+            cursor = conn.execute(
+                "DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl,))
+            conn.commit()
+            self._stats["expired"] += cursor.rowcount
+            return cursor.rowcount
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM llm_cache")
+            conn.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """返回命中、未命中、写入和淘汰计数"""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    @contextmanager
+    def single_flight(self, key: str):
+        """同一个键同时只允许一个线程调用模型"""
+        with self._inflight_lock:
+            entry = self._inflight.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._inflight_lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    self._inflight.pop(key, None)
+
+    @asynccontextmanager
+    async def asingle_flight(self, key: str):
+        """single_flight 的协程版本，在同一事件循环内合并相同请求"""
+        inflight_key = (id(asyncio.get_running_loop()), key)
+        with self._inflight_lock:
+            entry = self._inflight_async.setdefault(
+                inflight_key, [asyncio.Lock(), 0])
+            entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            with self._inflight_lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    self._inflight_async.pop(inflight_key, None)
+
+
+# 进程级共享实例
+llm_cache = LLMResponseCache()
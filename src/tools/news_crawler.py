@@ -2,12 +2,15 @@ import os
 import sys
 import json
 from datetime import datetime
-import akshare as ak
 import requests
 from bs4 import BeautifulSoup
-from src.tools.openrouter_config import get_chat_completion, logger as api_logger
+from src.tools.openrouter_config import get_chat_completion, aget_chat_completion, logger as api_logger
 import time
 import pandas as pd
+from src.utils.tracing import traced_module
+
+# akshare 调用在节点内记录为 data span
+ak = traced_module("akshare")
 
 
 def get_stock_news(symbol: str, max_news: int = 10) -> list:
@@ -144,51 +147,8 @@ def get_stock_news(symbol: str, max_news: int = 10) -> list:
         return []
 
 
-def get_news_sentiment(news_list: list, num_of_news: int = 5) -> float:
-    """分析新闻情感得分
-
-    Args:
-        news_list (list): 新闻列表
-        num_of_news (int): 用于分析的新闻数量，默认为5条
-
-    Returns:
-        float: 情感得分，范围[-1, 1]，-1最消极，1最积极
-    """
-    if not news_list:
-        return 0.0
-
-    # # 获取项目根目录
-    # project_root = os.path.dirname(os.path.dirname(
-    #     os.path.dirname(os.path.abspath(__file__))))
-
-    # 检查是否有缓存的情感分析结果
-    # 检查是否有缓存的情感分析结果
-    cache_file = "src/data/sentiment_cache.json"
-    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
-
-    # 生成新闻内容的唯一标识
-    news_key = "|".join([
-        f"{news['title']}|{news['content'][:100]}|{news['publish_time']}"
-        for news in news_list[:num_of_news]
-    ])
-
-    # 检查缓存
-    if os.path.exists(cache_file):
-        print("发现情感分析缓存文件")
-        try:
-            with open(cache_file, 'r', encoding='utf-8') as f:
-                cache = json.load(f)
-                if news_key in cache:
-                    print("使用缓存的情感分析结果")
-                    return cache[news_key]
-                print("未找到匹配的情感分析缓存")
-        except Exception as e:
-            print(f"读取情感分析缓存出错: {e}")
-            cache = {}
-    else:
-        print("未找到情感分析缓存文件，将创建新文件")
-        cache = {}
-
+def _build_sentiment_messages(news_list: list, num_of_news: int) -> list:
+    """构建情感分析的LLM消息"""
     # 准备系统消息
     system_message = {
         "role": "system",
@@ -231,33 +191,60 @@ def get_news_sentiment(news_list: list, num_of_news: int = 5) -> float:
         "content": f"请分析以下A股上市公司相关新闻的情感倾向：\n\n{news_content}\n\n请直接返回一个数字，范围是-1到1，无需解释。"
     }
 
+    return [system_message, user_message]
+
+
+def _parse_sentiment_result(result) -> float:
+    """解析LLM返回的情感得分"""
+    if result is None:
+        print("Error: PI error occurred, LLM returned None")
+        return 0.0
+
+    # 提取数字结果
     try:
-        # 获取LLM分析结果
-        result = get_chat_completion([system_message, user_message])
-        if result is None:
-            print("Error: PI error occurred, LLM returned None")
-            return 0.0
+        sentiment_score = float(result.strip())
+    except ValueError as e:
+        print(f"Error parsing sentiment score: {e}")
+        print(f"Raw result: {result}")
+        return 0.0
 
-        # 提取数字结果
-        try:
-            sentiment_score = float(result.strip())
-        except ValueError as e:
-            print(f"Error parsing sentiment score: {e}")
-            print(f"Raw result: {result}")
-            return 0.0
+    # 确保分数在-1到1之间
+    return max(-1.0, min(1.0, sentiment_score))
 
-        # 确保分数在-1到1之间
-        sentiment_score = max(-1.0, min(1.0, sentiment_score))
 
-        # 缓存结果
-        cache[news_key] = sentiment_score
-        try:
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                json.dump(cache, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"Error writing cache: {e}")
+def get_news_sentiment(news_list: list, num_of_news: int = 5) -> float:
+    """分析新闻情感得分
+
+    Args:
+        news_list (list): 新闻列表
+        num_of_news (int): 用于分析的新闻数量，默认为5条
 
-        return sentiment_score
+    Returns:
+        float: 情感得分，范围[-1, 1]，-1最消极，1最积极
+    """
+    if not news_list:
+        return 0.0
+
+    try:
+        # 获取LLM分析结果（相同新闻的重复分析由 LLM 响应缓存直接返回）
+        result = get_chat_completion(
+            _build_sentiment_messages(news_list, num_of_news))
+        return _parse_sentiment_result(result)
+
+    except Exception as e:
+        print(f"Error analyzing news sentiment: {e}")
+        return 0.0  # 出错时返回中性分数
+
+
+async def aget_news_sentiment(news_list: list, num_of_news: int = 5) -> float:
+    """get_news_sentiment 的异步版本"""
+    if not news_list:
+        return 0.0
+
+    try:
+        result = await aget_chat_completion(
+            _build_sentiment_messages(news_list, num_of_news))
+        return _parse_sentiment_result(result)
 
     except Exception as e:
         print(f"Error analyzing news sentiment: {e}")
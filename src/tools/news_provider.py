@@ -0,0 +1,107 @@
+"""
+单次运行内共享的个股新闻
+
+情绪分析师和宏观分析师在同一次运行中都会请求同一只股票的新闻，只是条数不同。
+各自调用 get_stock_news 时，若当天的缓存文件条数不足，每个 Agent 都会触发一次 ak.stock_news_em
+下载并重写缓存文件。此模块在每次运行内只获取一次最大条数的新闻，之后的请求直接从内存中截取。
+
+只保留最近 MAX_RUNS 次运行的新闻，避免长时间运行的服务（如回测、API服务）占用过多内存。
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from src.tools.news_crawler import get_stock_news
+from src.utils.logging_config import setup_logger
+from src.utils.metrics import CACHE_REQUESTS
+
+logger = setup_logger('news_provider')
+
+# get_stock_news 支持的最大新闻条数，一次获取后可满足同一运行内的所有请求
+MAX_NEWS = 100
+# 内存中保留的最近运行数
+MAX_RUNS = 16
+
+
+class RunNewsProvider:
+    """按 (run_id, 股票代码) 缓存新闻，同一运行内并发请求只下载一次"""
+
+    def __init__(self, max_runs: int = MAX_RUNS, fetcher=None):
+        self.max_runs = max_runs
+        self._fetcher = fetcher or get_stock_news
+        self._runs: "OrderedDict[str, Dict[str, list]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 只保存正在下载的 (run_id, 股票代码)，下载结束后移除
+        self._fetch_locks: Dict[Tuple[str, str], threading.Lock] = {}
+
+    def _cached(self, run_id: str, symbol: str) -> Optional[list]:
+        """调用方需持有锁"""
+        run_news = self._runs.get(run_id)
+        if run_news is None:
+            return None
+        self._runs.move_to_end(run_id)
+        return run_news.get(symbol)
+
+    def _fetch_lock(self, run_id: str, symbol: str) -> threading.Lock:
+        with self._lock:
+            return self._fetch_locks.setdefault((run_id, symbol), threading.Lock())
+
+    def get_news(self, symbol: str, max_news: int = 10, run_id: Optional[str] = None) -> list:
+        """获取个股新闻，同一 run_id 内只下载一次
+
+        Args:
+            symbol: 股票代码
+            max_news: 需要的新闻条数，最大100条
+            run_id: 运行ID，为空时直接调用 get_stock_news
+
+        Returns:
+            list: 最多 max_news 条新闻
+        """
+        max_news = min(max_news, MAX_NEWS)
+        if not run_id:
+            return self._fetcher(symbol, max_news=max_news)
+
+        with self._lock:
+            news = self._cached(run_id, symbol)
+        if news is not None:
+            CACHE_REQUESTS.inc(cache="run_news", result="hit")
+            return news[:max_news]
+        CACHE_REQUESTS.inc(cache="run_news", result="miss")
+
+        # 同一运行内并发请求同一只股票时，只有一个线程下载
+        fetch_lock = self._fetch_lock(run_id, symbol)
+        with fetch_lock:
+            with self._lock:
+                news = self._cached(run_id, symbol)
+            if news is None:
+                try:
+                    news = self._fetcher(symbol, max_news=MAX_NEWS)
+                    logger.info(f"运行 {run_id} 获取 {symbol} 新闻 {len(news)} 条，供本次运行内共享")
+                    # 获取失败时不缓存，后续请求可以重试
+                    if news:
+                        self._store(run_id, symbol, news)
+                finally:
+                    # 等待中的线程已持有该锁的引用，之后的请求直接命中缓存或重新下载，
+                    # 因此下载结束后即可移除，空结果或异常也不会遗留锁
+                    with self._lock:
+                        if self._fetch_locks.get((run_id, symbol)) is fetch_lock:
+                            del self._fetch_locks[(run_id, symbol)]
+
+        return news[:max_news]
+
+    def _store(self, run_id: str, symbol: str, news: list):
+        with self._lock:
+            self._runs.setdefault(run_id, {})[symbol] = news
+            self._runs.move_to_end(run_id)
+            while len(self._runs) > self.max_runs:
+                self._runs.popitem(last=False)
+
+    def clear_run(self, run_id: str):
+        """释放某次运行缓存的新闻"""
+        with self._lock:
+            self._runs.pop(run_id, None)
+
+
+# 进程级共享实例
+news_provider = RunNewsProvider()
@@ -1,11 +1,13 @@
 import os
+import threading
 import time
-from google import genai
+from collections import OrderedDict
 from dotenv import load_dotenv
 from dataclasses import dataclass
-import backoff
 from src.utils.logging_config import setup_logger, SUCCESS_ICON, ERROR_ICON, WAIT_ICON
 from src.utils.llm_clients import LLMClientFactory
+from src.tools.llm_cache import llm_cache, make_cache_key
+from src.utils.tracing import trace_span, set_span_attributes
 
 # 设置日志记录
 logger = setup_logger('api_calls')
@@ -49,80 +51,210 @@ if not model:
     model = "gemini-1.5-flash"
     logger.info(f"{WAIT_ICON} 使用默认模型: {model}")
 
-# 初始化 Gemini 客户端
-client = genai.Client(api_key=api_key)
-logger.info(f"{SUCCESS_ICON} Gemini 客户端初始化成功")
 
+def __getattr__(name):
+    """模块级 client 在首次访问时才创建（与 get_chat_completion 共享注册表中的同一个实例），
+    避免导入本模块时就加载 Gemini SDK"""
+    if name == "client":
+        return LLMClientFactory.get_client(
+            client_type="gemini", api_key=api_key, model=model).client
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-@backoff.on_exception(
-    backoff.expo,
-    (Exception),
-    max_tries=5,
-    max_time=300,
-    giveup=lambda e: "AFC is enabled" not in str(e)
-)
-def generate_content_with_retry(model, contents, config=None):
-    """带重试机制的内容生成函数"""
+
+# 记录失败（返回None）的 LLM 调用次数的最近运行数
+MAX_FAILURE_TRACKED_RUNS = 1000
+
+# 按 run_id 统计失败的 LLM 调用。Agent 在 LLM 调用失败时会以默认信号代替，
+# 调用方（如回测）据此识别结果已降级的运行
+_llm_failures: "OrderedDict[str, int]" = OrderedDict()
+_llm_failures_lock = threading.Lock()
+
+
+def _record_llm_failure():
     try:
-        logger.info(f"{WAIT_ICON} 正在调用 Gemini API...")
-        logger.debug(f"请求内容: {contents}")
-        logger.debug(f"请求配置: {config}")
-
-        response = client.models.generate_content(
-            model=model,
-            contents=contents,
-            config=config
-        )
-
-        logger.info(f"{SUCCESS_ICON} API 调用成功")
-        logger.debug(f"响应内容: {response.text[:500]}...")
-        return response
-    except Exception as e:
-        error_msg = str(e)
-        if "location" in error_msg.lower():
-            # 使用红色感叹号和红色文字提示
-            logger.info(f"\033[91m❗ Gemini API 地理位置限制错误: 请使用美国节点VPN后重试\033[0m")
-            logger.error(f"详细错误: {error_msg}")
-        elif "AFC is enabled" in error_msg:
-            logger.warning(f"{ERROR_ICON} 触发 API 限制，等待重试... 错误: {error_msg}")
-            time.sleep(5)
-        else:
-            logger.error(f"{ERROR_ICON} API 调用失败: {error_msg}")
-        raise e
-
-
-def get_chat_completion(messages, model=None, max_retries=3, initial_retry_delay=1,
-                        client_type="auto", api_key=None, base_url=None):
+        from src.utils.llm_interaction_logger import current_run_id_context
+    except ImportError:
+        return
+    run_id = current_run_id_context.get()
+    if not run_id:
+        return
+    with _llm_failures_lock:
+        _llm_failures[run_id] = _llm_failures.get(run_id, 0) + 1
+        _llm_failures.move_to_end(run_id)
+        while len(_llm_failures) > MAX_FAILURE_TRACKED_RUNS:
+            _llm_failures.popitem(last=False)
+
+
+def get_llm_failure_count(run_id: str) -> int:
+    """返回运行中失败（返回None）的 LLM 调用次数"""
+    with _llm_failures_lock:
+        return _llm_failures.get(run_id, 0)
+
+
+def _publish_llm_event(event_type, **data):
+    """向当前运行的事件流发布 LLM 调用事件（见 backend/events.py），不在运行中时忽略"""
+    try:
+        from backend.events import publish_run_event
+        from src.utils.llm_interaction_logger import current_agent_name_context, current_run_id_context
+    except ImportError:
+        return
+    publish_run_event(current_run_id_context.get(), event_type,
+                      agent_name=current_agent_name_context.get(), **data)
+
+
+def _cache_key(messages, client_type, api_key, base_url, model):
+    """按解析后的客户端配置计算缓存键（不包含 API 密钥）"""
+    resolved_type, resolved_base_url, resolved_model, _ = LLMClientFactory.resolve_config(
+        client_type, api_key=api_key, base_url=base_url, model=model)
+    return make_cache_key(resolved_type, resolved_base_url, resolved_model, messages), resolved_model
+
+
+def _finish_llm_call(model, response, start):
+    if response is None:
+        _record_llm_failure()
+    _publish_llm_event("llm_call_finished", model=model, success=response is not None,
+                       duration_seconds=time.perf_counter() - start)
+
+
+def get_chat_completion(messages, model=None, max_retries=None, initial_retry_delay=None,
+                        client_type="auto", api_key=None, base_url=None, use_cache=True,
+                        retry_policy=None):
     """
-    获取聊天完成结果，包含重试逻辑
+    获取聊天完成结果，按重试策略在总时限内重试
 
     Args:
         messages: 消息列表，OpenAI 格式
         model: 模型名称（可选）
-        max_retries: 最大重试次数
-        initial_retry_delay: 初始重试延迟（秒）
+        max_retries: 最大尝试次数（可选，覆盖重试策略中的设置）
+        initial_retry_delay: 初始重试延迟（秒，可选，覆盖重试策略中的设置）
         client_type: 客户端类型 ("auto", "gemini", "openai_compatible")
         api_key: API 密钥（可选，仅用于 OpenAI Compatible API）
         base_url: API 基础 URL（可选，仅用于 OpenAI Compatible API）
+        use_cache: 是否使用 LLM 响应缓存，相同请求直接返回缓存结果
+        retry_policy: 重试策略（可选），默认使用当前 Agent 的策略，见 src/utils/retry_policy.py
 
     Returns:
         str: 模型回答内容或 None（如果出错）
     """
+    start = time.perf_counter()
+    _publish_llm_event("llm_call_started", model=model)
+    with trace_span("llm", "llm", model=model, cache_hit=False):
+        response = _get_chat_completion(messages, model, max_retries, initial_retry_delay, client_type,
+                                        api_key, base_url, use_cache, retry_policy)
+    _finish_llm_call(model, response, start)
+    return response
+
+
+def _get_chat_completion(messages, model, max_retries, initial_retry_delay, client_type,
+                         api_key, base_url, use_cache, retry_policy):
     try:
-        # 创建客户端
-        client = LLMClientFactory.create_client(
-            client_type=client_type,
-            api_key=api_key,
-            base_url=base_url,
-            model=model
-        )
-
-        # 获取回答
-        return client.get_completion(
-            messages=messages,
-            max_retries=max_retries,
-            initial_retry_delay=initial_retry_delay
-        )
+        if use_cache and llm_cache.enabled:
+            key, resolved_model = _cache_key(
+                messages, client_type, api_key, base_url, model)
+            cached = llm_cache.get(key, count_miss=False)
+            if cached is not None:
+                logger.info(f"{SUCCESS_ICON} 命中 LLM 响应缓存")
+                set_span_attributes(cache_hit=True)
+                return cached
+            # 相同请求并发时只调用一次模型
+            with llm_cache.single_flight(key):
+                cached = llm_cache.get(key)
+                if cached is not None:
+                    logger.info(f"{SUCCESS_ICON} 命中 LLM 响应缓存")
+                    set_span_attributes(cache_hit=True)
+                    return cached
+                response = _get_completion(messages, model, max_retries, initial_retry_delay, retry_policy,
+                                           client_type, api_key, base_url)
+                llm_cache.set(key, response, model=resolved_model)
+                return response
+
+        return _get_completion(messages, model, max_retries, initial_retry_delay, retry_policy,
+                               client_type, api_key, base_url)
     except Exception as e:
         logger.error(f"{ERROR_ICON} get_chat_completion 发生错误: {str(e)}")
         return None
+
+
+def _get_completion(messages, model, max_retries, initial_retry_delay, retry_policy,
+                    client_type, api_key, base_url):
+    # 从注册表获取可复用的客户端
+    start = time.perf_counter()
+    client = LLMClientFactory.get_client(
+        client_type=client_type,
+        api_key=api_key,
+        base_url=base_url,
+        model=model
+    )
+    logger.debug(
+        f"获取 LLM 客户端耗时: {(time.perf_counter() - start) * 1000:.2f}ms")
+
+    # 获取回答
+    return client.get_completion(
+        messages=messages,
+        max_retries=max_retries,
+        initial_retry_delay=initial_retry_delay,
+        retry_policy=retry_policy
+    )
+
+
+async def aget_chat_completion(messages, model=None, max_retries=None, initial_retry_delay=None,
+                               client_type="auto", api_key=None, base_url=None, use_cache=True,
+                               retry_policy=None):
+    """
+    get_chat_completion 的异步版本，参数和返回值相同
+
+    多个分析任务可以在同一个事件循环中并发等待 LLM 响应，而不必各占一个线程。
+    """
+    start = time.perf_counter()
+    _publish_llm_event("llm_call_started", model=model)
+    with trace_span("llm", "llm", model=model, cache_hit=False):
+        response = await _aget_chat_completion(messages, model, max_retries, initial_retry_delay, client_type,
+                                               api_key, base_url, use_cache, retry_policy)
+    _finish_llm_call(model, response, start)
+    return response
+
+
+async def _aget_chat_completion(messages, model, max_retries, initial_retry_delay, client_type,
+                                api_key, base_url, use_cache, retry_policy):
+    try:
+        if use_cache and llm_cache.enabled:
+            key, resolved_model = _cache_key(
+                messages, client_type, api_key, base_url, model)
+            cached = llm_cache.get(key, count_miss=False)
+            if cached is not None:
+                logger.info(f"{SUCCESS_ICON} 命中 LLM 响应缓存")
+                set_span_attributes(cache_hit=True)
+                return cached
+            async with llm_cache.asingle_flight(key):
+                cached = llm_cache.get(key)
+                if cached is not None:
+                    logger.info(f"{SUCCESS_ICON} 命中 LLM 响应缓存")
+                    set_span_attributes(cache_hit=True)
+                    return cached
+                response = await _aget_completion(messages, model, max_retries, initial_retry_delay, retry_policy,
+                                                  client_type, api_key, base_url)
+                llm_cache.set(key, response, model=resolved_model)
+                return response
+
+        return await _aget_completion(messages, model, max_retries, initial_retry_delay, retry_policy,
+                                      client_type, api_key, base_url)
+    except Exception as e:
+        logger.error(f"{ERROR_ICON} aget_chat_completion 发生错误: {str(e)}")
+        return None
+
+
+async def _aget_completion(messages, model, max_retries, initial_retry_delay, retry_policy,
+                           client_type, api_key, base_url):
+    client = LLMClientFactory.get_client(
+        client_type=client_type,
+        api_key=api_key,
+        base_url=base_url,
+        model=model
+    )
+
+    return await client.aget_completion(
+        messages=messages,
+        max_retries=max_retries,
+        initial_retry_delay=initial_retry_delay,
+        retry_policy=retry_policy
+    )
@@ -0,0 +1,124 @@
+"""
+列式价格数据容器
+
+market_data_agent 获取的日线数据以 PriceFrame 的形式放入 AgentState["data"]["prices"]，
+每个字段保存为一个 NumPy 数组。下游的技术分析师和风险管理师直接取得 DataFrame，
+不再经过 to_dict('records') 和 prices_to_df 的逐行转换与列名重映射。
+需要 JSON 时（如执行日志）再通过 to_dict() 按列转换。
+"""
+
+import threading
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# 中文列名到标准英文列名的映射
+PRICE_COLUMN_MAPPING = {
+    '收盘': 'close',
+    '开盘': 'open',
+    '最高': 'high',
+    '最低': 'low',
+    '成交量': 'volume',
+    '成交额': 'amount',
+    '振幅': 'amplitude',
+    '涨跌幅': 'change_percent',
+    '涨跌额': 'change_amount',
+    '换手率': 'turnover_rate'
+}
+
+# 下游分析必需的列，缺失时以0填充
+REQUIRED_PRICE_COLUMNS = ['close', 'open', 'high', 'low', 'volume']
+
+
+def standardize_price_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """补充标准英文列名和必需列，返回新的 DataFrame，不修改输入"""
+    df = df.copy(deep=False)
+    for cn, en in PRICE_COLUMN_MAPPING.items():
+        if cn in df.columns:
+            df[en] = df[cn]
+    for col in REQUIRED_PRICE_COLUMNS:
+        if col not in df.columns:
+            df[col] = 0.0
+    return df
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, (pd.Timestamp, datetime, date)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+class PriceFrame:
+    """按列保存的价格数据，每列一个等长的 NumPy 数组"""
+
+    __slots__ = ("_columns", "_length", "_df", "_lock")
+
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"价格数据各列长度不一致: {sorted(lengths)}")
+        self._columns = dict(columns)
+        self._length = lengths.pop() if lengths else 0
+        self._df: Optional[pd.DataFrame] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_dataframe(cls, df: Optional[pd.DataFrame]) -> "PriceFrame":
+        """从价格 DataFrame 创建，列名统一为标准英文名"""
+        if df is None:
+            df = pd.DataFrame(columns=REQUIRED_PRICE_COLUMNS)
+        df = standardize_price_columns(df)
+        return cls({str(col): df[col].to_numpy() for col in df.columns})
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict]) -> "PriceFrame":
+        """从 to_dict('records') 格式的价格列表创建，兼容旧格式的状态"""
+        return cls.from_dataframe(pd.DataFrame(list(records)))
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+    def column(self, name: str) -> np.ndarray:
+        """返回某一列的数组（只读视图）"""
+        values = self._columns[name].view()
+        values.flags.writeable = False
+        return values
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """返回共享底层数组的 DataFrame
+
+        DataFrame 只构建一次；每次返回浅拷贝，调用方新增或替换列不会影响其他 Agent。
+        """
+        with self._lock:
+            if self._df is None:
+                self._df = pd.DataFrame(self._columns, copy=False)
+        return self._df.copy(deep=False)
+
+    def to_records(self) -> List[dict]:
+        """转换为 to_dict('records') 格式"""
+        return [
+            {name: _json_value(values[i])
+             for name, values in self._columns.items()}
+            for i in range(self._length)
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可JSON序列化的列式字典"""
+        return {
+            "length": self._length,
+            "columns": {name: [_json_value(v) for v in values]
+                        for name, values in self._columns.items()},
+        }
+
+    def __repr__(self) -> str:
+        return f"PriceFrame(rows={self._length}, columns={len(self._columns)})"
@@ -0,0 +1,253 @@
+"""
+本地增量行情存储
+
+将 ak.stock_zh_a_hist 返回的日线OHLCV数据按 复权类型/股票代码 分区保存在本地，
+之后的请求只下载上次同步后缺失的交易日，其余部分直接从磁盘读取。
+
+存储格式优先使用 Parquet（需要安装 pyarrow），否则回退为 pickle。
+
+环境变量：
+    - PRICE_STORE_DIR：存储目录，默认为 src/data/price_store
+    - PRICE_STORE_ENABLED：设置为 false 时关闭本地存储，每次都直接下载
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+from src.utils.logging_config import setup_logger
+
+logger = setup_logger('price_store')
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+# 最近几天的数据视为尚未稳定（盘中的当日K线、数据源尚未更新的交易日），
+# 覆盖范围最多记到这之前，这些交易日不写入本地存储，每次请求都重新下载
+RECENT_DAYS = 3
+
+# 比较重叠交易日收盘价时允许的误差
+PRICE_TOLERANCE = 1e-6
+
+DEFAULT_STORE_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), "data", "price_store")
+
+# fetcher(start_date, end_date) -> 已重命名列、date为datetime类型的DataFrame
+Fetcher = Callable[[datetime, datetime], pd.DataFrame]
+
+
+def _is_enabled() -> bool:
+    return os.getenv("PRICE_STORE_ENABLED", "true").strip().lower() not in ("0", "false", "no")
+
+
+class PriceStore:
+    """按股票代码和复权类型分区的日线数据本地存储"""
+
+    def __init__(self, root_dir: Optional[str] = None):
+        self.root_dir = root_dir or os.getenv(
+            "PRICE_STORE_DIR") or DEFAULT_STORE_DIR
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock_for(self, symbol: str, adjust: str) -> threading.Lock:
+        key = (symbol, adjust)
+        with self._locks_guard:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+
+    def _paths(self, symbol: str, adjust: str) -> Tuple[str, str]:
+        partition = os.path.join(self.root_dir, adjust or "none")
+        ext = "parquet" if HAS_PARQUET else "pkl"
+        return (os.path.join(partition, f"{symbol}.{ext}"),
+                os.path.join(partition, f"{symbol}.meta.json"))
+
+    def _read(self, symbol: str, adjust: str) -> Tuple[Optional[pd.DataFrame], Optional[dict]]:
+        data_path, meta_path = self._paths(symbol, adjust)
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return None, None
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if HAS_PARQUET:
+                df = pd.read_parquet(data_path)
+            else:
+                df = pd.read_pickle(data_path)
+            return df, meta
+        except Exception as e:
+            logger.warning(f"读取本地行情存储失败 {data_path}: {e}")
+            return None, None
+
+    def _write(self, symbol: str, adjust: str, df: pd.DataFrame, meta: dict):
+        data_path, meta_path = self._paths(symbol, adjust)
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        # 先写临时文件再替换，避免并发读取到写了一半的文件
+        tmp_data, tmp_meta = data_path + ".tmp", meta_path + ".tmp"
+        if HAS_PARQUET:
+            df.to_parquet(tmp_data, index=False)
+        else:
+            df.to_pickle(tmp_data)
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_data, data_path)
+        os.replace(tmp_meta, meta_path)
+
+    @staticmethod
+    def _settled_cutoff() -> datetime:
+        """最后一个可以认为数据已稳定的日期"""
+        return (datetime.now() - timedelta(days=RECENT_DAYS)).replace(
+            hour=0, minute=0, second=0, microsecond=0)
+
+    @classmethod
+    def _coverage_end(cls, requested_end: datetime, df: pd.DataFrame) -> datetime:
+        """计算本次同步后可以认为已覆盖的结束日期，不会超过 _settled_cutoff()"""
+        cutoff = cls._settled_cutoff()
+        if requested_end < cutoff:
+            return requested_end
+        if df is None or df.empty:
+            return requested_end - timedelta(days=RECENT_DAYS)
+        return min(cutoff, df["date"].max().to_pydatetime())
+
+    @staticmethod
+    def _merge(*frames: pd.DataFrame) -> pd.DataFrame:
+        frames = [f for f in frames if f is not None and not f.empty]
+        if not frames:
+            return pd.DataFrame()
+        df = pd.concat(frames, ignore_index=True)
+        df = df.drop_duplicates(subset="date", keep="last")
+        return df.sort_values("date").reset_index(drop=True)
+
+    @staticmethod
+    def _overlap_matches(stored: pd.DataFrame, fresh: pd.DataFrame) -> bool:
+        """检查新旧数据在重叠交易日上的收盘价是否一致
+
+        前复权价格会在除权除息后整体调整，不一致时需要全量重新同步。
+        """
+        if fresh is None or fresh.empty:
+            return True
+        overlap = stored.merge(fresh[["date", "close"]],
+                               on="date", suffixes=("", "_fresh"))
+        if overlap.empty:
+            return True
+        diff = (overlap["close"] - overlap["close_fresh"]).abs()
+        return bool((diff <= PRICE_TOLERANCE * overlap["close"].abs().clip(lower=1)).all())
+
+    @staticmethod
+    def _needs_write(stored: Optional[pd.DataFrame], meta: Optional[dict], settled: Optional[pd.DataFrame],
+                     covered_start: datetime, covered_end: datetime) -> bool:
+        """已稳定部分相对本地存储有变化时才需要写入"""
+        if settled is None or settled.empty:
+            return False
+        if stored is None or meta is None:
+            return True
+        return (meta.get("start_date") != covered_start.strftime("%Y-%m-%d")
+                or meta.get("end_date") != covered_end.strftime("%Y-%m-%d")
+                or not settled.reset_index(drop=True).equals(stored))
+
+    def load(self, symbol: str, start_date: datetime, end_date: datetime,
+             adjust: str, fetcher: Fetcher) -> pd.DataFrame:
+        """获取 [start_date, end_date] 区间的日线数据，只下载本地缺失的部分
+
+        Args:
+            symbol: 股票代码
+            start_date: 开始日期
+            end_date: 结束日期
+            adjust: 复权类型（""、"qfq"、"hfq"）
+            fetcher: 从数据源下载指定区间数据的函数
+
+        Returns:
+            按日期升序排列的DataFrame
+        """
+        start_date = start_date.replace(
+            hour=0, minute=0, second=0, microsecond=0)
+        end_date = end_date.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        if not _is_enabled():
+            return fetcher(start_date, end_date)
+
+        with self._lock_for(symbol, adjust):
+            stored, meta = self._read(symbol, adjust)
+
+            if stored is None or stored.empty:
+                logger.info(
+                    f"本地行情存储无 {symbol}({adjust or 'none'}) 数据，下载完整区间")
+                df = self._merge(fetcher(start_date, end_date))
+                covered_start, covered_end = start_date, self._coverage_end(
+                    end_date, df)
+            else:
+                covered_start = datetime.strptime(
+                    meta["start_date"], "%Y-%m-%d")
+                covered_end = datetime.strptime(meta["end_date"], "%Y-%m-%d")
+                df = stored
+                if (df["date"] > covered_end).any():
+                    # 旧版本会写入未稳定的交易日，丢弃后重新下载，不参与复权校验
+                    df = df.loc[df["date"] <= covered_end].reset_index(drop=True)
+
+                if end_date > covered_end:
+                    # 从最后一个已存交易日开始下载，用重叠的一天校验复权因子是否变化
+                    last_stored = df["date"].max().to_pydatetime()
+                    logger.info(
+                        f"增量同步 {symbol}({adjust or 'none'}): {last_stored.strftime('%Y-%m-%d')} -> {end_date.strftime('%Y-%m-%d')}")
+                    fresh = fetcher(min(last_stored, covered_end), end_date)
+                    if fresh is None or fresh.empty:
+                        # 下载区间包含最后一个已存交易日，返回空数据说明下载失败，不推进覆盖范围
+                        logger.warning(
+                            f"增量同步 {symbol}({adjust or 'none'}) 未返回数据，保持原覆盖范围")
+                    elif self._overlap_matches(df, fresh):
+                        df = self._merge(df, fresh)
+                        covered_end = self._coverage_end(end_date, fresh)
+                    else:
+                        logger.info(
+                            f"{symbol} 复权价格已变化，重新同步完整区间")
+                        full_start = min(start_date, covered_start)
+                        df = self._merge(fetcher(full_start, end_date))
+                        covered_start, covered_end = full_start, self._coverage_end(
+                            end_date, df)
+
+                if start_date < covered_start and not df.empty:
+                    logger.info(
+                        f"补充 {symbol}({adjust or 'none'}) 早期数据: {start_date.strftime('%Y-%m-%d')} -> {covered_start.strftime('%Y-%m-%d')}")
+                    first_stored = df["date"].min().to_pydatetime()
+                    earlier = fetcher(start_date, first_stored)
+                    if earlier is None or earlier.empty:
+                        # 同上，下载区间包含第一个已存交易日
+                        logger.warning(
+                            f"补充 {symbol}({adjust or 'none'}) 早期数据未返回数据，保持原覆盖范围")
+                    elif self._overlap_matches(df, earlier):
+                        df = self._merge(earlier, df)
+                        covered_start = start_date
+                    else:
+                        logger.info(
+                            f"{symbol} 复权价格已变化，重新同步完整区间")
+                        full_end = max(end_date, covered_end)
+                        df = self._merge(fetcher(start_date, full_end))
+                        covered_start, covered_end = start_date, self._coverage_end(
+                            full_end, df)
+
+            # 只保存已稳定的交易日，最近几天的数据下次请求时重新下载
+            settled = df.loc[df["date"] <= covered_end] if df is not None and not df.empty else df
+            if self._needs_write(stored, meta, settled, covered_start, covered_end):
+                self._write(symbol, adjust, settled, {
+                    "symbol": symbol,
+                    "adjust": adjust,
+                    "start_date": covered_start.strftime("%Y-%m-%d"),
+                    "end_date": covered_end.strftime("%Y-%m-%d"),
+                    "rows": len(settled),
+                    "last_synced": datetime.now().isoformat()
+                })
+
+        if df is None or df.empty:
+            return pd.DataFrame()
+        mask = (df["date"] >= start_date) & (df["date"] <= end_date)
+        return df.loc[mask].reset_index(drop=True)
+
+
+# 进程级共享实例
+price_store = PriceStore()
@@ -0,0 +1,157 @@
+"""
+A股实时行情快照缓存
+
+ak.stock_zh_a_spot_em() 每次都会下载全市场约5000行的行情表，而调用方通常只读取其中一行。
+此模块维护一个进程级共享的快照，按可配置的TTL刷新，并保证并发请求只触发一次下载。
+
+TTL 通过环境变量 SPOT_CACHE_TTL 配置：
+    - "session"（默认）：快照在下一个交易时段边界（9:15 / 11:30 / 13:00 / 15:00）前有效
+    - 整数：快照有效的秒数，例如盘中设置为 60
+    - 0：不缓存，每次都重新下载
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Optional, Union
+
+import pandas as pd
+
+from src.utils.logging_config import setup_logger
+from src.utils.metrics import CACHE_REQUESTS
+from src.utils.tracing import traced_module
+
+# akshare 调用在节点内记录为 data span
+ak = traced_module("akshare")
+
+logger = setup_logger('spot_cache')
+
+# 交易时段边界（本地时间），跨越边界后快照失效
+SESSION_BOUNDARIES = ((9, 15), (11, 30), (13, 0), (15, 0))
+
+
+def _next_session_boundary(now: datetime) -> datetime:
+    """返回 now 之后的第一个交易时段边界"""
+    for hour, minute in SESSION_BOUNDARIES:
+        boundary = now.replace(hour=hour, minute=minute,
+                               second=0, microsecond=0)
+        if boundary > now:
+            return boundary
+    hour, minute = SESSION_BOUNDARIES[0]
+    return (now + timedelta(days=1)).replace(hour=hour, minute=minute,
+                                             second=0, microsecond=0)
+
+
+class SpotSnapshotCache:
+    """全市场实时行情快照的线程安全缓存"""
+
+    def __init__(self, ttl: Optional[Union[str, int]] = None, fetcher=None):
+        """
+        Args:
+            ttl: "session" 或秒数，为None时读取环境变量 SPOT_CACHE_TTL
+            fetcher: 获取全市场行情的函数，默认为 ak.stock_zh_a_spot_em
+        """
+        if ttl is None:
+            ttl = os.getenv("SPOT_CACHE_TTL", "session")
+        self.ttl = ttl
+        self._fetcher = fetcher
+        self._lock = threading.Lock()
+        self._snapshot: Optional[pd.DataFrame] = None
+        self._fetched_at: Optional[datetime] = None
+        self._expires_at: Optional[datetime] = None
+
+    def _compute_expiry(self, now: datetime) -> datetime:
+        if str(self.ttl).strip().lower() == "session":
+            return _next_session_boundary(now)
+        try:
+            seconds = int(self.ttl)
+        except (TypeError, ValueError):
+            logger.warning(f"无效的 SPOT_CACHE_TTL 值: {self.ttl}，使用 session 模式")
+            return _next_session_boundary(now)
+        return now + timedelta(seconds=max(seconds, 0))
+
+    def _is_fresh(self, now: datetime) -> bool:
+        return self._snapshot is not None and self._expires_at is not None and now < self._expires_at
+
+    def _fetch(self) -> Optional[pd.DataFrame]:
+        """下载全市场行情并按代码建立索引，调用方需持有锁"""
+        logger.info("Fetching A-share spot snapshot...")
+        df = (self._fetcher or ak.stock_zh_a_spot_em)()
+        if df is None or df.empty:
+            logger.warning("No real-time quotes data available")
+            return None
+
+        # 按股票代码建立索引，后续单只股票查询为O(1)
+        df = df.drop_duplicates(subset="代码", keep="first").set_index(
+            "代码", drop=False)
+        now = datetime.now()
+        self._snapshot = df
+        self._fetched_at = now
+        self._expires_at = self._compute_expiry(now)
+        logger.info(
+            f"✓ Spot snapshot cached ({len(df)} rows, valid until {self._expires_at.strftime('%Y-%m-%d %H:%M:%S')})")
+        return df
+
+    def get_snapshot(self, force_refresh: bool = False) -> Optional[pd.DataFrame]:
+        """获取全市场行情快照，过期或强制刷新时重新下载
+
+        并发调用时只有一个线程下载，其余线程等待并复用结果。
+        下载失败时若存在旧快照，则返回旧快照。
+        """
+        with self._lock:
+            if not force_refresh and self._is_fresh(datetime.now()):
+                CACHE_REQUESTS.inc(cache="spot_snapshot", result="hit")
+                return self._snapshot
+            CACHE_REQUESTS.inc(cache="spot_snapshot", result="miss")
+            try:
+                snapshot = self._fetch()
+            except Exception as e:
+                logger.error(f"Error fetching spot snapshot: {e}")
+                snapshot = None
+            if snapshot is None and self._snapshot is not None:
+                logger.warning(
+                    f"Using stale spot snapshot fetched at {self._fetched_at.strftime('%Y-%m-%d %H:%M:%S')}")
+                return self._snapshot
+            return snapshot
+
+    def refresh(self) -> Optional[pd.DataFrame]:
+        """强制重新下载行情快照"""
+        return self.get_snapshot(force_refresh=True)
+
+    def invalidate(self):
+        """丢弃当前快照，下次访问时重新下载"""
+        with self._lock:
+            self._snapshot = None
+            self._fetched_at = None
+            self._expires_at = None
+
+    def get_quote(self, symbol: str) -> Optional[pd.Series]:
+        """获取单只股票的实时行情行，不存在时返回None"""
+        snapshot = self.get_snapshot()
+        if snapshot is None or symbol not in snapshot.index:
+            return None
+        return snapshot.loc[symbol]
+
+    @property
+    def fetched_at(self) -> Optional[datetime]:
+        """当前快照的下载时间"""
+        return self._fetched_at
+
+
+# 进程级共享实例
+spot_cache = SpotSnapshotCache()
+
+
+def get_spot_snapshot(force_refresh: bool = False) -> Optional[pd.DataFrame]:
+    """获取共享的全市场行情快照"""
+    return spot_cache.get_snapshot(force_refresh=force_refresh)
+
+
+def refresh_spot_snapshot() -> Optional[pd.DataFrame]:
+    """强制刷新共享的全市场行情快照"""
+    return spot_cache.refresh()
+
+
+def get_spot_quote(symbol: str) -> Optional[pd.Series]:
+    """从共享快照中获取单只股票的实时行情"""
+    return spot_cache.get_quote(symbol)
@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到 Python 路径
+sys.path.append(os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__)))))
+
+from src.tools.api import calculate_rolling_hurst  # noqa: E402
+
+
+def reference_hurst(series):
+    """原 get_price_history 中逐窗口计算的Hurst指数实现，用于对比结果"""
+    try:
+        series = series.dropna()
+        if len(series) < 30:
+            return np.nan
+
+        log_returns = np.log(series / series.shift(1)).dropna()
+        if len(log_returns) < 30:
+            return np.nan
+
+        lags = range(2, min(11, len(log_returns) // 4))
+
+        tau = []
+        for lag in lags:
+            std = log_returns.rolling(window=lag).std().dropna()
+            if len(std) > 0:
+                tau.append(np.mean(std))
+
+        if len(tau) < 3:
+            return np.nan
+
+        lags_log = np.log(list(lags))
+        tau_log = np.log(tau)
+
+        reg = np.polyfit(lags_log, tau_log, 1)
+        hurst = reg[0] / 2.0
+
+        if np.isnan(hurst) or np.isinf(hurst):
+            return np.nan
+
+        return hurst
+
+    except Exception:
+        return np.nan
+
+
+def make_prices(n_days: int, seed: int = 0) -> pd.Series:
+    """生成模拟日线收盘价，包含A股常见的平盘日（收益率为0）"""
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0, 0.02, n_days)
+    returns[rng.random(n_days) < 0.05] = 0.0
+    close = 10 * np.exp(np.cumsum(returns))
+    return pd.Series(np.round(close, 2))
+
+
+def test_rolling_hurst_matches_reference():
+    """向量化实现与逐窗口实现的结果一致"""
+    for seed in range(3):
+        close = make_prices(600, seed)
+        log_returns = np.log(close / close.shift(1))
+        expected = log_returns.rolling(
+            window=120, min_periods=60).apply(reference_hurst)
+        actual = calculate_rolling_hurst(
+            log_returns, window=120, min_periods=60)
+        assert expected.isna().equals(actual.isna())
+        np.testing.assert_allclose(
+            actual.dropna(), expected.dropna(), rtol=1e-9, atol=1e-12)
+
+
+def run_benchmark():
+    """对比 2~5 年日线数据上的计算耗时"""
+    print(f"{'交易日数':>8} {'逐窗口(s)':>12} {'向量化(s)':>12} {'加速比':>10}")
+    for years in (2, 3, 5):
+        close = make_prices(years * 244, seed=years)
+        log_returns = np.log(close / close.shift(1))
+
+        start = time.perf_counter()
+        expected = log_returns.rolling(
+            window=120, min_periods=60).apply(reference_hurst)
+        reference_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        actual = calculate_rolling_hurst(
+            log_returns, window=120, min_periods=60)
+        vectorized_time = time.perf_counter() - start
+
+        max_diff = (actual - expected).abs().max()
+        print(f"{len(close):>8} {reference_time:>12.4f} {vectorized_time:>12.4f} "
+              f"{reference_time / vectorized_time:>9.0f}x  (最大误差 {max_diff:.2e})")
+
+
+if __name__ == "__main__":
+    test_rolling_hurst_matches_reference()
+    print("结果一致性检查通过\n")
+    run_benchmark()
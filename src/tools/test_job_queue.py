@@ -0,0 +1,168 @@
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError
+
+# 添加项目根目录到 Python 路径
+sys.path.append(os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.models.api_models import StockAnalysisRequest  # noqa: E402
+from backend.services.job_queue import AnalysisJobQueue, QueueFullError  # noqa: E402
+from backend.state import api_state, RunCancelledError  # noqa: E402
+
+
+class StubRunner:
+    """代替 execute_stock_analysis：记录执行顺序，阻塞到 release() 后才返回"""
+
+    def __init__(self):
+        self.calls = []
+        self.started = threading.Event()
+        self._gate = threading.Event()
+
+    def release(self):
+        self._gate.set()
+
+    def __call__(self, request, run_id):
+        self.calls.append(run_id)
+        self.started.set()
+        while not self._gate.wait(0.01):
+            api_state.raise_if_cancelled(run_id)
+        api_state.raise_if_cancelled(run_id)
+        return {"ticker": request.ticker}
+
+
+def new_run_id():
+    return f"test_queue_{uuid.uuid4().hex[:8]}"
+
+
+def request(ticker, priority="normal", **kwargs):
+    return StockAnalysisRequest(ticker=ticker, priority=priority, **kwargs)
+
+
+def start_blocker(queue, runner):
+    """提交一个占住唯一工作线程的任务，之后提交的任务都在排队"""
+    job, _ = queue.submit(request("000001"), new_run_id())
+    assert runner.started.wait(2)
+    return job
+
+
+def wait_all(*jobs):
+    for job in jobs:
+        try:
+            job.future.result(timeout=2)
+        except (CancelledError, RunCancelledError):
+            pass
+
+
+def wait_idle(queue):
+    """Future 完成后工作线程才把任务移出索引，等待队列清空"""
+    deadline = time.monotonic() + 2
+    while queue.stats() != {"queued": 0, "running": 0}:
+        assert time.monotonic() < deadline, f"任务未结束: {queue.stats()}"
+        time.sleep(0.01)
+
+
+def test_duplicate_requests_share_job():
+    runner = StubRunner()
+    queue = AnalysisJobQueue(runner, workers=1)
+    blocker = start_blocker(queue, runner)
+
+    first, merged = queue.submit(request("600519"), new_run_id())
+    assert not merged
+    same, merged = queue.submit(request("600519", priority="low"), new_run_id())
+    assert merged and same is first
+    other, merged = queue.submit(request("600519", num_of_news=10), new_run_id())
+    assert not merged and other is not first
+    assert queue.stats() == {"queued": 2, "running": 1}
+
+    runner.release()
+    wait_all(blocker, first, other)
+    assert runner.calls == [blocker.run_id, first.run_id, other.run_id]
+    assert first.future.result() == {"ticker": "600519"}
+    wait_idle(queue)
+
+    # 任务结束后相同的请求作为新任务执行
+    again, merged = queue.submit(request("600519"), new_run_id())
+    assert not merged and again is not first
+    wait_all(again)
+
+
+def test_priority_promotion_skips_stale_entries():
+    """重复请求提升排队任务的优先级，旧的队列条目被跳过，任务只执行一次"""
+    runner = StubRunner()
+    queue = AnalysisJobQueue(runner, workers=1)
+    blocker = start_blocker(queue, runner)
+
+    low, _ = queue.submit(request("600519", priority="low"), new_run_id())
+    normal, _ = queue.submit(request("000858"), new_run_id())
+    promoted, merged = queue.submit(request("600519", priority="high"), new_run_id())
+    assert merged and promoted is low and low.rank == 0
+
+    runner.release()
+    wait_all(blocker, low, normal)
+    wait_idle(queue)
+    # 等待工作线程取出提升前留下的旧条目
+    deadline = time.monotonic() + 2
+    while not queue._queue.empty() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert queue._queue.empty()
+    assert runner.calls == [blocker.run_id, low.run_id, normal.run_id]
+
+
+def test_queue_full():
+    runner = StubRunner()
+    queue = AnalysisJobQueue(runner, workers=1, max_queue_size=2)
+    blocker = start_blocker(queue, runner)
+
+    first, _ = queue.submit(request("600519"), new_run_id())
+    second, _ = queue.submit(request("000858"), new_run_id())
+    try:
+        queue.submit(request("601318"), new_run_id())
+        assert False, "队列已满时应拒绝新任务"
+    except QueueFullError:
+        pass
+    # 重复请求合并到已有任务，不占用队列容量
+    same, merged = queue.submit(request("600519"), new_run_id())
+    assert merged and same is first
+
+    runner.release()
+    wait_all(blocker, first, second)
+    assert len(runner.calls) == 3
+
+
+def test_cancel_queued_and_running_jobs():
+    runner = StubRunner()
+    queue = AnalysisJobQueue(runner, workers=1)
+    running = start_blocker(queue, runner)
+    queued, _ = queue.submit(request("600519"), new_run_id())
+
+    # 排队中的任务立即取消，不会被执行
+    assert queue.cancel(queued.run_id) == "cancelled"
+    assert queued.future.cancelled()
+    assert api_state.get_run(queued.run_id).status == "cancelled"
+    assert queue.get_job(queued.run_id) is None
+    assert queue.stats() == {"queued": 0, "running": 1}
+
+    # 运行中的任务在下一次检查取消时停止
+    assert queue.cancel(running.run_id) == "cancelling"
+    assert api_state.is_cancel_requested(running.run_id)
+    try:
+        running.future.result(timeout=2)
+        assert False, "运行中的任务取消后应抛出 RunCancelledError"
+    except RunCancelledError:
+        pass
+    wait_idle(queue)
+    assert running.status == "cancelled"
+    assert runner.calls == [running.run_id]
+    assert queue.cancel(running.run_id) is None
+
+
+if __name__ == "__main__":
+    test_duplicate_requests_share_job()
+    test_priority_promotion_skips_stale_entries()
+    test_queue_full()
+    test_cancel_queued_and_running_jobs()
+    print("分析任务队列测试通过")
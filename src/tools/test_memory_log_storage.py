@@ -0,0 +1,105 @@
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+# 添加项目根目录到 Python 路径
+sys.path.append(os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.schemas import AgentExecutionLog, LLMInteractionLog  # noqa: E402
+from backend.storage.memory import InMemoryLogStorage, MAX_LOG_SIZE  # noqa: E402
+
+AGENTS = ["market_data", "technical_analyst", "fundamentals_analyst",
+          "sentiment_analyst", "portfolio_management"]
+
+
+def generate_logs(count, seed=0):
+    """生成交错的多运行、多Agent日志，开始时间不按写入顺序递增"""
+    rng = random.Random(seed)
+    base = datetime(2024, 1, 1)
+    runs = [f"run_{i}" for i in range(count // 150)]
+    agent_logs, llm_logs = [], []
+    for i in range(count):
+        # 运行ID大致随时间推进，同时与前后几个运行交错
+        run_id = runs[min(len(runs) - 1, max(0, i // 150 + rng.randint(-2, 2)))]
+        agent_name = rng.choice(AGENTS)
+        start = base + timedelta(seconds=i + rng.randint(-30, 30))
+        agent_logs.append(AgentExecutionLog(
+            agent_name=agent_name, run_id=run_id, timestamp_start=start,
+            timestamp_end=start + timedelta(seconds=rng.randint(1, 20))))
+        llm_logs.append(LLMInteractionLog(
+            agent_name=agent_name, run_id=run_id if i % 7 else None,
+            request_data={"i": i}, response_data={"i": i}))
+    return agent_logs, llm_logs
+
+
+def brute_force_summaries(written, retained):
+    """统计仍保留日志的运行，按在全部写入日志中首次出现的顺序，最新的在前"""
+    order = list(dict.fromkeys(log.run_id for log in written))
+    stats = {}
+    for log in retained:
+        stats.setdefault(log.run_id, []).append(log)
+    summaries = []
+    for run_id in reversed(order):
+        run_logs = stats.get(run_id)
+        if not run_logs:
+            continue
+        summaries.append((run_id,
+                          min(log.timestamp_start for log in run_logs),
+                          max(log.timestamp_end for log in run_logs),
+                          sorted({log.agent_name for log in run_logs})))
+    return summaries
+
+
+def test_indexes_match_brute_force_after_eviction():
+    """日志数超过 MAX_LOG_SIZE 后，索引查询和运行摘要与直接扫描保留的日志一致"""
+    storage = InMemoryLogStorage()
+    agent_logs, llm_logs = generate_logs(MAX_LOG_SIZE * 3)
+    for written, (agent_log, llm_log) in enumerate(zip(agent_logs, llm_logs), 1):
+        storage.add_agent_log(agent_log)
+        storage.add_log(llm_log)
+        if written % 250 == 0:
+            check_storage(storage, agent_logs[:written], llm_logs[:written])
+
+
+def check_storage(storage, agent_written, llm_written):
+    retained = agent_written[-MAX_LOG_SIZE:]
+    retained_llm = llm_written[-MAX_LOG_SIZE:]
+    run_ids = sorted({log.run_id for log in agent_written})
+
+    for run_id in run_ids + ["missing_run"]:
+        for agent_name in AGENTS + [None]:
+            expected = [log for log in retained if log.run_id == run_id
+                        and (agent_name is None or log.agent_name == agent_name)]
+            actual = storage.get_agent_logs(agent_name=agent_name, run_id=run_id)
+            assert actual == expected, (run_id, agent_name)
+
+            expected_llm = [log for log in retained_llm if log.run_id == run_id
+                            and (agent_name is None or log.agent_name == agent_name)]
+            assert storage.get_logs(agent_name=agent_name, run_id=run_id) == expected_llm
+
+    for agent_name in AGENTS:
+        expected = [log for log in retained if log.agent_name == agent_name]
+        assert storage.get_agent_logs(agent_name=agent_name) == expected
+        assert storage.get_agent_logs(agent_name=agent_name, limit=3) == expected[-3:]
+    assert storage.get_agent_logs() == retained
+
+    summaries = [(s.run_id, s.start_time, s.end_time, s.agents_executed)
+                 for s in storage.get_run_summaries()]
+    assert summaries == brute_force_summaries(agent_written, retained)
+    assert [s.run_id for s in storage.get_run_summaries(limit=2)] == \
+        [s[0] for s in summaries[:2]]
+    for run_id in run_ids:
+        summary = storage.get_run_summary(run_id)
+        expected = next((s for s in summaries if s[0] == run_id), None)
+        if expected is None:
+            assert summary is None
+        else:
+            assert (summary.run_id, summary.start_time, summary.end_time,
+                    summary.agents_executed) == expected
+
+
+if __name__ == "__main__":
+    test_indexes_match_brute_force_after_eviction()
+    print("内存日志存储测试通过")
@@ -0,0 +1,132 @@
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# 添加项目根目录到 Python 路径
+sys.path.append(os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__)))))
+
+from src.tools.price_store import PriceStore, RECENT_DAYS  # noqa: E402
+
+
+class FakeSource:
+    """模拟 ak.stock_zh_a_hist 的数据源，记录每次下载的区间"""
+
+    def __init__(self):
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        dates = pd.bdate_range("2023-01-02", today)
+        close = 10 + np.cumsum(np.random.default_rng(0).normal(0, 0.1, len(dates)))
+        self.df = pd.DataFrame({"date": dates, "open": close, "close": close})
+        self.calls = []
+        self.empty = False
+
+    def adjust_prices(self, factor):
+        """模拟除权除息后前复权价格整体调整"""
+        self.df[["open", "close"]] *= factor
+
+    def __call__(self, start_date, end_date):
+        self.calls.append((start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")))
+        if self.empty:
+            return pd.DataFrame()
+        mask = (self.df["date"] >= start_date) & (self.df["date"] <= end_date)
+        return self.df.loc[mask].reset_index(drop=True)
+
+    def expected(self, start, end):
+        mask = (self.df["date"] >= start) & (self.df["date"] <= end)
+        return self.df.loc[mask].reset_index(drop=True)
+
+
+def read_meta(root_dir):
+    with open(os.path.join(root_dir, "qfq", "600519.meta.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load(store, source, start, end):
+    return store.load("600519", datetime.strptime(start, "%Y-%m-%d"),
+                      datetime.strptime(end, "%Y-%m-%d"), "qfq", source)
+
+
+def test_incremental_sync():
+    """已存区间直接读取，延长结束日期时只从最后一个已存交易日开始下载"""
+    with tempfile.TemporaryDirectory() as root_dir:
+        store, source = PriceStore(root_dir), FakeSource()
+
+        df = load(store, source, "2024-01-02", "2024-03-01")
+        assert source.calls == [("2024-01-02", "2024-03-01")]
+        assert df.equals(source.expected("2024-01-02", "2024-03-01"))
+
+        df = load(store, source, "2024-01-15", "2024-02-15")
+        assert len(source.calls) == 1
+        assert df.equals(source.expected("2024-01-15", "2024-02-15"))
+
+        df = load(store, source, "2024-01-02", "2024-04-01")
+        assert source.calls[1:] == [("2024-03-01", "2024-04-01")]
+        assert df.equals(source.expected("2024-01-02", "2024-04-01"))
+        assert read_meta(root_dir)["end_date"] == "2024-04-01"
+
+
+def test_adjusted_price_change_forces_full_resync():
+    """重叠交易日的复权价格变化时重新下载完整区间"""
+    with tempfile.TemporaryDirectory() as root_dir:
+        store, source = PriceStore(root_dir), FakeSource()
+        load(store, source, "2024-01-02", "2024-03-01")
+
+        source.adjust_prices(0.9)
+        df = load(store, source, "2024-01-02", "2024-04-01")
+        assert source.calls[1:] == [("2024-03-01", "2024-04-01"),
+                                    ("2024-01-02", "2024-04-01")]
+        assert df.equals(source.expected("2024-01-02", "2024-04-01"))
+
+        df = load(store, source, "2024-01-02", "2024-04-01")
+        assert len(source.calls) == 3
+        assert df.equals(source.expected("2024-01-02", "2024-04-01"))
+
+
+def test_empty_response_keeps_coverage():
+    """数据源返回空数据时不推进覆盖范围，下次请求重新下载"""
+    with tempfile.TemporaryDirectory() as root_dir:
+        store, source = PriceStore(root_dir), FakeSource()
+        load(store, source, "2024-02-01", "2024-03-01")
+
+        source.empty = True
+        load(store, source, "2024-01-02", "2024-04-01")
+        meta = read_meta(root_dir)
+        assert (meta["start_date"], meta["end_date"]) == ("2024-02-01", "2024-03-01")
+
+        source.empty = False
+        source.calls.clear()
+        df = load(store, source, "2024-01-02", "2024-04-01")
+        assert source.calls == [("2024-03-01", "2024-04-01"),
+                                ("2024-01-02", "2024-02-01")]
+        assert df.equals(source.expected("2024-01-02", "2024-04-01"))
+        meta = read_meta(root_dir)
+        assert (meta["start_date"], meta["end_date"]) == ("2024-01-02", "2024-04-01")
+
+
+def test_recent_days_are_not_stored():
+    """最近几天的数据每次请求都重新下载，不写入本地存储"""
+    with tempfile.TemporaryDirectory() as root_dir:
+        store, source = PriceStore(root_dir), FakeSource()
+        today = datetime.now().strftime("%Y-%m-%d")
+
+        df = load(store, source, "2024-01-02", today)
+        assert df.equals(source.expected("2024-01-02", today))
+        cutoff = datetime.now() - timedelta(days=RECENT_DAYS)
+        assert read_meta(root_dir)["end_date"] <= cutoff.strftime("%Y-%m-%d")
+
+        source.calls.clear()
+        load(store, source, "2024-01-02", today)
+        assert len(source.calls) == 1 and source.calls[0][1] == today
+
+
+if __name__ == "__main__":
+    test_incremental_sync()
+    test_adjusted_price_change_forces_full_resync()
+    test_empty_response_keeps_coverage()
+    test_recent_days_are_not_stored()
+    print("本地行情存储测试通过")
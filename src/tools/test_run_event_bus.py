@@ -0,0 +1,147 @@
+import asyncio
+import os
+import sys
+import threading
+import uuid
+
+# 添加项目根目录到 Python 路径
+sys.path.append(os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__)))))
+
+from backend.events import RunEventBus  # noqa: E402
+from backend.state import api_state  # noqa: E402
+
+
+def new_run_id():
+    return f"test_events_{uuid.uuid4().hex[:8]}"
+
+
+def finish_run(bus, run_id, status="completed", event_type="run_completed"):
+    """模拟 workflow_run 结束运行：更新 api_state 并发布终止事件"""
+    api_state.complete_run(run_id, status)
+    bus.publish(run_id, event_type, {"status": status})
+
+
+def collect(bus, run_id, last_event_id=0, heartbeat=None, timeout=2.0):
+    """订阅运行并收集事件，直到事件流结束；超时说明事件流没有关闭"""
+    async def run():
+        events = []
+        async for event in bus.subscribe(run_id, last_event_id=last_event_id,
+                                         heartbeat=heartbeat):
+            if event is not None:
+                events.append(event)
+        return events
+
+    async def bounded():
+        return await asyncio.wait_for(run(), timeout=timeout)
+
+    return asyncio.run(bounded())
+
+
+def test_late_subscribe_to_evicted_run():
+    """缓冲区已被淘汰的已结束运行，订阅后收到合成的终止事件并关闭"""
+    bus = RunEventBus(max_runs=2)
+    runs = [new_run_id() for _ in range(3)]
+    for run_id in runs:
+        api_state.register_run(run_id)
+        bus.publish(run_id, "agent_started", {"agent": "market_data"})
+    finish_run(bus, runs[0])
+    finish_run(bus, runs[1], "error", "run_failed")
+    finish_run(bus, runs[2], "cancelled", "run_cancelled")
+
+    assert not bus.has_run(runs[0])
+    events = collect(bus, runs[0])
+    assert [e["type"] for e in events] == ["run_completed"]
+    assert events[0]["data"]["status"] == "completed"
+
+    # 断线重连时合成事件的ID接在 Last-Event-ID 之后
+    events = collect(bus, runs[0], last_event_id=7)
+    assert [e["id"] for e in events] == [8]
+
+
+def test_running_runs_are_not_evicted():
+    """进行中的运行不被淘汰，淘汰只针对已结束的运行"""
+    bus = RunEventBus(max_runs=2)
+    running = [new_run_id() for _ in range(3)]
+    for run_id in running:
+        api_state.register_run(run_id)
+        bus.publish(run_id, "agent_started", {"agent": "market_data"})
+    assert all(bus.has_run(run_id) for run_id in running)
+
+    finished = new_run_id()
+    api_state.register_run(finished)
+    finish_run(bus, finished)
+    assert not bus.has_run(finished)
+    assert all(bus.has_run(run_id) for run_id in running)
+
+    for run_id in running:
+        finish_run(bus, run_id)
+    assert [bus.has_run(run_id) for run_id in running] == [False, True, True]
+
+
+def test_reconnect_keeps_event_ids():
+    """进行中的运行在其他运行被淘汰后，重连只补发 Last-Event-ID 之后的事件"""
+    bus = RunEventBus(max_runs=2)
+    run_id = new_run_id()
+    api_state.register_run(run_id)
+    for agent in ("market_data", "technical_analyst", "sentiment_analyst"):
+        bus.publish(run_id, "agent_finished", {"agent": agent})
+
+    for _ in range(5):
+        other = new_run_id()
+        api_state.register_run(other)
+        finish_run(bus, other)
+
+    finish_run(bus, run_id)
+    events = collect(bus, run_id, last_event_id=2)
+    assert [(e["id"], e["type"]) for e in events] == [
+        (3, "agent_finished"), (4, "run_completed")]
+
+
+def test_live_subscription_receives_events():
+    """订阅进行中的运行，收到其他线程发布的事件，终止事件后关闭"""
+    bus = RunEventBus()
+    run_id = new_run_id()
+    api_state.register_run(run_id)
+    bus.publish(run_id, "agent_started", {"agent": "market_data"})
+
+    def publish_later():
+        bus.publish(run_id, "agent_finished", {"agent": "market_data"})
+        finish_run(bus, run_id)
+
+    async def run():
+        events = []
+        async for event in bus.subscribe(run_id, heartbeat=0.05):
+            if event is None:
+                # 回放结束后进入等待，由其他线程继续发布
+                if len(events) == 1:
+                    threading.Thread(target=publish_later).start()
+                continue
+            events.append(event)
+        return events
+
+    events = asyncio.run(asyncio.wait_for(run(), timeout=2.0))
+    assert [e["id"] for e in events] == [1, 2, 3]
+    assert events[-1]["type"] == "run_completed"
+
+
+def test_run_finished_without_terminal_event():
+    """运行结束但没有发布终止事件时，心跳检查 api_state 后关闭事件流"""
+    bus = RunEventBus()
+    run_id = new_run_id()
+    api_state.register_run(run_id)
+    bus.publish(run_id, "agent_started", {"agent": "market_data"})
+    api_state.complete_run(run_id, "error")
+
+    events = collect(bus, run_id, heartbeat=0.05)
+    assert [(e["id"], e["type"]) for e in events] == [
+        (1, "agent_started"), (2, "run_failed")]
+
+
+if __name__ == "__main__":
+    test_late_subscribe_to_evicted_run()
+    test_running_runs_are_not_evicted()
+    test_reconnect_keeps_event_ids()
+    test_live_subscription_receives_events()
+    test_run_finished_without_terminal_event()
+    print("运行事件流测试通过")
@@ -7,8 +7,6 @@ API工具模块 - 提供Agent共享的API功能组件
 注意: 大部分功能已被重构到backend目录，此模块仅为向后兼容性而保留。
 """
 
-from fastapi import APIRouter
-from backend.main import app  # Restore this import
 import json  # Keep - Used implicitly?
 import logging
 import functools
@@ -20,11 +18,11 @@ from typing import Dict, List, Any, Optional, Callable, TypeVar  # Keep needed t
 from datetime import datetime, UTC  # Keep needed datetime objects
 # from contextlib import contextmanager # Unused
 # from concurrent.futures import ThreadPoolExecutor, Future # Unused
-import uvicorn  # Used in start_api_server
 # from functools import wraps # Redundant, imported via functools
 # import builtins # Unused
 import sys
 import io
+from contextvars import ContextVar
 
 # 导入重构后的模块
 from backend.models.api_models import (
@@ -33,6 +31,7 @@ from backend.models.api_models import (
     # StockAnalysisRequest, StockAnalysisResponse # Potentially unused
 )
 from backend.state import api_state
+from backend.events import publish_run_event
 from backend.utils.api_utils import (
     # serialize_for_api, # Unused
     safe_parse_json,  # Keep
@@ -43,12 +42,15 @@ from backend.utils.api_utils import (
 # from backend.services import execute_stock_analysis # Unused
 from backend.schemas import LLMInteractionLog  # Keep
 from backend.schemas import AgentExecutionLog  # Keep
-from src.utils.serialization import serialize_agent_state  # Keep
+from src.utils.serialization import LazyStateSnapshot
+from src.utils.tracing import start_span, end_span
+from src.utils.metrics import AGENT_DURATION
 
 # 导入日志记录器
 try:
     # log_agent_execution is no longer needed here
-    from src.utils.llm_interaction_logger import set_global_log_storage  # Keep
+    from src.utils.llm_interaction_logger import (
+        set_global_log_storage, current_agent_name_context, current_run_id_context)
     from backend.dependencies import get_log_storage
     _has_log_system = True
 except ImportError:
@@ -62,6 +64,9 @@ except ImportError:
     def get_log_storage():
         return None
 
+    current_agent_name_context = None
+    current_run_id_context = None
+
 # 统一在此处定义 logger，无论 _has_log_system 如何
 logger = logging.getLogger("api_utils")
 
@@ -84,12 +89,26 @@ _agent_llm_calls = {}
 # FastAPI应用
 # -----------------------------------------------------------------------------
 
-# 从backend中导入FastAPI应用
+# FastAPI 应用从 backend 中导入。Agent 模块在导入时就会加载本模块，
+# 为了不让 CLI 和工作进程在启动时加载 FastAPI，应用和旧路由器都在首次访问时才导入。
 
 # 这些路由器不再使用，仅为向后兼容性保留定义
-agents_router = APIRouter(tags=["Agents"])
-runs_router = APIRouter(tags=["Runs"])
-workflow_router = APIRouter(tags=["Workflow"])
+_LEGACY_ROUTER_TAGS = {
+    "agents_router": "Agents",
+    "runs_router": "Runs",
+    "workflow_router": "Workflow",
+}
+
+
+def __getattr__(name):
+    if name == "app":
+        from backend.main import app
+        return app
+    if name in _LEGACY_ROUTER_TAGS:
+        from fastapi import APIRouter
+        router = globals()[name] = APIRouter(tags=[_LEGACY_ROUTER_TAGS[name]])
+        return router
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # -----------------------------------------------------------------------------
 # 装饰器和工具函数
@@ -248,10 +267,254 @@ def log_llm_interaction(state):
     return decorator
 
 
+def _begin_agent_execution(agent_name: str, state):
+    """Agent执行前的公共处理：更新状态、设置元数据并序列化输入状态"""
+    # 运行已被取消时在节点边界停止，当前节点不会开始执行
+    api_state.raise_if_cancelled(state.get("metadata", {}).get("run_id"))
+
+    # 更新Agent状态为运行中
+    api_state.update_agent_state(agent_name, "running")
+
+    # 添加当前agent名称到状态元数据
+    if "metadata" not in state:
+        state["metadata"] = {}
+    state["metadata"]["current_agent_name"] = agent_name
+
+    # 确保run_id在元数据中，这对日志记录至关重要
+    run_id = state.get("metadata", {}).get("run_id")
+    # 记录输入状态（延迟到第一次读取时才序列化）
+    timestamp_start = datetime.now(UTC)
+    serialized_input = LazyStateSnapshot(state)
+    api_state.update_agent_data(
+        agent_name, "input_state", serialized_input, run_id=run_id)
+    publish_run_event(run_id, "agent_started", agent_name=agent_name)
+    return run_id, timestamp_start, serialized_input
+
+
+def _set_agent_context(agent_name: str, run_id):
+    """设置当前Agent的上下文变量，供LLM调用查找Agent级别的重试策略和记录日志"""
+    if current_agent_name_context is None:
+        return None
+    return (current_agent_name_context.set(agent_name),
+            current_run_id_context.set(run_id))
+
+
+def _reset_agent_context(tokens):
+    if tokens is None:
+        return
+    current_agent_name_context.reset(tokens[0])
+    current_run_id_context.reset(tokens[1])
+
+
+# 当前上下文（线程 / 协程）正在进行的输出捕获，并行节点和并发运行各自独立
+_output_capture_context: ContextVar[Optional[dict]] = ContextVar(
+    "output_capture_context", default=None)
+_capture_install_lock = threading.Lock()
+
+
+class _ContextAwareStream:
+    """按上下文分发写入的标准输出/错误代理
+
+    当前上下文存在输出捕获时写入该捕获的缓冲区，否则写入原始流。
+    进程内只替换一次 sys.stdout / sys.stderr，之后不再在每次Agent调用时替换和恢复。
+    """
+
+    def __init__(self, original, key: str):
+        self._original = original
+        self._key = key
+
+    def _target(self):
+        capture = _output_capture_context.get()
+        if capture is not None:
+            return capture[self._key]
+        return self._original
+
+    def write(self, data):
+        return self._target().write(data)
+
+    def writelines(self, lines):
+        return self._target().writelines(lines)
+
+    def flush(self):
+        return self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self._original, name)
+
+
+class _ContextCaptureHandler(logging.Handler):
+    """将日志记录写入当前上下文的输出捕获，记录上附带 run_id 和 agent_name"""
+
+    def __init__(self):
+        super().__init__(level=logging.INFO)
+        self.addFilter(self._has_capture)
+
+    @staticmethod
+    def _has_capture(record):
+        capture = _output_capture_context.get()
+        if capture is None:
+            return False
+        record.run_id = capture["run_id"]
+        record.agent_name = capture["agent_name"]
+        return True
+
+    def emit(self, record):
+        capture = _output_capture_context.get()
+        if capture is None:
+            return
+        try:
+            capture["log_stream"].write(self.format(record) + "\n")
+        except Exception:
+            self.handleError(record)
+
+
+_capture_handler = _ContextCaptureHandler()
+
+
+def _install_capture_hooks():
+    """确保 sys.stdout / sys.stderr 为上下文代理，且根日志记录器挂载了捕获处理器
+
+    若其他代码（如 OutputLogger）之后替换了 sys.stdout，则在其外层重新包装一层代理。
+    """
+    with _capture_install_lock:
+        if not isinstance(sys.stdout, _ContextAwareStream):
+            sys.stdout = _ContextAwareStream(sys.stdout, "redirect_stdout")
+        if not isinstance(sys.stderr, _ContextAwareStream):
+            sys.stderr = _ContextAwareStream(sys.stderr, "redirect_stderr")
+        root_logger = logging.getLogger()
+        if _capture_handler not in root_logger.handlers:
+            root_logger.addHandler(_capture_handler)
+
+
+def _start_output_capture(agent_name: str = None, run_id: str = None) -> dict:
+    """开始捕获当前上下文中Agent执行期间的标准输出/错误和日志"""
+    _install_capture_hooks()
+    capture = {
+        "agent_name": agent_name,
+        "run_id": run_id,
+        "log_stream": io.StringIO(),
+        "redirect_stdout": io.StringIO(),
+        "redirect_stderr": io.StringIO(),
+    }
+    capture["token"] = _output_capture_context.set(capture)
+    return capture
+
+
+def _stop_output_capture(capture: dict) -> List[str]:
+    """结束当前上下文的输出捕获，返回捕获到的终端输出"""
+    _output_capture_context.reset(capture["token"])
+
+    terminal_outputs = []
+    stdout_content = capture["redirect_stdout"].getvalue()
+    stderr_content = capture["redirect_stderr"].getvalue()
+    log_content = capture["log_stream"].getvalue()
+    if stdout_content:
+        terminal_outputs.append(stdout_content)
+    if stderr_content:
+        terminal_outputs.append(stderr_content)
+    if log_content:
+        terminal_outputs.append(log_content)
+    return terminal_outputs
+
+
+def _record_agent_success(agent_name: str, run_id, timestamp_start, serialized_input, result, terminal_outputs):
+    """Agent成功执行后更新API状态并保存执行日志"""
+    timestamp_end = datetime.now(UTC)
+
+    # 输出状态同样延迟序列化
+    serialized_output = LazyStateSnapshot(result)
+    api_state.update_agent_data(
+        agent_name, "output_state", serialized_output, run_id=run_id)
+
+    # 从状态中提取推理细节（如果有）
+    reasoning_details = None
+    if result.get("metadata", {}).get("show_reasoning", False):
+        if "agent_reasoning" in result.get("metadata", {}):
+            reasoning_details = result["metadata"]["agent_reasoning"]
+            api_state.update_agent_data(
+                agent_name,
+                "reasoning",
+                reasoning_details,
+                run_id=run_id
+            )
+
+    # 更新Agent状态为已完成
+    api_state.update_agent_state(agent_name, "completed")
+    execution_seconds = (timestamp_end - timestamp_start).total_seconds()
+    AGENT_DURATION.observe(execution_seconds, agent=agent_name, status="success")
+    publish_run_event(run_id, "agent_finished", agent_name=agent_name,
+                      execution_time_seconds=execution_seconds)
+
+    # --- 添加Agent执行日志到BaseLogStorage ---
+    try:
+        if _has_log_system:
+            log_storage = get_log_storage()
+            if log_storage:
+                log_entry = AgentExecutionLog(
+                    agent_name=agent_name,
+                    run_id=run_id,
+                    timestamp_start=timestamp_start,
+                    timestamp_end=timestamp_end,
+                    reasoning_details=reasoning_details,
+                    terminal_outputs=terminal_outputs
+                ).defer_states(input_state=serialized_input, output_state=serialized_output)
+                log_storage.add_agent_log(log_entry)
+                logger.debug(
+                    f"已将Agent执行日志保存到存储: {agent_name}, run_id: {run_id}")
+            else:
+                logger.warning(
+                    f"无法获取日志存储实例，跳过Agent执行日志记录: {agent_name}")
+    except Exception as log_err:
+        logger.error(
+            f"保存Agent执行日志到存储失败: {agent_name}, {str(log_err)}")
+    # -----------------------------------------
+
+
+def _record_agent_error(agent_name: str, run_id, timestamp_start, serialized_input, error: str, terminal_outputs):
+    """Agent执行出错时更新API状态并保存错误日志"""
+    # Record end time even on error
+    timestamp_end = datetime.now(UTC)
+
+    # 更新Agent状态为错误
+    api_state.update_agent_state(agent_name, "error")
+    # 记录错误信息
+    api_state.update_agent_data(agent_name, "error", error, run_id=run_id)
+    AGENT_DURATION.observe((timestamp_end - timestamp_start).total_seconds(),
+                           agent=agent_name, status="error")
+    publish_run_event(run_id, "agent_failed", agent_name=agent_name, error=error)
+
+    # --- 添加错误日志到BaseLogStorage ---
+    try:
+        if _has_log_system:
+            log_storage = get_log_storage()
+            if log_storage:
+                log_entry = AgentExecutionLog(
+                    agent_name=agent_name,
+                    run_id=run_id,
+                    timestamp_start=timestamp_start,
+                    timestamp_end=timestamp_end,
+                    output_state={"error": error},
+                    reasoning_details=None,
+                    terminal_outputs=terminal_outputs
+                ).defer_states(input_state=serialized_input)
+                log_storage.add_agent_log(log_entry)
+                logger.debug(
+                    f"已将Agent错误日志保存到存储: {agent_name}, run_id: {run_id}")
+            else:
+                logger.warning(
+                    f"无法获取日志存储实例，跳过Agent错误日志记录: {agent_name}")
+    except Exception as log_err:
+        logger.error(
+            f"保存Agent错误日志到存储失败: {agent_name}, {str(log_err)}")
+    # --------------------------------------
+
+
 def agent_endpoint(agent_name: str, description: str = ""):
     """
     为Agent创建API端点的装饰器
 
+    同时支持同步和异步（async def）的Agent函数。
+
     用法:
     @agent_endpoint("sentiment")
     def sentiment_agent(state: AgentState) -> AgentState:
@@ -264,164 +527,63 @@ def agent_endpoint(agent_name: str, description: str = ""):
         # 初始化此agent的LLM调用跟踪
         _agent_llm_calls[agent_name] = False
 
+        if inspect.iscoroutinefunction(agent_func):
+            @functools.wraps(agent_func)
+            async def async_wrapper(state):
+                run_id, timestamp_start, serialized_input = _begin_agent_execution(
+                    agent_name, state)
+                # 捕获状态保存在上下文变量中，每个协程各自独立
+                capture = _start_output_capture(agent_name, run_id)
+                context_tokens = _set_agent_context(agent_name, run_id)
+                node_span = start_span(
+                    agent_name, "node", run_id=run_id, agent_name=agent_name)
+                try:
+                    result = await agent_func(state)
+                except Exception as e:
+                    end_span(node_span, error=e)
+                    terminal_outputs = _stop_output_capture(capture)
+                    _record_agent_error(agent_name, run_id, timestamp_start,
+                                        serialized_input, str(e), terminal_outputs)
+                    raise
+                finally:
+                    _reset_agent_context(context_tokens)
+                end_span(node_span)
+                terminal_outputs = _stop_output_capture(capture)
+                _record_agent_success(agent_name, run_id, timestamp_start,
+                                      serialized_input, result, terminal_outputs)
+                return result
+
+            return async_wrapper
+
         @functools.wraps(agent_func)
         def wrapper(state):
-            # 更新Agent状态为运行中
-            api_state.update_agent_state(agent_name, "running")
-
-            # 添加当前agent名称到状态元数据
-            if "metadata" not in state:
-                state["metadata"] = {}
-            state["metadata"]["current_agent_name"] = agent_name
-
-            # 确保run_id在元数据中，这对日志记录至关重要
-            run_id = state.get("metadata", {}).get("run_id")
-            # 记录输入状态
-            timestamp_start = datetime.now(UTC)
-            serialized_input = serialize_agent_state(state)
-            api_state.update_agent_data(
-                agent_name, "input_state", serialized_input)
-
-            result = None
-            error = None
-            terminal_outputs = []  # Capture terminal output
-
-            # Capture stdout/stderr and logs during agent execution
-            old_stdout = sys.stdout
-            old_stderr = sys.stderr
-            log_stream = io.StringIO()
-            log_handler = logging.StreamHandler(log_stream)
-            log_handler.setLevel(logging.INFO)
-            root_logger = logging.getLogger()
-            root_logger.addHandler(log_handler)
-
-            redirect_stdout = io.StringIO()
-            redirect_stderr = io.StringIO()
-            sys.stdout = redirect_stdout
-            sys.stderr = redirect_stderr
-
+            run_id, timestamp_start, serialized_input = _begin_agent_execution(
+                agent_name, state)
+
+            # Capture stdout/stderr and logs of this context during agent execution
+            capture = _start_output_capture(agent_name, run_id)
+            context_tokens = _set_agent_context(agent_name, run_id)
+            # 节点内的 LLM 调用和数据请求记录为该 span 的子 span
+            node_span = start_span(
+                agent_name, "node", run_id=run_id, agent_name=agent_name)
             try:
                 # --- 执行Agent核心逻辑 ---
-                # 直接调用原始 agent_func
                 result = agent_func(state)
                 # --------------------------
-
-                timestamp_end = datetime.now(UTC)
-
-                # 恢复标准输出/错误
-                sys.stdout = old_stdout
-                sys.stderr = old_stderr
-                root_logger.removeHandler(log_handler)
-
-                # 获取捕获的输出
-                stdout_content = redirect_stdout.getvalue()
-                stderr_content = redirect_stderr.getvalue()
-                log_content = log_stream.getvalue()
-                if stdout_content:
-                    terminal_outputs.append(stdout_content)
-                if stderr_content:
-                    terminal_outputs.append(stderr_content)
-                if log_content:
-                    terminal_outputs.append(log_content)
-
-                # 序列化输出状态
-                serialized_output = serialize_agent_state(result)
-                api_state.update_agent_data(
-                    agent_name, "output_state", serialized_output)
-
-                # 从状态中提取推理细节（如果有）
-                reasoning_details = None
-                if result.get("metadata", {}).get("show_reasoning", False):
-                    if "agent_reasoning" in result.get("metadata", {}):
-                        reasoning_details = result["metadata"]["agent_reasoning"]
-                        api_state.update_agent_data(
-                            agent_name,
-                            "reasoning",
-                            reasoning_details
-                        )
-
-                # 更新Agent状态为已完成
-                api_state.update_agent_state(agent_name, "completed")
-
-                # --- 添加Agent执行日志到BaseLogStorage ---
-                try:
-                    if _has_log_system:
-                        log_storage = get_log_storage()
-                        if log_storage:
-                            log_entry = AgentExecutionLog(
-                                agent_name=agent_name,
-                                run_id=run_id,
-                                timestamp_start=timestamp_start,
-                                timestamp_end=timestamp_end,
-                                input_state=serialized_input,
-                                output_state=serialized_output,
-                                reasoning_details=reasoning_details,
-                                terminal_outputs=terminal_outputs
-                            )
-                            log_storage.add_agent_log(log_entry)
-                            logger.debug(
-                                f"已将Agent执行日志保存到存储: {agent_name}, run_id: {run_id}")
-                        else:
-                            logger.warning(
-                                f"无法获取日志存储实例，跳过Agent执行日志记录: {agent_name}")
-                except Exception as log_err:
-                    logger.error(
-                        f"保存Agent执行日志到存储失败: {agent_name}, {str(log_err)}")
-                # -----------------------------------------
-
-                return result
             except Exception as e:
-                # Record end time even on error
-                timestamp_end = datetime.now(UTC)
-                error = str(e)
-                # 恢复标准输出/错误
-                sys.stdout = old_stdout
-                sys.stderr = old_stderr
-                root_logger.removeHandler(log_handler)
-                # 获取捕获的输出
-                stdout_content = redirect_stdout.getvalue()
-                stderr_content = redirect_stderr.getvalue()
-                log_content = log_stream.getvalue()
-                if stdout_content:
-                    terminal_outputs.append(stdout_content)
-                if stderr_content:
-                    terminal_outputs.append(stderr_content)
-                if log_content:
-                    terminal_outputs.append(log_content)
-
-                # 更新Agent状态为错误
-                api_state.update_agent_state(agent_name, "error")
-                # 记录错误信息
-                api_state.update_agent_data(agent_name, "error", error)
-
-                # --- 添加错误日志到BaseLogStorage ---
-                try:
-                    if _has_log_system:
-                        log_storage = get_log_storage()
-                        if log_storage:
-                            log_entry = AgentExecutionLog(
-                                agent_name=agent_name,
-                                run_id=run_id,
-                                timestamp_start=timestamp_start,
-                                timestamp_end=timestamp_end,
-                                input_state=serialized_input,
-                                output_state={"error": error},
-                                reasoning_details=None,
-                                terminal_outputs=terminal_outputs
-                            )
-                            log_storage.add_agent_log(log_entry)
-                            logger.debug(
-                                f"已将Agent错误日志保存到存储: {agent_name}, run_id: {run_id}")
-                        else:
-                            logger.warning(
-                                f"无法获取日志存储实例，跳过Agent错误日志记录: {agent_name}")
-                except Exception as log_err:
-                    logger.error(
-                        f"保存Agent错误日志到存储失败: {agent_name}, {str(log_err)}")
-                # --------------------------------------
-
+                end_span(node_span, error=e)
+                terminal_outputs = _stop_output_capture(capture)
+                _record_agent_error(agent_name, run_id, timestamp_start,
+                                    serialized_input, str(e), terminal_outputs)
                 # 重新抛出异常
                 raise
+            finally:
+                _reset_agent_context(context_tokens)
+            end_span(node_span)
+            terminal_outputs = _stop_output_capture(capture)
+            _record_agent_success(agent_name, run_id, timestamp_start,
+                                  serialized_input, result, terminal_outputs)
+            return result
 
         return wrapper
     return decorator
@@ -430,6 +592,9 @@ def agent_endpoint(agent_name: str, description: str = ""):
 # 启动API服务器的函数
 def start_api_server(host="0.0.0.0", port=8000, stop_event=None):
     """在独立线程中启动API服务器"""
+    import uvicorn
+    from backend.main import app
+
     if stop_event:
         # 使用支持优雅关闭的配置
         config = uvicorn.Config(
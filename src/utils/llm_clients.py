@@ -1,11 +1,14 @@
+import asyncio
 import os
+import threading
 import time
-import backoff
+import weakref
 from abc import ABC, abstractmethod
 from dotenv import load_dotenv
-from openai import OpenAI
-from google import genai
 from src.utils.logging_config import setup_logger, SUCCESS_ICON, ERROR_ICON, WAIT_ICON
+from src.utils.retry_policy import EmptyResponseError, resolve_retry_policy
+from src.utils.tracing import set_span_attributes
+from src.utils.metrics import LLM_DURATION, LLM_REQUESTS, LLM_RETRIES, LLM_TOKENS
 
 # 设置日志记录
 logger = setup_logger('llm_clients')
@@ -14,15 +17,81 @@ logger = setup_logger('llm_clients')
 class LLMClient(ABC):
     """LLM 客户端抽象基类"""
 
+    # 指标中的 provider 标签
+    provider = "llm"
+
     @abstractmethod
     def get_completion(self, messages, **kwargs):
         """获取模型回答"""
         pass
 
+    async def aget_completion(self, messages, **kwargs):
+        """异步获取模型回答，默认在线程池中执行同步实现"""
+        return await asyncio.to_thread(self.get_completion, messages, **kwargs)
+
+    def _record_call(self, status: str, started: float, attempts: int):
+        LLM_REQUESTS.inc(provider=self.provider, status=status)
+        LLM_DURATION.observe(time.perf_counter() - started, provider=self.provider)
+        if attempts > 1:
+            LLM_RETRIES.inc(attempts - 1, provider=self.provider)
+
+    def _call_with_metrics(self, policy, attempt, label):
+        """按重试策略执行 attempt，并记录调用结果、总耗时和重试次数"""
+        attempts = 0
+
+        def counted(start):
+            nonlocal attempts
+            attempts += 1
+            return attempt(start)
+
+        started = time.perf_counter()
+        try:
+            result = policy.call(counted, label=label)
+        except Exception:
+            self._record_call("error", started, attempts)
+            raise
+        self._record_call("success", started, attempts)
+        return result
+
+    async def _acall_with_metrics(self, policy, attempt, label):
+        """_call_with_metrics 的协程版本"""
+        attempts = 0
+
+        async def counted(start):
+            nonlocal attempts
+            attempts += 1
+            return await attempt(start)
+
+        started = time.perf_counter()
+        try:
+            result = await policy.acall(counted, label=label)
+        except Exception:
+            self._record_call("error", started, attempts)
+            raise
+        self._record_call("success", started, attempts)
+        return result
+
+    def _get_async_client(self, factory):
+        """获取绑定到当前事件循环的异步客户端
+
+        异步 HTTP 连接池与创建它的事件循环绑定，因此按事件循环分别缓存，
+        同一事件循环上的所有请求共享同一个连接池。
+        """
+        loop = asyncio.get_running_loop()
+        if not hasattr(self, "_async_clients"):
+            self._async_clients = weakref.WeakKeyDictionary()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = factory()
+            self._async_clients[loop] = client
+        return client
+
 
 class GeminiClient(LLMClient):
     """Google Gemini API 客户端"""
 
+    provider = "gemini"
+
     def __init__(self, api_key=None, model=None):
         self.api_key = api_key or os.getenv("GEMINI_API_KEY")
         self.model = model or os.getenv("GEMINI_MODEL", "gemini-1.5-flash")
@@ -32,19 +101,23 @@ class GeminiClient(LLMClient):
             raise ValueError(
                 "GEMINI_API_KEY not found in environment variables")
 
-        # 初始化 Gemini 客户端
+        # 初始化 Gemini 客户端，SDK 导入较慢，在首次创建客户端时才导入
+        from google import genai
         self.client = genai.Client(api_key=self.api_key)
         logger.info(f"{SUCCESS_ICON} Gemini 客户端初始化成功")
 
-    @backoff.on_exception(
-        backoff.expo,
-        (Exception),
-        max_tries=5,
-        max_time=300,
-        giveup=lambda e: "AFC is enabled" not in str(e)
-    )
-    def generate_content_with_retry(self, contents, config=None):
-        """带重试机制的内容生成函数"""
+    @staticmethod
+    def _log_api_error(error):
+        error_msg = str(error)
+        if "location" in error_msg.lower():
+            logger.info(
+                f"\033[91m❗ Gemini API 地理位置限制错误: 请使用美国节点VPN后重试\033[0m")
+            logger.error(f"详细错误: {error_msg}")
+        else:
+            logger.error(f"{ERROR_ICON} API 调用失败: {error_msg}")
+
+    def generate_content(self, contents, config=None):
+        """单次调用 Gemini API，重试由 RetryPolicy 负责"""
         try:
             logger.info(f"{WAIT_ICON} 正在调用 Gemini API...")
             logger.debug(f"请求内容: {contents}")
@@ -60,88 +133,127 @@ class GeminiClient(LLMClient):
             logger.debug(f"响应内容: {response.text[:500]}...")
             return response
         except Exception as e:
-            error_msg = str(e)
-            if "location" in error_msg.lower():
-                logger.info(
-                    f"\033[91m❗ Gemini API 地理位置限制错误: 请使用美国节点VPN后重试\033[0m")
-                logger.error(f"详细错误: {error_msg}")
-            elif "AFC is enabled" in error_msg:
-                logger.warning(
-                    f"{ERROR_ICON} 触发 API 限制，等待重试... 错误: {error_msg}")
-                time.sleep(5)
-            else:
-                logger.error(f"{ERROR_ICON} API 调用失败: {error_msg}")
+            self._log_api_error(e)
             raise e
 
-    def get_completion(self, messages, max_retries=3, initial_retry_delay=1, **kwargs):
-        """获取聊天完成结果，包含重试逻辑"""
+    @staticmethod
+    def _build_request(messages):
+        """将 OpenAI 格式的消息转换为 Gemini 的 prompt 和配置"""
+        prompt = ""
+        system_instruction = None
+
+        for message in messages:
+            role = message["role"]
+            content = message["content"]
+            if role == "system":
+                system_instruction = content
+            elif role == "user":
+                prompt += f"User: {content}\n"
+            elif role == "assistant":
+                prompt += f"Assistant: {content}\n"
+
+        # 准备配置
+        config = {}
+        if system_instruction:
+            config['system_instruction'] = system_instruction
+
+        return prompt.strip(), config
+
+    @staticmethod
+    def _with_timeout(config, timeout):
+        """为单次请求设置 HTTP 超时（秒），超时为 None 时不限制"""
+        if timeout is None:
+            return config
+        # Gemini SDK 的 HTTP 超时以毫秒为单位，0 表示不限制
+        return {**config, 'http_options': {'timeout': max(1, int(timeout * 1000))}}
+
+    @staticmethod
+    def _response_text(response):
+        if response is None:
+            raise EmptyResponseError("API 返回空值")
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            set_span_attributes(prompt_tokens=usage.prompt_token_count,
+                                completion_tokens=usage.candidates_token_count)
+            LLM_TOKENS.inc(usage.prompt_token_count or 0,
+                           provider="gemini", type="prompt")
+            LLM_TOKENS.inc(usage.candidates_token_count or 0,
+                           provider="gemini", type="completion")
+        logger.debug(f"API 原始响应: {response.text}")
+        logger.info(f"{SUCCESS_ICON} 成功获取 Gemini 响应")
+        return response.text
+
+    def get_completion(self, messages, max_retries=None, initial_retry_delay=None,
+                       retry_policy=None, **kwargs):
+        """获取聊天完成结果，按 RetryPolicy 重试，失败时返回 None"""
+        policy = resolve_retry_policy(
+            retry_policy, max_retries, initial_retry_delay)
         try:
             logger.info(f"{WAIT_ICON} 使用 Gemini 模型: {self.model}")
             logger.debug(f"消息内容: {messages}")
+            contents, config = self._build_request(messages)
 
-            for attempt in range(max_retries):
-                try:
-                    # 转换消息格式
-                    prompt = ""
-                    system_instruction = None
-
-                    for message in messages:
-                        role = message["role"]
-                        content = message["content"]
-                        if role == "system":
-                            system_instruction = content
-                        elif role == "user":
-                            prompt += f"User: {content}\n"
-                        elif role == "assistant":
-                            prompt += f"Assistant: {content}\n"
-
-                    # 准备配置
-                    config = {}
-                    if system_instruction:
-                        config['system_instruction'] = system_instruction
-
-                    # 调用 API
-                    response = self.generate_content_with_retry(
-                        contents=prompt.strip(),
-                        config=config
-                    )
-
-                    if response is None:
-                        logger.warning(
-                            f"{ERROR_ICON} 尝试 {attempt + 1}/{max_retries}: API 返回空值")
-                        if attempt < max_retries - 1:
-                            retry_delay = initial_retry_delay * (2 ** attempt)
-                            logger.info(
-                                f"{WAIT_ICON} 等待 {retry_delay} 秒后重试...")
-                            time.sleep(retry_delay)
-                            continue
-                        return None
-
-                    logger.debug(f"API 原始响应: {response.text}")
-                    logger.info(f"{SUCCESS_ICON} 成功获取 Gemini 响应")
-
-                    # 直接返回文本内容
-                    return response.text
-
-                except Exception as e:
-                    logger.error(
-                        f"{ERROR_ICON} 尝试 {attempt + 1}/{max_retries} 失败: {str(e)}")
-                    if attempt < max_retries - 1:
-                        retry_delay = initial_retry_delay * (2 ** attempt)
-                        logger.info(f"{WAIT_ICON} 等待 {retry_delay} 秒后重试...")
-                        time.sleep(retry_delay)
-                    else:
-                        logger.error(f"{ERROR_ICON} 最终错误: {str(e)}")
-                        return None
+            def attempt(start):
+                request_config = self._with_timeout(
+                    config, policy.remaining_time(start))
+                return self._response_text(
+                    self.generate_content(contents=contents, config=request_config))
 
+            return self._call_with_metrics(policy, attempt, label="Gemini API 调用")
         except Exception as e:
-            logger.error(f"{ERROR_ICON} get_completion 发生错误: {str(e)}")
+            logger.error(f"{ERROR_ICON} 最终错误: {str(e)}")
+            return None
+
+    async def agenerate_content(self, contents, config=None):
+        """单次异步调用 Gemini API，重试由 RetryPolicy 负责"""
+        try:
+            logger.info(f"{WAIT_ICON} 正在异步调用 Gemini API...")
+            logger.debug(f"请求内容: {contents}")
+            logger.debug(f"请求配置: {config}")
+
+            from google import genai
+            aio = self._get_async_client(
+                lambda: genai.Client(api_key=self.api_key).aio)
+            response = await aio.models.generate_content(
+                model=self.model,
+                contents=contents,
+                config=config
+            )
+
+            logger.info(f"{SUCCESS_ICON} API 调用成功")
+            logger.debug(f"响应内容: {response.text[:500]}...")
+            return response
+        except Exception as e:
+            self._log_api_error(e)
+            raise e
+
+    async def aget_completion(self, messages, max_retries=None, initial_retry_delay=None,
+                              retry_policy=None, **kwargs):
+        """异步获取聊天完成结果，重试逻辑与 get_completion 相同"""
+        policy = resolve_retry_policy(
+            retry_policy, max_retries, initial_retry_delay)
+        try:
+            logger.info(f"{WAIT_ICON} 使用 Gemini 模型: {self.model}")
+            logger.debug(f"消息内容: {messages}")
+            contents, config = self._build_request(messages)
+
+            async def attempt(start):
+                request_config = self._with_timeout(
+                    config, policy.remaining_time(start))
+                return self._response_text(
+                    await self.agenerate_content(contents=contents, config=request_config))
+
+            return await self._acall_with_metrics(policy, attempt, label="Gemini API 调用")
+        except Exception as e:
+            logger.error(f"{ERROR_ICON} 最终错误: {str(e)}")
             return None
 
 
 class OpenAICompatibleClient(LLMClient):
     """OpenAI 兼容 API 客户端"""
 
+    provider = "openai_compatible"
+
     def __init__(self, api_key=None, base_url=None, model=None):
         self.api_key = api_key or os.getenv("OPENAI_COMPATIBLE_API_KEY")
         self.base_url = base_url or os.getenv("OPENAI_COMPATIBLE_BASE_URL")
@@ -162,30 +274,29 @@ class OpenAICompatibleClient(LLMClient):
             raise ValueError(
                 "OPENAI_COMPATIBLE_MODEL not found in environment variables")
 
-        # 初始化 OpenAI 客户端
+        # 初始化 OpenAI 客户端，关闭 SDK 内置重试，统一由 RetryPolicy 控制
+        # SDK 导入较慢，在首次创建客户端时才导入
+        from openai import OpenAI
         self.client = OpenAI(
             base_url=self.base_url,
-            api_key=self.api_key
+            api_key=self.api_key,
+            max_retries=0
         )
         logger.info(f"{SUCCESS_ICON} OpenAI Compatible 客户端初始化成功")
 
-    @backoff.on_exception(
-        backoff.expo,
-        (Exception),
-        max_tries=5,
-        max_time=300
-    )
-    def call_api_with_retry(self, messages, stream=False):
-        """带重试机制的 API 调用函数"""
+    def call_api(self, messages, stream=False, timeout=None):
+        """单次调用 API，timeout 为本次请求的超时秒数"""
         try:
             logger.info(f"{WAIT_ICON} 正在调用 OpenAI Compatible API...")
             logger.debug(f"请求内容: {messages}")
             logger.debug(f"模型: {self.model}, 流式: {stream}")
 
+            from openai import NOT_GIVEN
             response = self.client.chat.completions.create(
                 model=self.model,
                 messages=messages,
-                stream=stream
+                stream=stream,
+                timeout=NOT_GIVEN if timeout is None else timeout
             )
 
             logger.info(f"{SUCCESS_ICON} API 调用成功")
@@ -195,49 +306,82 @@ class OpenAICompatibleClient(LLMClient):
             logger.error(f"{ERROR_ICON} API 调用失败: {error_msg}")
             raise e
 
-    def get_completion(self, messages, max_retries=3, initial_retry_delay=1, **kwargs):
-        """获取聊天完成结果，包含重试逻辑"""
+    @staticmethod
+    def _response_content(response):
+        if response is None:
+            raise EmptyResponseError("API 返回空值")
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            set_span_attributes(prompt_tokens=usage.prompt_tokens,
+                                completion_tokens=usage.completion_tokens)
+            LLM_TOKENS.inc(usage.prompt_tokens or 0,
+                           provider="openai_compatible", type="prompt")
+            LLM_TOKENS.inc(usage.completion_tokens or 0,
+                           provider="openai_compatible", type="completion")
+        content = response.choices[0].message.content
+        logger.debug(f"API 原始响应: {content[:500]}...")
+        logger.info(f"{SUCCESS_ICON} 成功获取 OpenAI Compatible 响应")
+        return content
+
+    def get_completion(self, messages, max_retries=None, initial_retry_delay=None,
+                       retry_policy=None, **kwargs):
+        """获取聊天完成结果，按 RetryPolicy 重试，失败时返回 None"""
+        policy = resolve_retry_policy(
+            retry_policy, max_retries, initial_retry_delay)
         try:
             logger.info(f"{WAIT_ICON} 使用 OpenAI Compatible 模型: {self.model}")
             logger.debug(f"消息内容: {messages}")
 
-            for attempt in range(max_retries):
-                try:
-                    # 调用 API
-                    response = self.call_api_with_retry(messages)
-
-                    if response is None:
-                        logger.warning(
-                            f"{ERROR_ICON} 尝试 {attempt + 1}/{max_retries}: API 返回空值")
-                        if attempt < max_retries - 1:
-                            retry_delay = initial_retry_delay * (2 ** attempt)
-                            logger.info(
-                                f"{WAIT_ICON} 等待 {retry_delay} 秒后重试...")
-                            time.sleep(retry_delay)
-                            continue
-                        return None
-
-                    # 打印调试信息
-                    content = response.choices[0].message.content
-                    logger.debug(f"API 原始响应: {content[:500]}...")
-                    logger.info(f"{SUCCESS_ICON} 成功获取 OpenAI Compatible 响应")
-
-                    # 直接返回文本内容
-                    return content
-
-                except Exception as e:
-                    logger.error(
-                        f"{ERROR_ICON} 尝试 {attempt + 1}/{max_retries} 失败: {str(e)}")
-                    if attempt < max_retries - 1:
-                        retry_delay = initial_retry_delay * (2 ** attempt)
-                        logger.info(f"{WAIT_ICON} 等待 {retry_delay} 秒后重试...")
-                        time.sleep(retry_delay)
-                    else:
-                        logger.error(f"{ERROR_ICON} 最终错误: {str(e)}")
-                        return None
+            def attempt(start):
+                # 单次请求的超时不超过剩余的总时限
+                return self._response_content(
+                    self.call_api(messages, timeout=policy.remaining_time(start)))
 
+            return self._call_with_metrics(policy, attempt, label="OpenAI Compatible API 调用")
         except Exception as e:
-            logger.error(f"{ERROR_ICON} get_completion 发生错误: {str(e)}")
+            logger.error(f"{ERROR_ICON} 最终错误: {str(e)}")
+            return None
+
+    async def acall_api(self, messages, stream=False, timeout=None):
+        """单次异步调用 API，timeout 为本次请求的超时秒数"""
+        try:
+            logger.info(f"{WAIT_ICON} 正在异步调用 OpenAI Compatible API...")
+            logger.debug(f"请求内容: {messages}")
+            logger.debug(f"模型: {self.model}, 流式: {stream}")
+
+            from openai import NOT_GIVEN, AsyncOpenAI
+            async_client = self._get_async_client(
+                lambda: AsyncOpenAI(base_url=self.base_url, api_key=self.api_key, max_retries=0))
+            response = await async_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                stream=stream,
+                timeout=NOT_GIVEN if timeout is None else timeout
+            )
+
+            logger.info(f"{SUCCESS_ICON} API 调用成功")
+            return response
+        except Exception as e:
+            error_msg = str(e)
+            logger.error(f"{ERROR_ICON} API 调用失败: {error_msg}")
+            raise e
+
+    async def aget_completion(self, messages, max_retries=None, initial_retry_delay=None,
+                              retry_policy=None, **kwargs):
+        """异步获取聊天完成结果，重试逻辑与 get_completion 相同"""
+        policy = resolve_retry_policy(
+            retry_policy, max_retries, initial_retry_delay)
+        try:
+            logger.info(f"{WAIT_ICON} 使用 OpenAI Compatible 模型: {self.model}")
+            logger.debug(f"消息内容: {messages}")
+
+            async def attempt(start):
+                return self._response_content(
+                    await self.acall_api(messages, timeout=policy.remaining_time(start)))
+
+            return await self._acall_with_metrics(policy, attempt, label="OpenAI Compatible API 调用")
+        except Exception as e:
+            logger.error(f"{ERROR_ICON} 最终错误: {str(e)}")
             return None
 
 
@@ -245,38 +389,122 @@ class LLMClientFactory:
     """LLM 客户端工厂类"""
 
     @staticmethod
-    def create_client(client_type="auto", **kwargs):
+    def resolve_config(client_type="auto", api_key=None, base_url=None, model=None):
         """
-        创建 LLM 客户端
-
-        Args:
-            client_type: 客户端类型 ("auto", "gemini", "openai_compatible")
-            **kwargs: 特定客户端的配置参数
+        解析客户端类型并用环境变量补全配置
 
         Returns:
-            LLMClient: 实例化的 LLM 客户端
+            tuple: (client_type, base_url, model, api_key)
         """
         # 如果设置为 auto，自动检测可用的客户端
         if client_type == "auto":
             # 检查是否提供了 OpenAI Compatible API 相关配置
-            if (kwargs.get("api_key") and kwargs.get("base_url") and kwargs.get("model")) or \
+            if (api_key and base_url and model) or \
                (os.getenv("OPENAI_COMPATIBLE_API_KEY") and os.getenv("OPENAI_COMPATIBLE_BASE_URL") and os.getenv("OPENAI_COMPATIBLE_MODEL")):
                 client_type = "openai_compatible"
-                logger.info(f"{WAIT_ICON} 自动选择 OpenAI Compatible API")
             else:
                 client_type = "gemini"
-                logger.info(f"{WAIT_ICON} 自动选择 Gemini API")
 
         if client_type == "gemini":
-            return GeminiClient(
-                api_key=kwargs.get("api_key"),
-                model=kwargs.get("model")
-            )
+            return (client_type, None,
+                    model or os.getenv("GEMINI_MODEL", "gemini-1.5-flash"),
+                    api_key or os.getenv("GEMINI_API_KEY"))
         elif client_type == "openai_compatible":
-            return OpenAICompatibleClient(
-                api_key=kwargs.get("api_key"),
-                base_url=kwargs.get("base_url"),
-                model=kwargs.get("model")
-            )
+            return (client_type,
+                    base_url or os.getenv("OPENAI_COMPATIBLE_BASE_URL"),
+                    model or os.getenv("OPENAI_COMPATIBLE_MODEL"),
+                    api_key or os.getenv("OPENAI_COMPATIBLE_API_KEY"))
         else:
             raise ValueError(f"不支持的客户端类型: {client_type}")
+
+    @staticmethod
+    def create_client(client_type="auto", **kwargs):
+        """
+        创建 LLM 客户端
+
+        Args:
+            client_type: 客户端类型 ("auto", "gemini", "openai_compatible")
+            **kwargs: 特定客户端的配置参数
+
+        Returns:
+            LLMClient: 实例化的 LLM 客户端
+        """
+        requested_type = client_type
+        client_type, base_url, model, api_key = LLMClientFactory.resolve_config(
+            client_type,
+            api_key=kwargs.get("api_key"),
+            base_url=kwargs.get("base_url"),
+            model=kwargs.get("model")
+        )
+        if requested_type == "auto":
+            label = "OpenAI Compatible" if client_type == "openai_compatible" else "Gemini"
+            logger.info(f"{WAIT_ICON} 自动选择 {label} API")
+
+        if client_type == "gemini":
+            return GeminiClient(api_key=api_key, model=model)
+        return OpenAICompatibleClient(api_key=api_key, base_url=base_url, model=model)
+
+    @staticmethod
+    def get_client(client_type="auto", **kwargs):
+        """从共享注册表获取可复用的 LLM 客户端，不存在时创建"""
+        return client_registry.get(client_type, **kwargs)
+
+
+class LLMClientRegistry:
+    """按 (client_type, base_url, model, api_key) 缓存的 LLM 客户端注册表
+
+    底层的 genai.Client 和 OpenAI 客户端是线程安全的，并各自维护 HTTP 连接池，
+    在所有智能体和运行之间共享同一个实例可以避免重复建立连接和 TLS 握手。
+    """
+
+    def __init__(self):
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0,
+                       "lookup_seconds": 0.0, "create_seconds": 0.0}
+
+    def get(self, client_type="auto", api_key=None, base_url=None, model=None):
+        start = time.perf_counter()
+        key = LLMClientFactory.resolve_config(
+            client_type, api_key=api_key, base_url=base_url, model=model)
+
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._stats["hits"] += 1
+                self._stats["lookup_seconds"] += time.perf_counter() - start
+                return client
+
+            # 未命中时在锁内创建，避免并发请求重复创建同一个客户端
+            resolved_type, resolved_base_url, resolved_model, resolved_api_key = key
+            create_start = time.perf_counter()
+            client = LLMClientFactory.create_client(
+                client_type=resolved_type,
+                api_key=resolved_api_key,
+                base_url=resolved_base_url,
+                model=resolved_model
+            )
+            self._clients[key] = client
+            now = time.perf_counter()
+            self._stats["misses"] += 1
+            self._stats["create_seconds"] += now - create_start
+            self._stats["lookup_seconds"] += now - start
+            logger.info(
+                f"{SUCCESS_ICON} 已缓存 {resolved_type} 客户端 (模型: {resolved_model}, 共 {len(self._clients)} 个)")
+            return client
+
+    def get_stats(self):
+        """返回注册表命中次数和获取客户端的累计耗时"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["clients"] = len(self._clients)
+        return stats
+
+    def clear(self):
+        """清空已缓存的客户端，例如在更换 API 密钥之后"""
+        with self._lock:
+            self._clients.clear()
+
+
+# 进程级共享实例
+client_registry = LLMClientRegistry()
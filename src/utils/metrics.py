@@ -0,0 +1,249 @@
+"""
+进程内指标注册表
+
+Agent、LLM 客户端、akshare 调用和各类缓存在运行时更新这里的计数器、直方图和仪表，
+后端的 /metrics 接口以 Prometheus 文本格式输出，便于对耗时回退设置告警。
+每次更新只做一次加锁的字典累加，不依赖 prometheus_client。
+
+指标名统一使用 hedge_fund_ 前缀，耗时单位为秒。
+"""
+
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+# 耗时直方图的默认分桶（秒），覆盖毫秒级的缓存命中到数分钟的 LLM 调用
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+LabelValues = Tuple[str, ...]
+Samples = Union[float, Iterable[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"指标 {self.name} 需要标签 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}",
+                f"# TYPE {self.name} {self.type_name}"]
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def items(self) -> List[Tuple[Dict[str, str], float]]:
+        with self._lock:
+            items = list(self._values.items())
+        return [(dict(zip(self.labelnames, key)), value) for key, value in items]
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items]
+
+
+class Gauge(_Metric):
+    """可增可减的仪表，也可以在输出时通过回调取值"""
+    type_name = "gauge"
+
+    def __init__(self, *args, callback: Optional[Callable[[], Samples]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+        self._callback = callback
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def _samples(self) -> List[Tuple[LabelValues, float]]:
+        if self._callback is None:
+            with self._lock:
+                return sorted(self._values.items())
+        result = self._callback()
+        if isinstance(result, (int, float)):
+            return [((), float(result))]
+        return [(self._key(labels), value) for labels, value in result]
+
+    def render(self) -> List[str]:
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in self._samples()]
+
+
+class Histogram(_Metric):
+    """按分桶统计观测值的直方图"""
+    type_name = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # 每组标签：[各分桶计数（非累计）..., +Inf 分桶计数, 总和]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            row[index] += 1
+            row[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(row)) for key, row in self._values.items())
+        lines = self._header()
+        for key, row in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), row[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(cumulative)}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(row[-1])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(cumulative)}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表，同名指标只创建一次"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(
+                    name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"指标 {name} 已注册为 {metric.type_name}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              callback: Optional[Callable[[], Samples]] = None) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames, callback=callback)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        """以 Prometheus 文本格式输出所有指标"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# 进程级共享实例
+metrics_registry = MetricsRegistry()
+
+# --- 运行和 Agent ---
+RUNS_TOTAL = metrics_registry.counter(
+    "hedge_fund_runs_total", "Completed workflow runs by final status", ("status",))
+RUN_DURATION = metrics_registry.histogram(
+    "hedge_fund_run_duration_seconds", "Workflow run duration by final status", ("status",),
+    buckets=(5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0))
+AGENT_DURATION = metrics_registry.histogram(
+    "hedge_fund_agent_duration_seconds", "Agent node execution time", ("agent", "status"))
+
+# --- LLM ---
+LLM_REQUESTS = metrics_registry.counter(
+    "hedge_fund_llm_requests_total", "LLM calls by provider and outcome", ("provider", "status"))
+LLM_DURATION = metrics_registry.histogram(
+    "hedge_fund_llm_request_duration_seconds", "LLM call latency including retries", ("provider",))
+LLM_TOKENS = metrics_registry.counter(
+    "hedge_fund_llm_tokens_total", "LLM tokens by provider and direction", ("provider", "type"))
+LLM_RETRIES = metrics_registry.counter(
+    "hedge_fund_llm_retries_total", "LLM retry attempts by provider", ("provider",))
+
+# --- akshare ---
+AKSHARE_REQUESTS = metrics_registry.counter(
+    "hedge_fund_akshare_requests_total", "akshare calls by endpoint and outcome", ("endpoint", "status"))
+AKSHARE_DURATION = metrics_registry.histogram(
+    "hedge_fund_akshare_request_duration_seconds", "akshare call latency", ("endpoint",))
+
+# --- 缓存 ---
+CACHE_REQUESTS = metrics_registry.counter(
+    "hedge_fund_cache_requests_total", "Cache lookups by cache and result", ("cache", "result"))
+
+
+def _cache_hit_ratios() -> List[Tuple[Dict[str, str], float]]:
+    totals: Dict[str, List[float]] = {}
+    for labels, value in CACHE_REQUESTS.items():
+        hits_lookups = totals.setdefault(labels["cache"], [0.0, 0.0])
+        if labels["result"] == "hit":
+            hits_lookups[0] += value
+        hits_lookups[1] += value
+    return [({"cache": cache}, hits / lookups if lookups else 0.0)
+            for cache, (hits, lookups) in sorted(totals.items())]
+
+
+CACHE_HIT_RATIO = metrics_registry.gauge(
+    "hedge_fund_cache_hit_ratio", "Cache hit ratio since process start", ("cache",),
+    callback=_cache_hit_ratios)
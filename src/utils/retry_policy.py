@@ -0,0 +1,242 @@
+"""
+LLM 调用的统一重试策略
+
+一个 RetryPolicy 同时限定最大尝试次数和总耗时（deadline），
+重试间隔采用带抖动的指数退避，并区分可重试错误（超时、限流、5xx 等）和致命错误（鉴权、参数错误等）。
+致命错误立即返回，不再等待；剩余时间不足以完成下一次等待时也立即放弃。
+
+策略可以按 Agent 配置：
+    - 代码中调用 set_agent_retry_policy("sentiment", RetryPolicy(deadline=20))
+    - 或通过环境变量 LLM_RETRY_POLICIES 传入 JSON，例如
+      {"sentiment": {"deadline": 20}, "portfolio_management": {"max_attempts": 5}}
+
+全局默认值的环境变量：
+    - LLM_RETRY_MAX_ATTEMPTS：最大尝试次数，默认 3
+    - LLM_RETRY_BASE_DELAY：首次重试前的基础等待秒数，默认 1
+    - LLM_RETRY_MAX_DELAY：单次等待的上限秒数，默认 30
+    - LLM_RETRY_DEADLINE：单次 LLM 调用（含所有重试）的总时限秒数，默认 120
+"""
+
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, fields, replace
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from src.utils.logging_config import setup_logger, ERROR_ICON, WAIT_ICON
+
+logger = setup_logger('retry_policy')
+
+T = TypeVar('T')
+
+# 视为致命错误的 HTTP 状态码：请求本身有问题，重试不会成功
+FATAL_STATUS_CODES = {400, 401, 403, 404, 422}
+# 视为可重试的 HTTP 状态码
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+FATAL_MESSAGES = ("api key", "api_key", "permission", "unauthorized",
+                  "location is not supported", "user location")
+RETRYABLE_MESSAGES = ("afc is enabled", "rate limit", "quota", "timeout", "timed out",
+                      "temporarily", "unavailable", "overloaded", "connection")
+
+
+class EmptyResponseError(Exception):
+    """模型返回空响应，按可重试错误处理"""
+
+
+class RetryDeadlineExceeded(Exception):
+    """重试总时限已用尽"""
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    for attr in ("status_code", "code", "status"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """判断错误是否值得重试"""
+    if isinstance(error, (EmptyResponseError, TimeoutError, ConnectionError)):
+        return True
+    if isinstance(error, (ValueError, TypeError, KeyError)):
+        return False
+
+    status = _status_code(error)
+    if status in FATAL_STATUS_CODES:
+        return False
+    if status in RETRYABLE_STATUS_CODES:
+        return True
+
+    message = str(error).lower()
+    if any(token in message for token in FATAL_MESSAGES):
+        return False
+    if any(token in message for token in RETRYABLE_MESSAGES):
+        return True
+    # 未知错误默认重试，由次数和时限兜底
+    return True
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """LLM 调用的重试策略"""
+    max_attempts: int = 3
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+    deadline: Optional[float] = 120.0
+    jitter: bool = True
+
+    def backoff_delay(self, attempt: int) -> float:
+        """第 attempt 次失败（从0开始）后的等待时间，使用 full jitter"""
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(0, delay) if self.jitter else delay
+
+    def _remaining(self, start: float) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return self.deadline - (time.monotonic() - start)
+
+    def _next_delay(self, attempt: int, error: Exception, start: float, label: str) -> Optional[float]:
+        """计算下一次重试前的等待时间，不应再重试时返回None"""
+        if not is_retryable_error(error):
+            logger.error(f"{ERROR_ICON} {label} 遇到不可重试的错误: {error}")
+            return None
+        if attempt + 1 >= self.max_attempts:
+            logger.error(
+                f"{ERROR_ICON} {label} 已达到最大尝试次数 {self.max_attempts}: {error}")
+            return None
+        delay = self.backoff_delay(attempt)
+        remaining = self._remaining(start)
+        if remaining is not None and remaining <= delay:
+            logger.error(
+                f"{ERROR_ICON} {label} 剩余时间 {max(remaining, 0):.1f}s 不足以继续重试: {error}")
+            return None
+        logger.warning(
+            f"{WAIT_ICON} {label} 尝试 {attempt + 1}/{self.max_attempts} 失败: {error}，{delay:.2f} 秒后重试")
+        return delay
+
+    def remaining_time(self, start: float) -> Optional[float]:
+        """距离总时限剩余的秒数，可用作单次请求的超时"""
+        remaining = self._remaining(start)
+        return None if remaining is None else max(remaining, 0.0)
+
+    def call(self, func: Callable[[float], T], label: str = "LLM 调用") -> T:
+        """按策略执行 func，func 接收调用开始时间，便于计算单次请求超时"""
+        start = time.monotonic()
+        for attempt in range(self.max_attempts):
+            try:
+                return func(start)
+            except Exception as e:
+                delay = self._next_delay(attempt, e, start, label)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+        raise RetryDeadlineExceeded(label)
+
+    async def acall(self, func: Callable[[float], Awaitable[T]], label: str = "LLM 调用") -> T:
+        """call 的协程版本"""
+        start = time.monotonic()
+        for attempt in range(self.max_attempts):
+            try:
+                return await func(start)
+            except Exception as e:
+                delay = self._next_delay(attempt, e, start, label)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+        raise RetryDeadlineExceeded(label)
+
+
+def _float_env(name: str, default: Optional[float]) -> Optional[float]:
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    try:
+        number = float(value)
+    except ValueError:
+        logger.warning(f"无效的 {name} 值: {value}，使用默认值 {default}")
+        return default
+    return number if number > 0 else None
+
+
+def default_retry_policy() -> RetryPolicy:
+    """根据环境变量构建全局默认策略"""
+    return RetryPolicy(
+        max_attempts=int(_float_env("LLM_RETRY_MAX_ATTEMPTS", 3) or 1),
+        base_delay=_float_env("LLM_RETRY_BASE_DELAY", 1.0) or 0.0,
+        max_delay=_float_env("LLM_RETRY_MAX_DELAY", 30.0) or 0.0,
+        deadline=_float_env("LLM_RETRY_DEADLINE", 120.0),
+    )
+
+
+_agent_policies: Dict[str, RetryPolicy] = {}
+_agent_policies_lock = threading.Lock()
+_env_policies_loaded = False
+
+
+def _load_env_policies(base: RetryPolicy):
+    """解析 LLM_RETRY_POLICIES 中按 Agent 配置的策略，调用方需持有锁"""
+    global _env_policies_loaded
+    if _env_policies_loaded:
+        return
+    _env_policies_loaded = True
+    raw = os.getenv("LLM_RETRY_POLICIES")
+    if not raw:
+        return
+    try:
+        overrides = json.loads(raw)
+        valid = {f.name for f in fields(RetryPolicy)}
+        for agent_name, values in overrides.items():
+            if agent_name not in _agent_policies:
+                _agent_policies[agent_name] = replace(
+                    base, **{k: v for k, v in values.items() if k in valid})
+    except Exception as e:
+        logger.warning(f"解析 LLM_RETRY_POLICIES 失败: {e}")
+
+
+def set_agent_retry_policy(agent_name: str, policy: RetryPolicy):
+    """为指定 Agent 设置重试策略"""
+    with _agent_policies_lock:
+        _agent_policies[agent_name] = policy
+
+
+def get_retry_policy(agent_name: Optional[str] = None) -> RetryPolicy:
+    """获取 Agent 的重试策略，未单独配置时返回全局默认策略"""
+    base = default_retry_policy()
+    with _agent_policies_lock:
+        _load_env_policies(base)
+        if agent_name and agent_name in _agent_policies:
+            return _agent_policies[agent_name]
+    return base
+
+
+def _current_agent_name() -> Optional[str]:
+    """读取 agent_endpoint 设置的当前 Agent 名称"""
+    try:
+        from src.utils.llm_interaction_logger import current_agent_name_context
+        return current_agent_name_context.get()
+    except ImportError:
+        return None
+
+
+def resolve_retry_policy(retry_policy: Optional[RetryPolicy] = None,
+                         max_retries: Optional[int] = None,
+                         initial_retry_delay: Optional[float] = None) -> RetryPolicy:
+    """确定本次调用使用的策略
+
+    未显式传入策略时按当前 Agent 查找；兼容旧的 max_retries / initial_retry_delay 参数，
+    传入时覆盖策略中对应的字段。
+    """
+    policy = retry_policy or get_retry_policy(_current_agent_name())
+    overrides = {}
+    if max_retries is not None:
+        overrides["max_attempts"] = max(1, int(max_retries))
+    if initial_retry_delay is not None:
+        overrides["base_delay"] = initial_retry_delay
+    return replace(policy, **overrides) if overrides else policy
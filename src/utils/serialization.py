@@ -3,16 +3,29 @@
 """
 
 import json
-from typing import Any, Dict
+import os
+import threading
+from typing import Any, Dict, Optional
 from datetime import datetime, UTC
 
+# 执行日志中单个状态序列化后的字节上限，超出时从最大的字段开始替换为摘要
+DEFAULT_MAX_STATE_BYTES = int(
+    os.getenv("AGENT_LOG_STATE_MAX_BYTES", 64 * 1024))
+# 有字节上限时，单个字符串和列表的长度上限
+MAX_STRING_CHARS = 4000
+MAX_LIST_ITEMS = 50
+# 列表被截断时保留的首尾元素数
+LIST_EDGE_ITEMS = 3
 
-def serialize_agent_state(state: Dict) -> Dict:
+
+def serialize_agent_state(state: Dict, max_bytes: Optional[int] = None) -> Dict:
     """
     将AgentState对象转换为JSON可序列化的字典
 
     Args:
         state: Agent状态字典，可能包含不可JSON序列化的对象
+        max_bytes: 序列化结果的字节上限（可选），设置后会截断过长的字符串和列表
+            （如 prices 价格序列），仍超出时将最大的字段替换为摘要
 
     Returns:
         转换后的JSON友好字典
@@ -21,6 +34,8 @@ def serialize_agent_state(state: Dict) -> Dict:
         return {}
 
     try:
+        if max_bytes:
+            return _shrink_to_budget(_convert_to_serializable(state, bounded=True), max_bytes)
         return _convert_to_serializable(state)
     except Exception as e:
         # 如果序列化失败，至少返回一个有用的错误信息
@@ -31,24 +46,98 @@ def serialize_agent_state(state: Dict) -> Dict:
         }
 
 
-def _convert_to_serializable(obj: Any) -> Any:
-    """递归地将对象转换为JSON可序列化格式"""
+def _convert_to_serializable(obj: Any, bounded: bool = False) -> Any:
+    """递归地将对象转换为JSON可序列化格式，bounded 为 True 时截断过长的字符串和列表"""
     if hasattr(obj, 'to_dict'):  # 处理Pandas Series/DataFrame
-        return obj.to_dict()
+        return _convert_to_serializable(obj.to_dict(), bounded) if bounded else obj.to_dict()
     elif hasattr(obj, 'content') and hasattr(obj, 'type'):  # 可能是LangChain消息
         return {
-            "content": _convert_to_serializable(obj.content),
+            "content": _convert_to_serializable(obj.content, bounded),
             "type": obj.type
         }
     elif hasattr(obj, '__dict__'):  # 处理自定义对象
-        return _convert_to_serializable(obj.__dict__)
-    elif isinstance(obj, (int, float, bool, str, type(None))):
+        return _convert_to_serializable(obj.__dict__, bounded)
+    elif isinstance(obj, str):
+        if bounded and len(obj) > MAX_STRING_CHARS:
+            return obj[:MAX_STRING_CHARS] + f"...(已截断，共{len(obj)}字符)"
+        return obj
+    elif isinstance(obj, (int, float, bool, type(None))):
         return obj
     elif isinstance(obj, (list, tuple)):
-        return [_convert_to_serializable(item) for item in obj]
+        if bounded and len(obj) > MAX_LIST_ITEMS:
+            # 保留首尾元素并保持列表形式，读取方仍可以用 [-1] 取最后一个元素
+            omitted = {"truncated": True,
+                       "omitted_items": len(obj) - 2 * LIST_EDGE_ITEMS}
+            return ([_convert_to_serializable(item, bounded) for item in obj[:LIST_EDGE_ITEMS]]
+                    + [omitted]
+                    + [_convert_to_serializable(item, bounded) for item in obj[-LIST_EDGE_ITEMS:]])
+        return [_convert_to_serializable(item, bounded) for item in obj]
     elif isinstance(obj, dict):
-        return {str(key): _convert_to_serializable(value) for key, value in obj.items()}
+        return {str(key): _convert_to_serializable(value, bounded) for key, value in obj.items()}
     elif isinstance(obj, datetime):
         return obj.isoformat()
     else:
         return str(obj)  # 回退到字符串表示
+
+
+def _json_size(obj: Any) -> int:
+    return len(json.dumps(obj, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+def _shrink_to_budget(result: Dict, max_bytes: int) -> Dict:
+    """结果超出字节上限时，从最大的第二层字段开始替换为摘要，直到满足上限"""
+    total = _json_size(result)
+    if total <= max_bytes:
+        return result
+
+    entries = []
+    for section in result.values():
+        if isinstance(section, dict):
+            keys = list(section.keys())
+        elif isinstance(section, list):
+            keys = range(len(section))
+        else:
+            continue
+        for key in keys:
+            entries.append((_json_size(section[key]), section, key))
+
+    for size, container, key in sorted(entries, key=lambda e: e[0], reverse=True):
+        if total <= max_bytes:
+            break
+        placeholder = {"omitted": True, "bytes": size}
+        container[key] = placeholder
+        total -= size - _json_size(placeholder)
+
+    result["state_truncated"] = True
+    return result
+
+
+class LazyStateSnapshot:
+    """延迟序列化的Agent状态
+
+    创建时只复制状态顶层的容器并保存引用，不做任何转换；第一次调用 serialize() 时才按字节上限序列化，
+    之后复用结果并释放引用。同一次运行中各节点的状态共享同一份 prices 等大字段，
+    因此在被读取之前，大字段在内存中只保存一份。
+    """
+
+    __slots__ = ("_state", "_max_bytes", "_result", "_lock")
+
+    def __init__(self, state: Dict, max_bytes: Optional[int] = DEFAULT_MAX_STATE_BYTES):
+        # 节点返回新的 messages 列表和 data 字典，复制顶层容器即可固定当时的内容
+        self._state = {
+            key: list(value) if isinstance(value, (list, tuple))
+            else dict(value) if isinstance(value, dict) else value
+            for key, value in (state or {}).items()
+        }
+        self._max_bytes = max_bytes
+        self._result = None
+        self._lock = threading.Lock()
+
+    def serialize(self) -> Dict:
+        """返回序列化后的状态，只在第一次调用时计算"""
+        with self._lock:
+            if self._result is None:
+                self._result = serialize_agent_state(
+                    self._state, max_bytes=self._max_bytes)
+                self._state = None
+            return self._result
@@ -0,0 +1,318 @@
+"""
+运行内的耗时追踪
+
+agent_endpoint 为每个节点创建 node span，节点内的 LLM 调用（llm span，含模型、token 数和
+是否命中缓存）和 akshare 数据请求（data span）作为其子 span 记录，按 run_id 汇总在 span_collector 中。
+/runs/{run_id}/profile 基于这些 span 计算各节点中 LLM、数据获取和其余计算各占多少时间，
+以及决定整次运行耗时的关键路径。
+
+只有在节点内（即存在父 span）时才记录子 span，批量模式中运行前的全市场预取等不属于任何运行的调用不会被记录。
+"""
+
+import functools
+import importlib
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from src.utils.metrics import AKSHARE_DURATION, AKSHARE_REQUESTS
+
+# 保留 span 的最近运行数
+MAX_TRACED_RUNS = 50
+# 单次运行最多记录的 span 数
+MAX_SPANS_PER_RUN = 5000
+
+_span_ids = itertools.count(1)
+
+
+@dataclass
+class Span:
+    span_id: int
+    run_id: str
+    name: str
+    kind: str  # node, llm, data
+    parent_id: Optional[int] = None
+    agent_name: Optional[str] = None
+    start: float = 0.0  # Unix 时间戳（秒）
+    duration: Optional[float] = None  # 秒，未结束时为None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    _t0: float = field(default=0.0, repr=False)
+    _token: Any = field(default=None, repr=False)
+
+    @property
+    def end(self) -> Optional[float]:
+        return None if self.duration is None else self.start + self.duration
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "run_id": self.run_id,
+            "name": self.name,
+            "kind": self.kind,
+            "agent_name": self.agent_name,
+            "start": self.start,
+            "end": self.end,
+            "duration": self.duration,
+            "attributes": dict(self.attributes),
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar(
+    "current_span", default=None)
+
+
+class SpanCollector:
+    """按 run_id 保存已结束的 span，只保留最近的运行"""
+
+    def __init__(self, max_runs: int = MAX_TRACED_RUNS, max_spans: int = MAX_SPANS_PER_RUN):
+        self._max_runs = max_runs
+        self._max_spans = max_spans
+        self._runs: "OrderedDict[str, List[Span]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            spans = self._runs.get(span.run_id)
+            if spans is None:
+                spans = self._runs[span.run_id] = []
+                while len(self._runs) > self._max_runs:
+                    self._runs.popitem(last=False)
+            if len(spans) < self._max_spans:
+                spans.append(span)
+
+    def get_spans(self, run_id: str) -> List[Span]:
+        with self._lock:
+            return list(self._runs.get(run_id, ()))
+
+
+# 进程级共享实例
+span_collector = SpanCollector()
+
+
+def start_span(name: str, kind: str, run_id: Optional[str] = None,
+               agent_name: Optional[str] = None, **attributes) -> Optional[Span]:
+    """开始一个 span 并设为当前 span
+
+    run_id 为空时继承父 span 的运行ID；既没有 run_id 也没有父 span 时不记录，返回None。
+    """
+    parent = _current_span.get()
+    run_id = run_id or (parent.run_id if parent else None)
+    if not run_id:
+        return None
+    span = Span(
+        span_id=next(_span_ids),
+        run_id=run_id,
+        name=name,
+        kind=kind,
+        parent_id=parent.span_id if parent else None,
+        agent_name=agent_name or (parent.agent_name if parent else None),
+        start=time.time(),
+        attributes=attributes,
+        _t0=time.perf_counter(),
+    )
+    span._token = _current_span.set(span)
+    return span
+
+
+def end_span(span: Optional[Span], error: Optional[BaseException] = None):
+    """结束 span，恢复父 span 为当前 span"""
+    if span is None:
+        return
+    span.duration = time.perf_counter() - span._t0
+    token, span._token = span._token, None
+    if token is not None:
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # 在其他上下文中结束（例如生成器跨任务），不影响记录
+            pass
+    if error is not None:
+        span.attributes["error"] = str(error)
+    span_collector.add(span)
+
+
+@contextmanager
+def trace_span(name: str, kind: str, **attributes):
+    """在当前运行内记录一个 span，不在运行中时不做任何事"""
+    span = start_span(name, kind, **attributes)
+    try:
+        yield span
+    except BaseException as e:
+        end_span(span, error=e)
+        raise
+    else:
+        end_span(span)
+
+
+def set_span_attributes(**attributes):
+    """为当前 span 添加属性，例如 token 数、是否命中缓存"""
+    span = _current_span.get()
+    if span is not None:
+        span.attributes.update(attributes)
+
+
+class _TracedModule:
+    """模块代理，调用其中的函数时记录 data span 以及调用次数和耗时指标"""
+
+    def __init__(self, module, prefix: str):
+        # 传入模块名时在首次访问属性时才导入
+        self._module = module
+        self._prefix = prefix
+        self._wrapped: Dict[str, Any] = {}
+
+    def __getattr__(self, name: str):
+        if isinstance(self._module, str):
+            self._module = importlib.import_module(self._module)
+        attr = getattr(self._module, name)
+        if not callable(attr) or isinstance(attr, type):
+            return attr
+        wrapped = self._wrapped.get(name)
+        if wrapped is None:
+            span_name = f"{self._prefix}.{name}"
+
+            @functools.wraps(attr)
+            def wrapped(*args, **kwargs):
+                started = time.perf_counter()
+                status = "error"
+                try:
+                    # 不在运行中时不创建 span
+                    if _current_span.get() is None:
+                        result = attr(*args, **kwargs)
+                    else:
+                        with trace_span(span_name, kind="data"):
+                            result = attr(*args, **kwargs)
+                    status = "success"
+                    return result
+                finally:
+                    AKSHARE_REQUESTS.inc(endpoint=name, status=status)
+                    AKSHARE_DURATION.observe(
+                        time.perf_counter() - started, endpoint=name)
+            self._wrapped[name] = wrapped
+        return wrapped
+
+
+def traced_module(module, prefix: Optional[str] = None):
+    """返回模块的代理，其中函数的每次调用都记录为当前节点的 data span
+
+    module 可以是模块对象或模块名；传入模块名时，模块在第一次调用其中的函数时才导入，
+    akshare 这类导入耗时较长的依赖不会拖慢启动。
+
+    用法:
+        ak = traced_module("akshare")
+    """
+    if isinstance(module, str):
+        return _TracedModule(module, prefix or module)
+    return _TracedModule(module, prefix or module.__name__)
+
+
+# --- 汇总 ---
+
+def _self_time(span: Span, children: List[Span]) -> float:
+    return max(0.0, (span.duration or 0.0) - sum(c.duration or 0.0 for c in children))
+
+
+def critical_path(nodes: List[Span]) -> List[Span]:
+    """根据节点的起止时间计算关键路径
+
+    LangGraph 按超步执行，节点在其所有上游节点完成后才开始，
+    因此节点开始前最后一个完成的节点就是阻塞它的上游节点。
+    从最后完成的节点开始沿这一关系回溯，得到决定整次运行耗时的节点链。
+    """
+    finished = sorted((n for n in nodes if n.duration is not None),
+                      key=lambda n: n.end)
+    if not finished:
+        return []
+    path = [finished[-1]]
+    visited = {finished[-1].span_id}
+    while True:
+        current = path[-1]
+        blockers = [n for n in finished
+                    if n.span_id not in visited and n.end <= current.start + 1e-3]
+        if not blockers:
+            break
+        blocker = max(blockers, key=lambda n: n.end)
+        visited.add(blocker.span_id)
+        path.append(blocker)
+    path.reverse()
+    return path
+
+
+def build_run_profile(run_id: str, spans: Optional[List[Span]] = None) -> Optional[Dict[str, Any]]:
+    """汇总运行的 span：各节点的耗时拆分、按类型的总耗时和关键路径，没有记录时返回None"""
+    spans = span_collector.get_spans(run_id) if spans is None else spans
+    if not spans:
+        return None
+
+    children: Dict[int, List[Span]] = {}
+    for span in spans:
+        if span.parent_id is not None:
+            children.setdefault(span.parent_id, []).append(span)
+
+    def descendants(span: Span) -> List[Span]:
+        result = []
+        for child in children.get(span.span_id, ()):
+            result.append(child)
+            result.extend(descendants(child))
+        return result
+
+    nodes = [s for s in spans if s.kind == "node" and s.duration is not None]
+    run_start = min(s.start for s in spans)
+    run_end = max(s.end for s in spans if s.duration is not None)
+
+    node_profiles = []
+    for node in sorted(nodes, key=lambda n: n.start):
+        inner = descendants(node)
+        llm = [s for s in inner if s.kind == "llm"]
+        data = [s for s in inner if s.kind == "data"]
+        node_profiles.append({
+            "name": node.name,
+            "start_offset": node.start - run_start,
+            "duration": node.duration,
+            "llm_seconds": sum(s.duration or 0.0 for s in llm),
+            "data_seconds": sum(s.duration or 0.0 for s in data),
+            "self_seconds": _self_time(node, children.get(node.span_id, [])),
+            "llm_calls": len(llm),
+            "llm_cache_hits": sum(1 for s in llm if s.attributes.get("cache_hit")),
+            "prompt_tokens": sum(s.attributes.get("prompt_tokens") or 0 for s in llm),
+            "completion_tokens": sum(s.attributes.get("completion_tokens") or 0 for s in llm),
+            "data_calls": len(data),
+            "error": node.attributes.get("error"),
+        })
+
+    path = critical_path(nodes)
+    path_profile = []
+    previous_end = run_start
+    for node in path:
+        path_profile.append({
+            "name": node.name,
+            "start_offset": node.start - run_start,
+            "duration": node.duration,
+            # 上游节点完成到本节点开始之间的调度等待
+            "wait_before": max(0.0, node.start - previous_end),
+        })
+        previous_end = node.end
+
+    totals = {"node": 0.0, "llm": 0.0, "data": 0.0}
+    for span in spans:
+        if span.kind in totals and span.duration is not None:
+            totals[span.kind] += span.duration
+
+    return {
+        "run_id": run_id,
+        "wall_seconds": run_end - run_start,
+        "totals": {
+            "node_seconds": totals["node"],
+            "llm_seconds": totals["llm"],
+            "data_seconds": totals["data"],
+            "other_seconds": max(0.0, totals["node"] - totals["llm"] - totals["data"]),
+        },
+        "critical_path": path_profile,
+        "critical_path_seconds": sum(p["duration"] + p["wait_before"] for p in path_profile),
+        "nodes": node_profiles,
+    }